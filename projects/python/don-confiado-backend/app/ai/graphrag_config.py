@@ -6,27 +6,29 @@ from typing import List
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.chat_models import init_chat_model
 
+from business.utils.usage_tracker import TrackedEmbeddings, get_usage_tracker
+
 
 load_dotenv()
 
 
 # Embedding/LLM factories (Gemini based)
-def get_embeddings() -> GoogleGenerativeAIEmbeddings:
+def get_embeddings() -> TrackedEmbeddings:
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise RuntimeError("GOOGLE_API_KEY not configured")
     # Use Google's text-embedding-004 (768 dims)
-    return GoogleGenerativeAIEmbeddings(
+    return TrackedEmbeddings(GoogleGenerativeAIEmbeddings(
         model="models/text-embedding-004",
         google_api_key=api_key,
-    )
+    ), "models/text-embedding-004")
 
 
 def get_chat_model():
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise RuntimeError("GOOGLE_API_KEY not configured")
-    return init_chat_model("gemini-2.5-flash", model_provider="google_genai", api_key=api_key)
+    return init_chat_model("gemini-2.5-flash", model_provider="google_genai", api_key=api_key, callbacks=[get_usage_tracker().handler])
 
 
 # Ontology for market research (modifiable)
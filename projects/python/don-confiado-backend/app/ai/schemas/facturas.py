@@ -135,3 +135,14 @@ class FacturaColombiana(BaseModel):
         "title": "FacturaColombiana",
         "description": "Representa una factura de venta emitida en Colombia conforme a la normativa local, incluyendo información del emisor, ítems facturados y total."
     }
+
+
+class InvoiceUnderstanding(UserIntention):
+    """
+    Salida estructurada combinada para mensajes con imagen: intención del usuario,
+    payloads y datos de la factura extraídos en una sola llamada al modelo.
+    """
+    factura: Optional[FacturaColombiana] = Field(
+        None,
+        description="Datos de la factura si la imagen adjunta es una factura. Nulo si la imagen no contiene una factura."
+    )
@@ -0,0 +1,124 @@
+"""Benchmark de concurrencia para los endpoints de chat (v1.0 / v1.1).
+
+Simula N usuarios de WhatsApp enviando mensajes en paralelo contra la app
+FastAPI en proceso, usando un modelo falso que agrega latencia fija en lugar
+de llamar a Gemini. El modo `--blocking` reproduce el comportamiento anterior
+(llamada bloqueante dentro de un `async def`) para comparar.
+
+Uso (desde projects/python/don-confiado-backend/app):
+    python -m benchmarks.chat_concurrency --users 50 --requests 4 --latency 0.3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, List
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from business.utils.llm_registry import init_llm_registry
+from endpoints.chat_webservice import chat_webservice_api_router, CHAT_MODEL_NAME
+
+
+class FakeLatencyChatModel(BaseChatModel):
+    latency: float = 0.3
+    blocking: bool = False
+    reply: str = "Hola, soy Don Confiado. ¿Cómo te llamas?"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-latency"
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await self._wait()
+        return self._result()
+
+    async def _wait(self) -> None:
+        if (self.blocking):
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+
+    def with_structured_output(self, schema: Any, **kwargs):
+        # Clasificación fija como 'Other' (mismo formato que devuelve Gemini con schema JSON)
+        structured_reply = [{"args": {"userintention": "Other"}}]
+
+        def _classify(_: Any):
+            time.sleep(self.latency)
+            return structured_reply
+
+        async def _aclassify(_: Any):
+            await self._wait()
+            return structured_reply
+
+        return RunnableLambda(_classify, afunc=_aclassify)
+
+
+async def _simulate_user(client: httpx.AsyncClient, path: str, user_id: str, requests: int, latencies: List[float]) -> None:
+    for i in range(requests):
+        started = time.perf_counter()
+        response = await client.post(path, json={"message": f"hola #{i}", "user_id": user_id})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_benchmark(path: str, users: int, requests: int, latency: float, blocking: bool, max_concurrency: int) -> dict:
+    registry = init_llm_registry()
+    registry.register(CHAT_MODEL_NAME, FakeLatencyChatModel(latency=latency, blocking=blocking))
+    registry.set_concurrency_limit(CHAT_MODEL_NAME, max_concurrency)
+
+    app = FastAPI()
+    app.include_router(chat_webservice_api_router)
+
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _simulate_user(client, path, f"whatsapp-{n}", requests, latencies) for n in range(users)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    return {
+        "path": path,
+        "mode": "blocking" if blocking else "async",
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=4, help="Mensajes por usuario")
+    parser.add_argument("--latency", type=float, default=0.3, help="Latencia simulada por llamada al modelo (s)")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Límite de llamadas concurrentes al modelo")
+    parser.add_argument("--paths", nargs="+", default=["/api/chat_v1.0", "/api/chat_v1.1"])
+    args = parser.parse_args()
+
+    for path in args.paths:
+        for blocking in (True, False):
+            result = asyncio.run(run_benchmark(path, args.users, args.requests, args.latency, blocking, args.max_concurrency))
+            print(result)
+
+
+if (__name__ == "__main__"):
+    main()
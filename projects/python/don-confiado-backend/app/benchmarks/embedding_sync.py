@@ -0,0 +1,123 @@
+"""Benchmark de la sincronización de embeddings (chunks por segundo según el tamaño del lote).
+
+Crea N productos sintéticos (`sku` con prefijo `bench-emb-`, todos de un proveedor de prueba)
+en la base configurada en `.env` (Postgres local con pgvector y las migraciones aplicadas) y
+los sincroniza a `productos_vec` con `EmbeddingSync` usando un cliente de embeddings falso
+con latencia por llamada (no llama a Gemini). Compara una llamada por producto (como antes:
+`--batches 1`, concurrencia 1) con lotes de distintos tamaños y varios lotes en paralelo.
+
+Uso (desde projects/python/don-confiado-backend/app):
+    python -m benchmarks.embedding_sync --rows 500 --latency 0.1 --batches 1,25,100
+"""
+import argparse
+import asyncio
+import random
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+
+from business.common.async_connection import AsyncSessionLocal, dispose_async_engines
+from business.common.connection import engine, init_db
+from business.dao import AsyncProductoDAO
+from business.entities.producto import Producto
+from business.utils.embedding_sync import EmbeddingSync, RateLimiter
+from endpoints.chat_clase_03 import EMBEDDING_DIM, _producto_document
+
+
+SKU_PREFIX = "bench-emb-"
+DOC_PREFIX = "bench-emb-"
+
+
+class FakeLatencyEmbeddings(Embeddings):
+    """Vectores aleatorios con latencia fija por llamada más un costo por texto."""
+
+    def __init__(self, latency: float, per_text: float):
+        self.latency = latency
+        self.per_text = per_text
+        self.calls = 0
+
+    def _vectors(self, texts: List[str]) -> List[List[float]]:
+        rng = random.Random(len(texts))
+        return [[rng.random() for _ in range(EMBEDDING_DIM)] for _ in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError("La sincronización usa aembed_documents")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vectors([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.per_text * len(texts))
+        return self._vectors(texts)
+
+
+def seed(rows: int) -> int:
+    with engine.begin() as connection:
+        proveedor_id = connection.execute(text(f"""
+            INSERT INTO terceros (tipo_documento, numero_documento, razon_social, tipo_tercero)
+            VALUES ('NIT', '{DOC_PREFIX}1', 'Proveedor benchmark', 'proveedor')
+            RETURNING id
+        """)).scalar()
+        connection.execute(text(f"""
+            INSERT INTO productos (sku, nombre, precio_venta, cantidad, proveedor_id)
+            SELECT '{SKU_PREFIX}' || g, 'Producto benchmark ' || g, 100 + g % 1000, g % 50, :proveedor_id
+            FROM generate_series(1, {rows}) g
+        """), {"proveedor_id": proveedor_id})
+
+    return proveedor_id
+
+
+def cleanup() -> None:
+    # productos_vec se borra en cascada con sus productos
+    with engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM productos WHERE sku LIKE '{SKU_PREFIX}%'"))
+        connection.execute(text(f"DELETE FROM terceros WHERE numero_documento LIKE '{DOC_PREFIX}%'"))
+
+
+async def run(proveedor_id: int, batch_size: int, concurrency: int, latency: float, per_text: float, rpm: float) -> dict:
+    embeddings = FakeLatencyEmbeddings(latency, per_text)
+    sync = EmbeddingSync(embeddings, "productos_vec", AsyncSessionLocal, batch_size=batch_size, concurrency=concurrency,
+                         rate_limiter=RateLimiter(rpm))
+
+    async with AsyncSessionLocal() as session:
+        productos = AsyncProductoDAO(session).iterAll(batch_size=500, options=[joinedload(Producto.proveedor)], proveedor_id=proveedor_id)
+        stats = await sync.run(_producto_document(producto) async for producto in productos)
+
+    return {"batch_size": batch_size, "concurrency": concurrency, "embedding_calls": embeddings.calls, **stats}
+
+
+async def main_async(args) -> None:
+    proveedor_id = seed(args.rows)
+
+    try:
+        for batch_size in args.batches:
+            for concurrency in (1, args.concurrency):
+                print(await run(proveedor_id, batch_size, concurrency, args.latency, args.per_text, args.rpm))
+    finally:
+        await dispose_async_engines()
+        cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="Productos sintéticos")
+    parser.add_argument("--latency", type=float, default=0.1, help="Latencia fija por llamada (s)")
+    parser.add_argument("--per-text", type=float, default=0.001, help="Latencia adicional por texto del lote (s)")
+    parser.add_argument("--batches", type=lambda value: [int(v) for v in value.split(",")], default=[1, 25, 100])
+    parser.add_argument("--concurrency", type=int, default=4, help="Lotes en paralelo (además de 1)")
+    parser.add_argument("--rpm", type=float, default=0, help="Límite de llamadas por minuto (0 = sin límite)")
+    args = parser.parse_args()
+
+    # El log de SQL distorsiona las mediciones
+    engine.echo = False
+    init_db()
+    cleanup()
+
+    asyncio.run(main_async(args))
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,194 @@
+"""Benchmark de búsqueda de productos por nombre: ILIKE vs búsqueda difusa con pg_trgm.
+
+Crea N productos sintéticos (`sku` con prefijo `bench-search-`) en la base configurada
+en `.env` (Postgres local con las extensiones pg_trgm y unaccent), aplica las migraciones
+(`init_db`: columna normalizada e índices) y compara, para consultas como las que llegan por WhatsApp
+(sin tildes, con errores de digitación):
+
+- `ILIKE '%texto%'` (lo que hace `findByNombre`), con el mismo límite de resultados.
+- `ProductoDAO.searchByNombre` (columna normalizada + índice GIN de trigramas).
+
+Reporta latencia p50/p95, aciertos (el primer resultado es el producto y la marca buscados)
+y si el plan usa el índice. Al terminar borra los productos sintéticos (salvo `--keep`).
+
+Uso (desde projects/python/don-confiado-backend/app):
+    python -m benchmarks.product_search --rows 500000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+import unicodedata
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+
+from business.common.connection import SessionLocal, engine, init_db
+from business.common.text_search import PRODUCT_SEARCH_THRESHOLD
+from business.dao.producto_dao import ProductoDAO
+from business.entities.producto import Producto
+
+
+SKU_PREFIX = "bench-search-"
+DOC_PREFIX = "bench-search-"
+
+PRODUCTOS = [
+    "Azúcar", "Café", "Arroz", "Aceite", "Jabón", "Limón", "Panela", "Atún", "Fríjol", "Maíz",
+    "Harina", "Chocolate", "Galletas", "Leche", "Salsa de tomate", "Papel higiénico", "Champú",
+    "Detergente", "Sal", "Pasta", "Lentejas", "Avena", "Mantequilla", "Queso", "Jamón",
+    "Salchichón", "Plátano", "Piña", "Té", "Crema dental",
+]
+MARCAS = [
+    "Manuelita", "Águila", "Diana", "Roa", "Colombina", "Alpina", "Nutresa", "Zenú", "Fruco",
+    "Doria", "Ramo", "Postobón", "Familia", "Colgate", "Quaker", "La Muñeca", "Van Camps", "Riopaila",
+]
+PRESENTACIONES = ["500 g", "1 kg", "2,5 kg", "250 ml", "1 L", "x6", "x12", "paquete", "bolsa", "caja"]
+PROVEEDORES = 20
+
+
+def _unaccent(value: str) -> str:
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in value if not unicodedata.combining(ch)).lower()
+
+
+def _typo(value: str, rng: random.Random) -> str:
+    # Un error de digitación: letra omitida, duplicada o dos letras intercambiadas
+    positions = [i for i, ch in enumerate(value) if ch.isalpha()]
+    if (len(positions) < 4): return value
+
+    i = rng.choice(positions[1:-1])
+    kind = rng.choice(("omit", "double", "swap"))
+
+    if (kind == "omit"): return value[:i] + value[i + 1:]
+    if (kind == "double"): return value[:i] + value[i] + value[i:]
+
+    return value[:i] + value[i + 1] + value[i] + value[i + 2:]
+
+
+def _array(values: List[str]) -> str:
+    return "ARRAY[" + ", ".join("'" + value.replace("'", "''") + "'" for value in values) + "]"
+
+
+def seed(rows: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(f"""
+            INSERT INTO terceros (tipo_documento, numero_documento, razon_social, tipo_tercero)
+            SELECT 'NIT', '{DOC_PREFIX}' || g, 'Proveedor benchmark ' || g, 'proveedor'
+            FROM generate_series(1, {PROVEEDORES}) g
+            ON CONFLICT DO NOTHING
+        """))
+        connection.execute(text(f"""
+            INSERT INTO productos (sku, nombre, precio_venta, cantidad, proveedor_id)
+            SELECT
+                '{SKU_PREFIX}' || g,
+                v.p[1 + g % array_length(v.p, 1)] || ' ' || v.m[1 + (g / 7) % array_length(v.m, 1)] || ' '
+                    || v.s[1 + (g / 13) % array_length(v.s, 1)] || ' ref ' || g,
+                100 + g % 1000,
+                g % 50,
+                (SELECT array_agg(id ORDER BY id) FROM terceros WHERE numero_documento LIKE '{DOC_PREFIX}%')[1 + g % {PROVEEDORES}]
+            FROM generate_series(1, {rows}) g,
+                 (SELECT {_array(PRODUCTOS)} AS p, {_array(MARCAS)} AS m, {_array(PRESENTACIONES)} AS s) v
+        """))
+        connection.execute(text("ANALYZE productos"))
+
+
+def cleanup() -> None:
+    with engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM productos WHERE sku LIKE '{SKU_PREFIX}%'"))
+        connection.execute(text(f"DELETE FROM terceros WHERE numero_documento LIKE '{DOC_PREFIX}%'"))
+
+
+def build_queries(count: int, rng: random.Random) -> List[Tuple[str, str, str, str]]:
+    """(variante, consulta, producto, marca) con consultas con tildes, sin tildes y con errores."""
+    queries = []
+
+    for n in range(count):
+        producto, marca = rng.choice(PRODUCTOS), rng.choice(MARCAS)
+        exact = f"{producto} {marca}"
+        variants = {
+            "exacta": exact,
+            "sin_tildes": _unaccent(exact),
+            "con_error": _typo(_unaccent(exact), rng),
+        }
+        kind = ("exacta", "sin_tildes", "con_error")[n % 3]
+        queries.append((kind, variants[kind], producto, marca))
+
+    return queries
+
+
+def _is_hit(nombre: str, producto: str, marca: str) -> bool:
+    nombre = _unaccent(nombre)
+    return nombre.startswith(_unaccent(producto) + " ") and f" {_unaccent(marca)} " in nombre
+
+
+def run(name: str, search: Callable[[str], List[Producto]], queries, check_hits: bool = True) -> dict:
+    latencies, hits = [], {"exacta": [0, 0], "sin_tildes": [0, 0], "con_error": [0, 0]}
+
+    for kind, query, producto, marca in queries:
+        started = time.perf_counter()
+        results = search(query)
+        latencies.append(time.perf_counter() - started)
+
+        hits[kind][1] += 1
+        if (results and _is_hit(results[0].nombre, producto, marca)): hits[kind][0] += 1
+
+    latencies.sort()
+
+    return {
+        "path": name,
+        "queries": len(queries),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 2),
+        "top1_hit_rate": {kind: round(ok / total, 3) if total else None for kind, (ok, total) in hits.items()} if check_hits else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000, help="Productos sintéticos")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=PRODUCT_SEARCH_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="No borrar los productos sintéticos al terminar")
+    args = parser.parse_args()
+
+    # El log de SQL distorsiona las mediciones
+    engine.echo = False
+    init_db()
+
+    cleanup()
+    started = time.perf_counter()
+    seed(args.rows)
+    print({"seeded_rows": args.rows, "seed_s": round(time.perf_counter() - started, 1)})
+
+    queries = build_queries(args.queries, random.Random(args.seed))
+    session = SessionLocal()
+    dao = ProductoDAO(session)
+    proveedor_id = session.execute(text(f"SELECT min(id) FROM terceros WHERE numero_documento LIKE '{DOC_PREFIX}%'")).scalar()
+
+    try:
+        ilike = lambda query: session.query(Producto).filter(Producto.nombre.ilike(f"%{query}%")).limit(args.limit).all()
+        fuzzy = lambda query: [producto for producto, _ in dao.searchByNombre(query, limit=args.limit, threshold=args.threshold)]
+        fuzzy_proveedor = lambda query: [producto for producto, _ in dao.searchByNombre(query, limit=args.limit, threshold=args.threshold, proveedor_id=proveedor_id)]
+
+        print(run("ilike", ilike, queries))
+        print(run("pg_trgm", fuzzy, queries))
+        # Con filtro de proveedor el producto/marca buscado puede no existir para ese proveedor: solo latencia
+        print(run("pg_trgm + proveedor", fuzzy_proveedor, queries, check_hits=False))
+
+        # Plan de la búsqueda difusa (debe usar el índice GIN de trigramas)
+        session.execute(text(f"SELECT set_config('pg_trgm.word_similarity_threshold', '{args.threshold}', true)"))
+        plan = session.execute(text(
+            "EXPLAIN SELECT id FROM productos WHERE donconfiado_normalize('azucar manuelita') <% nombre_normalizado"
+        )).scalars().all()
+        print({"uses_trgm_index": any("idx_productos_nombre_normalizado_trgm" in line for line in plan)})
+    finally:
+        session.close()
+
+        if (not args.keep):
+            cleanup()
+
+
+if (__name__ == "__main__"):
+    main()
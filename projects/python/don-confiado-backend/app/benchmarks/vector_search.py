@@ -0,0 +1,213 @@
+"""Benchmark de la búsqueda de contexto RAG: vector literal vs parámetro binario y forma de la consulta.
+
+Crea N productos sintéticos (`sku` con prefijo `bench-vec-`) con un vector aleatorio cada uno en
+`productos_vec` (base configurada en `.env`, con pgvector y las migraciones aplicadas) y mide el
+tiempo de análisis + ejecución de la consulta de `_search_context` con un vector distinto por pregunta:
+
+- `literal_psycopg2` (antes): los 768 floats formateados dentro del texto del SQL (~10 KB por
+  sentencia, que Postgres analiza y planifica de nuevo en cada pregunta).
+- `literal_asyncpg`: el mismo SQL con literal por el driver async (cada texto es distinto: asyncpg
+  tiene que preparar cada sentencia y no reutiliza ninguna).
+- `bound_union_all`: el vector como parámetro en formato binario (sentencia preparada una vez por
+  conexión), con la forma anterior: UNION ALL de ambas tablas completas y un solo ORDER BY.
+- `bound_per_source` (ahora): `_search_context_sql`, un `ORDER BY embedding <op> q LIMIT k` por fuente
+  (lo resuelve el índice ANN del operador) y la mezcla por distancia.
+
+Reporta p50/p95 por consulta, el tamaño del texto enviado y el recall@k de `bound_per_source`
+frente a la búsqueda exacta (`--recall` fija hnsw.ef_search / ivfflat.probes).
+
+Uso (desde projects/python/don-confiado-backend/app):
+    python -m benchmarks.vector_search --rows 1000 --queries 300
+    python -m benchmarks.vector_search --rows 50000 --queries 200 --distance COSINE_DISTANCE --recall HIGH
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+from sqlalchemy import text
+
+from business.common.async_connection import AsyncSessionLocal, async_engine, dispose_async_engines
+from business.common.connection import SessionLocal, engine, init_db
+from business.common.vector_search import SET_SEARCH_PARAMS_SQL, search_params
+from business.enums.vector_search_recall import VectorSearchRecall
+from business.enums.vector_search_source import VectorSearchSource
+from business.enums.vector_search_type import VectorSearchType
+from endpoints.chat_clase_03 import EMBEDDING_DIM, _search_context_sql
+
+
+SKU_PREFIX = "bench-vec-"
+
+
+def seed(rows: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(f"""
+            INSERT INTO productos (sku, nombre, precio_venta, cantidad)
+            SELECT '{SKU_PREFIX}' || g, 'Producto benchmark ' || g, 100 + g % 1000, g % 50
+            FROM generate_series(1, {rows}) g
+        """))
+        connection.execute(text(f"""
+            INSERT INTO productos_vec (source_id, chunk_index, content, embedding)
+            SELECT p.id, 0, p.nombre, ARRAY(SELECT random() FROM generate_series(1, {EMBEDDING_DIM}) WHERE p.id IS NOT NULL)::vector
+            FROM productos p
+            WHERE p.sku LIKE '{SKU_PREFIX}%'
+        """))
+        connection.execute(text("ANALYZE productos_vec"))
+
+
+def cleanup() -> None:
+    # productos_vec se borra en cascada con sus productos
+    with engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM productos WHERE sku LIKE '{SKU_PREFIX}%'"))
+
+
+def union_all_sql(q_vec_sql: str, vector_search_type: VectorSearchType) -> str:
+    # Forma anterior de `_search_context`: distancia de todas las filas de ambas tablas
+    operator = vector_search_type.operator
+
+    return f"""
+        WITH q AS (SELECT {q_vec_sql} AS embedding)
+        SELECT 'producto' AS source, pv.source_id, pv.content, (pv.embedding {operator} q.embedding) AS distance
+        FROM productos_vec pv, q
+        UNION ALL
+        SELECT 'proveedor' AS source, pr.source_id, pr.content, (pr.embedding {operator} q.embedding) AS distance
+        FROM proveedores_vec pr, q
+        ORDER BY distance ASC
+        LIMIT :k
+    """
+
+
+def literal_sql(values: List[float], vector_search_type: VectorSearchType) -> str:
+    # Como lo hacía `_arr_to_sql_vector` antes de enviar el vector como parámetro
+    return union_all_sql("ARRAY[" + ",".join(f"{v:.8f}" for v in values) + f"]::vector({EMBEDDING_DIM})", vector_search_type)
+
+
+def summary(name: str, latencies: List[float], statement_bytes: int, **extra) -> dict:
+    latencies = sorted(latencies)
+
+    return {
+        "path": name,
+        "queries": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 3),
+        "statement_bytes": statement_bytes,
+        **extra,
+    }
+
+
+def run_literal_psycopg2(vectors, vector_search_type, top_k) -> dict:
+    latencies = []
+
+    with SessionLocal() as session:
+        for values in vectors:
+            sql = literal_sql(values, vector_search_type)
+            started = time.perf_counter()
+            session.execute(text(sql), {"k": top_k}).all()
+            latencies.append(time.perf_counter() - started)
+
+    return summary("literal_psycopg2", latencies, len(sql.encode()))
+
+
+async def run_literal_asyncpg(vectors, vector_search_type, top_k) -> dict:
+    latencies = []
+
+    async with AsyncSessionLocal() as session:
+        for values in vectors:
+            sql = literal_sql(values, vector_search_type)
+            started = time.perf_counter()
+            (await session.execute(text(sql), {"k": top_k})).all()
+            latencies.append(time.perf_counter() - started)
+
+    return summary("literal_asyncpg", latencies, len(sql.encode()))
+
+
+async def run_bound_union_all(vectors, vector_search_type, top_k) -> dict:
+    statement = text(union_all_sql(f"CAST(:embedding AS vector({EMBEDDING_DIM}))", vector_search_type))
+    latencies = []
+
+    async with AsyncSessionLocal() as session:
+        for values in vectors:
+            started = time.perf_counter()
+            (await session.execute(statement, {"embedding": values, "k": top_k})).all()
+            latencies.append(time.perf_counter() - started)
+
+    return summary("bound_union_all", latencies, len(str(statement).encode()))
+
+
+async def run_bound_per_source(vectors, vector_search_type, top_k, recall) -> dict:
+    statement = _search_context_sql(vector_search_type, tuple(VectorSearchSource))
+    # Otro texto: otra sentencia preparada, planificada siempre sin índices (un plan genérico no se rehace al cambiar la configuración)
+    exact_statement = text(str(statement) + "-- exacta")
+    latencies, found, expected = [], 0, 0
+
+    async with AsyncSessionLocal() as session:
+        for values in vectors:
+            params = {"embedding": values, "k_per_source": top_k, "k": top_k}
+
+            async with session.begin():
+                started = time.perf_counter()
+                await session.execute(text(SET_SEARCH_PARAMS_SQL), search_params(recall, top_k))
+                rows = (await session.execute(statement, params)).all()
+                latencies.append(time.perf_counter() - started)
+
+            # Resultado exacto (sin índices) para medir el recall
+            async with session.begin():
+                await session.execute(text("SET LOCAL enable_indexscan = off"))
+                exact = (await session.execute(exact_statement, params)).all()
+
+            found += len({(row.source, row.source_id) for row in rows} & {(row.source, row.source_id) for row in exact})
+            expected += len(exact)
+
+    return summary("bound_per_source", latencies, len(str(statement).encode()),
+                   recall=recall.value, recall_at_k=round(found / expected, 3) if expected else None)
+
+
+async def main_async(vectors, vector_search_type, top_k, recall) -> None:
+    try:
+        # Una consulta de calentamiento por camino (conexión del pool ya abierta y tipos registrados)
+        await run_literal_asyncpg(vectors[:1], vector_search_type, top_k)
+        await run_bound_union_all(vectors[:1], vector_search_type, top_k)
+        await run_bound_per_source(vectors[:1], vector_search_type, top_k, recall)
+
+        print(await run_literal_asyncpg(vectors, vector_search_type, top_k))
+        print(await run_bound_union_all(vectors, vector_search_type, top_k))
+        print(await run_bound_per_source(vectors, vector_search_type, top_k, recall))
+    finally:
+        await dispose_async_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="Productos sintéticos (un vector cada uno)")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--distance", choices=[t.name for t in VectorSearchType], default=VectorSearchType.EUCLIDEAN_DISTANCE.name)
+    parser.add_argument("--recall", choices=[r.name for r in VectorSearchRecall], default=VectorSearchRecall.BALANCED.name)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # El log de SQL distorsiona las mediciones
+    engine.echo = False
+    async_engine.echo = False
+    init_db()
+
+    cleanup()
+    seed(args.rows)
+
+    rng = random.Random(args.seed)
+    vectors = [[rng.random() for _ in range(EMBEDDING_DIM)] for _ in range(args.queries)]
+    vector_search_type = VectorSearchType[args.distance]
+
+    try:
+        run_literal_psycopg2(vectors[:1], vector_search_type, args.top_k)
+        print(run_literal_psycopg2(vectors, vector_search_type, args.top_k))
+
+        asyncio.run(main_async(vectors, vector_search_type, args.top_k, VectorSearchRecall[args.recall]))
+    finally:
+        cleanup()
+
+
+if (__name__ == "__main__"):
+    main()
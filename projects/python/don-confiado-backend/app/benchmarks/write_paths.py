@@ -0,0 +1,120 @@
+"""Benchmark de los caminos de escritura (latencia por registro insertado).
+
+Compara el repositorio SQL (pool de SQLAlchemy) insertando registro a registro
+y por lotes contra la base configurada en `.env` (una Postgres local sirve).
+Si `SUPABASE_URL` y `SUPABASE_SERVICE_ROLE_KEY` están definidas, mide además el
+adaptador REST (cliente HTTP keep-alive) y el cliente `supabase` que se usaba antes.
+
+Inserta terceros de prueba (`numero_documento` con prefijo único) y los borra al final.
+
+Uso (desde projects/python/don-confiado-backend/app):
+    python -m benchmarks.write_paths --rows 500 --batch 100
+"""
+import argparse
+import statistics
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from sqlalchemy import delete
+
+from business.common.connection import SessionLocal, engine, init_db
+from business.entities.tercero import Tercero
+from business.repositories import EntityRepository, SqlAlchemyRepository, SupabaseRestRepository
+
+
+def _records(prefix: str, rows: int) -> List[Dict]:
+    return [
+        {
+            "tipo_documento": "NIT",
+            "numero_documento": f"{prefix}-{n}",
+            "razon_social": f"Proveedor benchmark {n}",
+            "tipo_tercero": "proveedor",
+        }
+        for n in range(rows)
+    ]
+
+
+def _summary(name: str, rows: int, batch: int, latencies: List[float], elapsed: float) -> dict:
+    per_row = [latency / batch for latency in latencies]
+    per_row.sort()
+
+    return {
+        "path": name,
+        "rows": rows,
+        "batch": batch,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1),
+        "per_row_mean_ms": round(statistics.mean(per_row) * 1000, 3),
+        "per_row_p50_ms": round(statistics.median(per_row) * 1000, 3),
+        "per_row_p95_ms": round(per_row[max(int(len(per_row) * 0.95) - 1, 0)] * 1000, 3),
+    }
+
+
+def _run(name: str, insert_many: Callable[[List[Dict]], List[Dict]], rows: int, batch: int) -> dict:
+    records = _records(f"bench-{uuid.uuid4().hex[:8]}", rows)
+    latencies: List[float] = []
+
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        chunk = records[start:start + batch]
+        call_started = time.perf_counter()
+        insert_many(chunk)
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    return _summary(name, rows, batch, latencies, elapsed)
+
+
+def _repository_paths(repository: EntityRepository, label: str, batch: int) -> Dict[str, tuple]:
+    return {
+        f"{label} (1 por llamada)": (lambda chunk: repository.insert_many("terceros", chunk), 1),
+        f"{label} (lote)": (lambda chunk: repository.insert_many("terceros", chunk), batch),
+    }
+
+
+def _cleanup() -> int:
+    session = SessionLocal()
+
+    try:
+        result = session.execute(delete(Tercero).where(Tercero.numero_documento.like("bench-%")))
+        session.commit()
+
+        return result.rowcount
+    finally:
+        session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="Registros por camino")
+    parser.add_argument("--batch", type=int, default=100, help="Tamaño del lote")
+    args = parser.parse_args()
+
+    # El log de SQL distorsiona las mediciones
+    engine.echo = False
+    init_db()
+
+    paths = _repository_paths(SqlAlchemyRepository(), "sql", args.batch)
+
+    rest = SupabaseRestRepository()
+    if (rest.is_configured()):
+        paths.update(_repository_paths(rest, "supabase-rest", args.batch))
+
+        # Camino anterior: cliente supabase-py con una petición por registro
+        from supabase import create_client
+        legacy = create_client(rest.url, rest.key)
+        paths["supabase-py (1 por llamada)"] = (lambda chunk: legacy.table("terceros").insert(chunk).execute().data, 1)
+    else:
+        print("SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY no definidas: se omiten los caminos REST")
+
+    try:
+        for name, (insert_many, batch) in paths.items():
+            print(_run(name, insert_many, args.rows, batch))
+    finally:
+        rest.close()
+        print({"deleted_rows": _cleanup()})
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,87 @@
+import os
+from typing import AsyncIterator
+
+from fastapi import Request
+from pgvector.asyncpg import register_vector
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .connection import (DB_ECHO, DBNAME, HOST, MAX_OVERFLOW, PASSWORD, POOL_PRE_PING, POOL_RECYCLE_SECONDS, POOL_SIZE, PORT,
+                         READ_YOUR_WRITES, USER, replica_urls)
+from .routing_session import RoutingSession
+
+# Pool del motor async (endpoints). Por defecto usa la misma configuración que el motor sync,
+# que queda para scripts, benchmarks y el trabajo que corre en hilos.
+ASYNC_POOL_SIZE = int(os.getenv("donconfiado_db_async_pool_size", str(POOL_SIZE)))
+ASYNC_MAX_OVERFLOW = int(os.getenv("donconfiado_db_async_max_overflow", str(MAX_OVERFLOW)))
+ASYNC_POOL_RECYCLE_SECONDS = int(os.getenv("donconfiado_db_async_pool_recycle", str(POOL_RECYCLE_SECONDS)))
+ASYNC_POOL_PRE_PING = os.getenv("donconfiado_db_async_pool_pre_ping", str(POOL_PRE_PING)).lower() == "true"
+# Sentencias preparadas que asyncpg guarda por conexión (la búsqueda vectorial, los upserts de
+# embeddings, las consultas de los DAOs...): se analizan una vez por conexión y luego solo se ejecutan
+ASYNC_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("donconfiado_db_async_prepared_statement_cache_size", "100"))
+
+# Un request con este encabezado en "true" lee todo de la primaria (p. ej. justo después de escribir)
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+
+async def _register_vector(connection) -> None:
+    # En Supabase la extensión vive en el esquema `extensions`; sin pgvector (migración 2 pendiente) no hay nada que registrar
+    schema = await connection.fetchval("""
+        SELECT n.nspname FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace WHERE t.typname = 'vector'
+    """)
+
+    if (schema is not None):
+        await register_vector(connection, schema=schema)
+
+
+def _create_async_engine(url: str):
+    engine = create_async_engine(
+        url,
+        echo=DB_ECHO,
+        pool_size=ASYNC_POOL_SIZE,
+        max_overflow=ASYNC_MAX_OVERFLOW,
+        pool_pre_ping=ASYNC_POOL_PRE_PING,
+        pool_recycle=ASYNC_POOL_RECYCLE_SECONDS,
+        connect_args={"prepared_statement_cache_size": ASYNC_PREPARED_STATEMENT_CACHE_SIZE},
+    )
+
+    # Los parámetros de tipo vector viajan en el formato binario de pgvector (una lista de floats
+    # o un ndarray como parámetro de `CAST(:embedding AS vector)`), no como texto dentro del SQL
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.run_async(_register_vector)
+
+    return engine
+
+
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}"
+async_engine = _create_async_engine(ASYNC_DATABASE_URL)
+async_replica_engines = [_create_async_engine(url) for url in replica_urls("asyncpg")]
+# expire_on_commit=False: las entidades devueltas por los DAOs se pueden leer después del commit
+# sin volver a Postgres (en async un acceso perezoso a un atributo expirado falla).
+# Lecturas a las réplicas y escrituras a la primaria, igual que SessionLocal (ver RoutingSession).
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    replicas=[replica.sync_engine for replica in async_replica_engines],
+    read_your_writes=READ_YOUR_WRITES,
+)
+
+
+async def get_async_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """
+    Dependencia de FastAPI: una sesión por request. Al terminar el request se cierra y
+    su conexión vuelve al pool (lo que no se haya confirmado se descarta).
+    Con el encabezado X-Read-Your-Writes: true todas sus lecturas van a la primaria.
+    """
+    async with AsyncSessionLocal() as session:
+        if (request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() == "true"):
+            session.sync_session.use_primary()
+
+        yield session
+
+
+async def dispose_async_engines() -> None:
+    for engine in [async_engine, *async_replica_engines]:
+        await engine.dispose()
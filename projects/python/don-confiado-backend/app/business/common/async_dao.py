@@ -0,0 +1,198 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Generic, List, Optional, Sequence, Type
+from sqlalchemy import delete, insert, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .dao import T, _UOW_DEPTH, _UOW_INVALIDATIONS, _run_invalidations
+from .entity_cache import EntityCache, get_entity_cache, unique_keys
+
+
+@asynccontextmanager
+async def async_unit_of_work(session: AsyncSession, cache: Optional[EntityCache] = None):
+    """Versión async de `unit_of_work`: un solo commit al salir del bloque externo (rollback si hubo error)."""
+    cache = cache or get_entity_cache()
+    depth = session.info.get(_UOW_DEPTH, 0)
+    session.info[_UOW_DEPTH] = depth + 1
+
+    try:
+        yield session
+
+        if (depth == 0):
+            await session.commit()
+            # La caché se invalida después del commit para que nadie cachee valores sin confirmar
+            _run_invalidations(session, cache)
+    except Exception:
+        if (depth == 0):
+            await session.rollback()
+            # También tras el rollback: lo que la caché tenga de esas entidades pudo quedar desactualizado
+            _run_invalidations(session, cache)
+        raise
+    finally:
+        session.info[_UOW_DEPTH] = depth
+
+
+class AsyncGenericDAO(Generic[T]):
+    """
+    Mismos métodos que GenericDAO sobre una AsyncSession (p. ej. la del request, ver
+    `get_async_session`). Comparte con la versión sync la caché de entidades y la unidad
+    de trabajo (el estado vive en session.info).
+    """
+    # DAO sync equivalente, usado por `_runSync` para reutilizar sus consultas más elaboradas
+    SYNC_DAO: Optional[type] = None
+
+    def __init__(self, session: AsyncSession, model: Type[T], cache: Optional[EntityCache] = None):
+        self.session = session
+        self.model = model
+        self.cache = cache or get_entity_cache()
+        self._primary_key = inspect(model).primary_key[0]
+        # Solo se cachean búsquedas por llaves que identifican una sola fila
+        self._cacheable_keys = unique_keys(model)
+
+    def unitOfWork(self):
+        return async_unit_of_work(self.session, self.cache)
+
+    async def create(self, entity: T) -> T:
+        self.session.add(entity)
+        await self._commit()
+        await self.session.refresh(entity)
+        return entity
+
+    async def createMany(self, records: Sequence[Dict[str, Any]]) -> List[T]:
+        """Insert many rows with a single INSERT ... RETURNING (batched by SQLAlchemy) and one commit."""
+        if (not records):
+            return []
+
+        statement = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        entities = list(await self.session.scalars(statement, list(records)))
+        await self._commit()
+        return entities
+
+    async def findById(self, id_value) -> Optional[T]:
+        return await self._cachedLookup({self._primary_key.key: id_value}, lambda: self.session.get(self.model, id_value))
+
+    async def findBy(self, **filters) -> Optional[T]:
+        async def query():
+            return (await self.session.scalars(select(self.model).filter_by(**filters).limit(1))).first()
+
+        if (tuple(sorted(filters)) not in self._cacheable_keys):
+            return await query()
+
+        return await self._cachedLookup(filters, query)
+
+    async def findAll(self) -> List[T]:
+        """Loads the whole table: prefer iterAll/findPage for large tables."""
+        return list(await self.session.scalars(select(self.model)))
+
+    async def iterAll(self, batch_size: int = 1000, options: Sequence[Any] = (), **filters) -> AsyncIterator[T]:
+        """
+        Stream the table (optionally filtered) in primary key order using a server-side
+        cursor: only `batch_size` rows are held in memory at a time.
+        """
+        statement = (
+            select(self.model)
+            .filter_by(**filters)
+            .options(*options)
+            .order_by(self._primary_key)
+            .execution_options(yield_per=batch_size)
+        )
+
+        async for entity in await self.session.stream_scalars(statement):
+            yield entity
+
+    async def findPage(self, after_id=None, limit: int = 100, options: Sequence[Any] = (), **filters) -> List[T]:
+        """Keyset pagination: the next `limit` rows with primary key greater than `after_id`."""
+        statement = select(self.model).filter_by(**filters).options(*options)
+
+        if (after_id is not None):
+            statement = statement.where(self._primary_key > after_id)
+
+        return list(await self.session.scalars(statement.order_by(self._primary_key).limit(limit)))
+
+    async def update(self, id_value, **kwargs) -> Optional[T]:
+        # Un solo UPDATE ... RETURNING (sin buscar la entidad antes)
+        statement = (
+            update(self.model)
+            .where(self._primary_key == id_value)
+            .values(**kwargs)
+            .returning(self.model)
+            .execution_options(synchronize_session="fetch")
+        )
+        entity = (await self.session.scalars(statement)).first()
+        if entity:
+            await self._commit()
+            self._invalidate([id_value])
+        return entity
+
+    async def updateWhere(self, values: Dict[str, Any], **filters) -> int:
+        """UPDATE every row matching `filters` in one statement; returns the number of rows updated."""
+        if (not filters):
+            raise ValueError("updateWhere requires at least one filter")
+
+        statement = update(self.model).filter_by(**filters).values(**values).returning(self._primary_key)
+        ids = list(await self.session.scalars(statement.execution_options(synchronize_session="fetch")))
+        await self._commit()
+        self._invalidate(ids)
+        return len(ids)
+
+    async def delete(self, id_value) -> Optional[T]:
+        statement = delete(self.model).where(self._primary_key == id_value).returning(self.model)
+        entity = (await self.session.scalars(statement.execution_options(synchronize_session="fetch"))).first()
+        if entity:
+            # La fila ya no existe: se devuelve desligada de la sesión con los valores borrados
+            self.session.expunge(entity)
+            await self._commit()
+            self._invalidate([id_value])
+        return entity
+
+    async def deleteWhere(self, **filters) -> int:
+        """DELETE every row matching `filters` in one statement; returns the number of rows deleted."""
+        if (not filters):
+            raise ValueError("deleteWhere requires at least one filter")
+
+        statement = delete(self.model).filter_by(**filters).returning(self._primary_key)
+        ids = list(await self.session.scalars(statement.execution_options(synchronize_session="fetch")))
+        await self._commit()
+        self._invalidate(ids)
+        return len(ids)
+
+    async def _runSync(self, method: str, *args, **kwargs):
+        """
+        Run a method of SYNC_DAO on this session's sync counterpart (SQLAlchemy's run_sync):
+        the queries are the same, but Postgres I/O still goes through asyncpg without blocking the event loop.
+        """
+        return await self.session.run_sync(lambda session: getattr(self.SYNC_DAO(session), method)(*args, **kwargs))
+
+    def _inUnitOfWork(self) -> bool:
+        return self.session.info.get(_UOW_DEPTH, 0) > 0
+
+    async def _commit(self) -> None:
+        # Dentro de una unidad de trabajo el commit se hace una sola vez al final
+        if (self._inUnitOfWork()):
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
+    def _invalidate(self, ids) -> None:
+        if (not ids):
+            return
+
+        if (self._inUnitOfWork()):
+            self.session.info.setdefault(_UOW_INVALIDATIONS, []).append((self.model, list(ids)))
+        else:
+            self.cache.invalidate(self.model, ids)
+
+    async def _cachedLookup(self, filters, query) -> Optional[T]:
+        # Dentro de la unidad de trabajo la sesión puede ver filas sin confirmar: ni se leen ni se guardan en la caché
+        if (self._inUnitOfWork()):
+            return await query()
+
+        # Caché de proceso (opcional): en un fallo se consulta Postgres y se guarda el resultado
+        entity = self.cache.lookup(self.model, filters)
+
+        if (entity is not None):
+            return await self.session.merge(entity, load=False)
+
+        entity = await query()
+        self.cache.put(self.model, filters, entity)
+
+        return entity
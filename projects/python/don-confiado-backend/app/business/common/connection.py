@@ -2,7 +2,8 @@ import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from .base import Base
+
+from .routing_session import RoutingSession
 
 # Cargar variables del archivo .env
 load_dotenv()
@@ -13,10 +14,71 @@ HOST = os.getenv("donconfiado_db_host")
 PORT = os.getenv("donconfiado_db_port")
 DBNAME = os.getenv("donconfiado_db_dbname")
 
+# Pool de conexiones compartido por DAOs y repositorios
+POOL_SIZE = int(os.getenv("donconfiado_db_pool_size", "10"))
+MAX_OVERFLOW = int(os.getenv("donconfiado_db_max_overflow", "20"))
+POOL_RECYCLE_SECONDS = int(os.getenv("donconfiado_db_pool_recycle", "1800"))
+POOL_PRE_PING = os.getenv("donconfiado_db_pool_pre_ping", "true").lower() == "true"
+# Log de cada sentencia SQL (solo para depurar: con tráfico real llena la consola y agrega latencia)
+DB_ECHO = os.getenv("donconfiado_db_echo", "false").lower() == "true"
+
+# Réplicas de lectura (opcional): lista "host[:puerto]" separada por comas. Usuario, clave, puerto
+# y base son los de la primaria salvo que se definan donconfiado_db_replica_user/_password/_port/_dbname.
+REPLICA_HOSTS = [host.strip() for host in os.getenv("donconfiado_db_replica_hosts", "").split(",") if host.strip()]
+REPLICA_USER = os.getenv("donconfiado_db_replica_user", USER)
+REPLICA_PASSWORD = os.getenv("donconfiado_db_replica_password", PASSWORD)
+REPLICA_PORT = os.getenv("donconfiado_db_replica_port", PORT)
+REPLICA_DBNAME = os.getenv("donconfiado_db_replica_dbname", DBNAME)
+# Después de escribir, la misma sesión lee de la primaria (ver RoutingSession)
+READ_YOUR_WRITES = os.getenv("donconfiado_db_read_your_writes", "true").lower() == "true"
+
+
+def replica_urls(driver: str) -> list:
+    urls = []
+
+    for replica in REPLICA_HOSTS:
+        host, _, port = replica.partition(":")
+        urls.append(f"postgresql+{driver}://{REPLICA_USER}:{REPLICA_PASSWORD}@{host}:{port or REPLICA_PORT}/{REPLICA_DBNAME}")
+
+    return urls
+
+
 DATABASE_URL = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}"
 print(DATABASE_URL)
-engine = create_engine(DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(bind=engine)
+engine = create_engine(
+    DATABASE_URL,
+    echo=DB_ECHO,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_pre_ping=POOL_PRE_PING,
+    pool_recycle=POOL_RECYCLE_SECONDS,
+)
+# Un pool por réplica, con la misma configuración que el de la primaria
+replica_engines = [
+    create_engine(
+        url,
+        echo=DB_ECHO,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_pre_ping=POOL_PRE_PING,
+        pool_recycle=POOL_RECYCLE_SECONDS,
+    )
+    for url in replica_urls("psycopg2")
+]
+# Lecturas a las réplicas (si hay), escrituras a la primaria: SessionLocal(read_your_writes=False)
+# para sesiones que solo leen tablas que no escriben (p. ej. la sincronización de embeddings)
+SessionLocal = sessionmaker(bind=engine, class_=RoutingSession, replicas=replica_engines, read_your_writes=READ_YOUR_WRITES)
+
+
+def primary_session() -> RoutingSession:
+    """Sesión que lee y escribe solo en la primaria (lecturas que no toleran el retraso de las réplicas)."""
+    session = SessionLocal()
+    session.use_primary()
+
+    return session
+
+def init_db(target=None):
+    # El esquema lo definen las migraciones versionadas (python -m business.migrations upgrade)
+    from business.migrations import MIGRATIONS, upgrade
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    upgrade(engine, MIGRATIONS, target=target)
\ No newline at end of file
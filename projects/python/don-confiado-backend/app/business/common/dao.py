@@ -1,40 +1,194 @@
-from typing import TypeVar, Generic, Type, List, Optional
+from contextlib import contextmanager
+from typing import TypeVar, Generic, Type, List, Optional, Dict, Any, Iterator, Sequence
+from sqlalchemy import delete, insert, inspect, select, update
 from sqlalchemy.orm import Session
 
+from .entity_cache import EntityCache, get_entity_cache, unique_keys
+
 T = TypeVar("T")  # Representa una entidad genérica (modelo SQLAlchemy)
 
+# Claves en session.info para la unidad de trabajo (compartida por todos los DAOs de la sesión)
+_UOW_DEPTH = "donconfiado_uow_depth"
+_UOW_INVALIDATIONS = "donconfiado_uow_invalidations"
+
+
+@contextmanager
+def unit_of_work(session: Session, cache: Optional[EntityCache] = None):
+    """
+    Agrupa las escrituras de los DAOs de `session` en una sola transacción: dentro del bloque
+    create/update/delete/... solo hacen flush; al salir se hace un único commit (o rollback si
+    hubo error). Los bloques anidados se unen a la transacción del bloque externo.
+    """
+    cache = cache or get_entity_cache()
+    depth = session.info.get(_UOW_DEPTH, 0)
+    session.info[_UOW_DEPTH] = depth + 1
+
+    try:
+        yield session
+
+        if (depth == 0):
+            session.commit()
+            # La caché se invalida después del commit para que nadie cachee valores sin confirmar
+            _run_invalidations(session, cache)
+    except Exception:
+        if (depth == 0):
+            session.rollback()
+            # También tras el rollback: lo que la caché tenga de esas entidades pudo quedar desactualizado
+            _run_invalidations(session, cache)
+        raise
+    finally:
+        session.info[_UOW_DEPTH] = depth
+
+
+def _run_invalidations(session, cache: EntityCache) -> None:
+    for model, ids in session.info.pop(_UOW_INVALIDATIONS, []):
+        cache.invalidate(model, ids)
+
+
 class GenericDAO(Generic[T]):
-    def __init__(self, session: Session, model: Type[T]):
+
+    def __init__(self, session: Session, model: Type[T], cache: Optional[EntityCache] = None):
         self.session = session
         self.model = model
+        self.cache = cache or get_entity_cache()
+        self._primary_key = inspect(model).primary_key[0]
+        # Solo se cachean búsquedas por llaves que identifican una sola fila
+        self._cacheable_keys = unique_keys(model)
+
+    def unitOfWork(self):
+        return unit_of_work(self.session, self.cache)
 
     def create(self, entity: T) -> T:
         self.session.add(entity)
-        self.session.commit()
+        self._commit()
         self.session.refresh(entity)
         return entity
 
+    def createMany(self, records: Sequence[Dict[str, Any]]) -> List[T]:
+        """Insert many rows with a single INSERT ... RETURNING (batched by SQLAlchemy) and one commit."""
+        if (not records):
+            return []
+
+        statement = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+        entities = list(self.session.scalars(statement, list(records)))
+        self._commit()
+        return entities
+
     def findById(self, id_value) -> Optional[T]:
-        return self.session.get(self.model, id_value)
+        return self._cachedLookup({self._primary_key.key: id_value}, lambda: self.session.get(self.model, id_value))
 
     def findBy(self, **filters) -> Optional[T]:
-        return self.session.query(self.model).filter_by(**filters).first()
+        query = lambda: self.session.query(self.model).filter_by(**filters).first()
+
+        if (tuple(sorted(filters)) not in self._cacheable_keys):
+            return query()
+
+        return self._cachedLookup(filters, query)
 
     def findAll(self) -> List[T]:
+        """Loads the whole table: prefer iterAll/findPage for large tables."""
         return self.session.query(self.model).all()
 
+    def iterAll(self, batch_size: int = 1000, options: Sequence[Any] = (), **filters) -> Iterator[T]:
+        """
+        Stream the table (optionally filtered) in primary key order using a server-side
+        cursor: only `batch_size` rows are held in memory at a time.
+        """
+        statement = (
+            select(self.model)
+            .filter_by(**filters)
+            .options(*options)
+            .order_by(self._primary_key)
+            .execution_options(yield_per=batch_size)
+        )
+
+        yield from self.session.scalars(statement)
+
+    def findPage(self, after_id=None, limit: int = 100, options: Sequence[Any] = (), **filters) -> List[T]:
+        """Keyset pagination: the next `limit` rows with primary key greater than `after_id`."""
+        statement = select(self.model).filter_by(**filters).options(*options)
+
+        if (after_id is not None):
+            statement = statement.where(self._primary_key > after_id)
+
+        return list(self.session.scalars(statement.order_by(self._primary_key).limit(limit)))
+
     def update(self, id_value, **kwargs) -> Optional[T]:
-        entity = self.findById(id_value)
+        # Un solo UPDATE ... RETURNING (sin buscar la entidad antes)
+        statement = (
+            update(self.model)
+            .where(self._primary_key == id_value)
+            .values(**kwargs)
+            .returning(self.model)
+            .execution_options(synchronize_session="fetch")
+        )
+        entity = self.session.scalars(statement).first()
         if entity:
-            for key, value in kwargs.items():
-                setattr(entity, key, value)
-            self.session.commit()
-            self.session.refresh(entity)
+            self._commit()
+            self._invalidate([id_value])
         return entity
 
+    def updateWhere(self, values: Dict[str, Any], **filters) -> int:
+        """UPDATE every row matching `filters` in one statement; returns the number of rows updated."""
+        if (not filters):
+            raise ValueError("updateWhere requires at least one filter")
+
+        statement = update(self.model).filter_by(**filters).values(**values).returning(self._primary_key)
+        ids = list(self.session.scalars(statement.execution_options(synchronize_session="fetch")))
+        self._commit()
+        self._invalidate(ids)
+        return len(ids)
+
     def delete(self, id_value) -> Optional[T]:
-        entity = self.findById(id_value)
+        statement = delete(self.model).where(self._primary_key == id_value).returning(self.model)
+        entity = self.session.scalars(statement.execution_options(synchronize_session="fetch")).first()
         if entity:
-            self.session.delete(entity)
+            # La fila ya no existe: se devuelve desligada de la sesión con los valores borrados
+            self.session.expunge(entity)
+            self._commit()
+            self._invalidate([id_value])
+        return entity
+
+    def deleteWhere(self, **filters) -> int:
+        """DELETE every row matching `filters` in one statement; returns the number of rows deleted."""
+        if (not filters):
+            raise ValueError("deleteWhere requires at least one filter")
+
+        statement = delete(self.model).filter_by(**filters).returning(self._primary_key)
+        ids = list(self.session.scalars(statement.execution_options(synchronize_session="fetch")))
+        self._commit()
+        self._invalidate(ids)
+        return len(ids)
+
+    def _inUnitOfWork(self) -> bool:
+        return self.session.info.get(_UOW_DEPTH, 0) > 0
+
+    def _commit(self) -> None:
+        # Dentro de una unidad de trabajo el commit se hace una sola vez al final
+        if (self._inUnitOfWork()):
+            self.session.flush()
+        else:
             self.session.commit()
+
+    def _invalidate(self, ids) -> None:
+        if (not ids):
+            return
+
+        if (self._inUnitOfWork()):
+            self.session.info.setdefault(_UOW_INVALIDATIONS, []).append((self.model, list(ids)))
+        else:
+            self.cache.invalidate(self.model, ids)
+
+    def _cachedLookup(self, filters, query) -> Optional[T]:
+        # Dentro de la unidad de trabajo la sesión puede ver filas sin confirmar: ni se leen ni se guardan en la caché
+        if (self._inUnitOfWork()):
+            return query()
+
+        # Caché de proceso (opcional): en un fallo se consulta Postgres y se guarda el resultado
+        entity = self.cache.get(self.session, self.model, filters)
+
+        if (entity is None):
+            entity = query()
+            self.cache.put(self.model, filters, entity)
+
         return entity
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Tuple
+
+from sqlalchemy import UniqueConstraint, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+
+CacheKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+
+def lookup_key(model, filters: Dict[str, Any]) -> CacheKey:
+    return (model.__name__, tuple(sorted(filters.items())))
+
+
+def unique_keys(model) -> set:
+    """Conjuntos de columnas que identifican una sola fila: llave primaria, columnas únicas y UniqueConstraint."""
+    mapper = inspect(model)
+    keys = {tuple(sorted(column.key for column in mapper.primary_key))}
+
+    for column in mapper.columns:
+        if (column.unique): keys.add((column.key,))
+
+    for constraint in mapper.local_table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            keys.add(tuple(sorted(column.key for column in constraint.columns)))
+
+    return keys
+
+
+class _CacheEntry:
+    __slots__ = ("values", "identity", "created_at")
+
+    def __init__(self, values: Dict[str, Any], identity: Tuple, created_at: float):
+        self.values = values
+        self.identity = identity
+        self.created_at = created_at
+
+
+class EntityCache:
+    """
+    Caché de segundo nivel (de proceso) para búsquedas de entidades por llave primaria
+    o llave única. Guarda una copia de los valores de columna, nunca la instancia de la
+    sesión: en un acierto se reconstruye la entidad y se adjunta a la sesión de quien
+    consulta con `merge(load=False)`, sin ir a Postgres.
+
+    Es opcional (`DONCONFIADO_ENTITY_CACHE=true`), con límite de entradas (LRU) y TTL.
+    Las escrituras hechas con los DAOs invalidan todas las llaves de la entidad; cambios
+    hechos por fuera (otro proceso, SQL directo) se ven como tarde al expirar el TTL.
+    No se guardan búsquedas sin resultado.
+    """
+
+    def __init__(self,
+                 max_entries: int = int(os.getenv("DONCONFIADO_ENTITY_CACHE_MAX_ENTRIES", "5000")),
+                 ttl_seconds: float = float(os.getenv("DONCONFIADO_ENTITY_CACHE_TTL_SECONDS", "300")),
+                 enabled: bool = os.getenv("DONCONFIADO_ENTITY_CACHE", "false").lower() == "true"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[CacheKey, _CacheEntry]" = OrderedDict()
+        # (modelo, llave primaria) -> llaves de búsqueda que apuntan a esa entidad
+        self._by_identity: Dict[Tuple, set] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "evictions": 0, "expirations": 0}
+        self._by_model: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def get(self, session: Session, model, filters: Dict[str, Any]):
+        """Entidad adjunta a `session` si está en caché; None si no (el llamador consulta y guarda con `put`)."""
+        entity = self.lookup(model, filters)
+
+        return None if (entity is None) else session.merge(entity, load=False)
+
+    def lookup(self, model, filters: Dict[str, Any]):
+        """Entidad desligada (detached) reconstruida desde la caché; la sesión async la adjunta con `await merge`."""
+        if (not self.enabled): return None
+
+        key = lookup_key(model, filters)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if ((entry is not None) and (time.monotonic() - entry.created_at > self.ttl_seconds)):
+                self._remove(key)
+                self._counters["expirations"] += 1
+                entry = None
+
+            if (entry is None):
+                self._counters["misses"] += 1
+                self._by_model[model.__name__]["misses"] += 1
+
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            self._by_model[model.__name__]["hits"] += 1
+            values = entry.values
+
+        entity = model(**values)
+        make_transient_to_detached(entity)
+
+        return entity
+
+    def put(self, model, filters: Dict[str, Any], entity) -> None:
+        if ((not self.enabled) or (entity is None)): return
+
+        mapper = inspect(model)
+        values = {attr.key: getattr(entity, attr.key) for attr in mapper.column_attrs}
+        identity = (model.__name__, tuple(mapper.primary_key_from_instance(entity)))
+        key = lookup_key(model, filters)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _CacheEntry(values, identity, time.monotonic())
+            self._by_identity[identity].add(key)
+            self._counters["stores"] += 1
+
+            while (len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, model, primary_keys: Iterable[Any]) -> None:
+        """Elimina todas las llaves (id, sku, documento, ...) que apuntan a las entidades dadas."""
+        if (not self.enabled): return
+
+        with self._lock:
+            for primary_key in primary_keys:
+                identity = (model.__name__, (primary_key,))
+
+                for key in list(self._by_identity.get(identity, ())):
+                    self._remove(key)
+                    self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_identity.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            lookups = stats["hits"] + stats["misses"]
+            stats.update({
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+                "by_model": {name: dict(counters) for name, counters in self._by_model.items()},
+            })
+
+            return stats
+
+    # Se llama con el lock tomado
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if (entry is None): return
+
+        keys = self._by_identity.get(entry.identity)
+        if (keys is not None):
+            keys.discard(key)
+            if (not keys): del self._by_identity[entry.identity]
+
+
+_entity_cache = EntityCache()
+
+
+def get_entity_cache() -> EntityCache:
+    return _entity_cache
@@ -0,0 +1,50 @@
+import random
+from typing import Optional, Sequence
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+
+# Claves en session.info
+_USE_PRIMARY = "donconfiado_use_primary"
+_REPLICA = "donconfiado_replica"
+
+
+class RoutingSession(Session):
+    """
+    Sesión que envía las lecturas a una réplica y todo lo demás a la primaria.
+
+    - Lectura: SELECT de Core/ORM sin FOR UPDATE (consultas de DAOs, get, refresh, carga perezosa)
+      o cualquier sentencia ejecutada con `bind_arguments={"read_only": True}` (p. ej. un text()
+      de solo lectura). Los text() sin marcar van a la primaria: pueden escribir.
+    - Cada sesión usa una sola réplica (elegida al azar) para ver un estado consistente.
+    - read_your_writes=True: después de la primera escritura de la sesión, también las lecturas
+      van a la primaria (la réplica puede ir unos segundos atrás). `use_primary()` lo fuerza
+      desde el inicio (p. ej. un request que debe ver lo que el mismo cliente acaba de escribir).
+
+    Sin réplicas configuradas todo va a la primaria, como una Session normal.
+    """
+
+    def __init__(self, bind: Optional[Engine] = None, replicas: Sequence[Engine] = (), read_your_writes: bool = True, **kwargs):
+        super().__init__(bind=bind, **kwargs)
+        self.primary = bind
+        self.replicas = list(replicas)
+        self.read_your_writes = read_your_writes
+
+    def use_primary(self) -> None:
+        self.info[_USE_PRIMARY] = True
+
+    def get_bind(self, mapper=None, clause=None, read_only: bool = False, **kwargs):
+        is_read = (not self._flushing) and (read_only or (isinstance(clause, Select) and (clause._for_update_arg is None)))
+
+        if (is_read and self.replicas and (not self.info.get(_USE_PRIMARY))):
+            if (_REPLICA not in self.info):
+                self.info[_REPLICA] = random.choice(self.replicas)
+
+            return self.info[_REPLICA]
+
+        if ((not is_read) and self.read_your_writes):
+            self.info[_USE_PRIMARY] = True
+
+        return self.primary
@@ -0,0 +1,9 @@
+import os
+
+
+# Umbral por defecto (0..1) de similitud por palabra para la búsqueda difusa de productos
+PRODUCT_SEARCH_THRESHOLD = float(os.getenv("DONCONFIADO_PRODUCT_SEARCH_THRESHOLD", "0.5"))
+
+# Función de normalización (minúsculas, sin tildes) usada por la columna generada `productos.nombre_normalizado`
+# y por las consultas. La crean las migraciones (revisión 3, business/migrations/revisions.py).
+NORMALIZE_FUNCTION = "donconfiado_normalize"
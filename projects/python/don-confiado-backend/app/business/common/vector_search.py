@@ -0,0 +1,42 @@
+import os
+
+from ..enums.vector_search_recall import VectorSearchRecall
+from ..enums.vector_search_source import VectorSearchSource
+from ..enums.vector_search_type import VectorSearchType
+
+# Tablas de embeddings (ver business/utils/embedding_sync.py)
+VECTOR_TABLES = tuple(source.table for source in VectorSearchSource)
+
+# Índice aproximado (ANN) por operador de distancia: hnsw (por defecto) o ivfflat. Se leen al aplicar
+# la migración 7; cambiarlos después requiere borrar los índices y volver a aplicarla (o una revisión nueva).
+VECTOR_INDEX_METHOD = os.getenv("DONCONFIADO_VECTOR_INDEX_METHOD", "hnsw").lower()
+HNSW_M = int(os.getenv("DONCONFIADO_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("DONCONFIADO_HNSW_EF_CONSTRUCTION", "64"))
+IVFFLAT_LISTS = int(os.getenv("DONCONFIADO_IVFFLAT_LISTS", "100"))
+
+# Recall por defecto de /api/chat_clase_03 (FAST, BALANCED, HIGH, MAX)
+VECTOR_SEARCH_RECALL = VectorSearchRecall[os.getenv("DONCONFIADO_VECTOR_SEARCH_RECALL", "BALANCED").upper()]
+
+# Parámetros de búsqueda de pgvector, locales a la transacción (set_config(..., true)): no se
+# filtran a otros requests que reciban la misma conexión del pool
+SET_SEARCH_PARAMS_SQL = "SELECT set_config('hnsw.ef_search', :ef_search, true), set_config('ivfflat.probes', :probes, true)"
+
+
+def vector_index_name(table: str, vector_search_type: VectorSearchType) -> str:
+    return f"idx_{table}_embedding_{VECTOR_INDEX_METHOD}_{vector_search_type.value.lower()}"
+
+
+def vector_index_definition(table: str, vector_search_type: VectorSearchType) -> str:
+    if (VECTOR_INDEX_METHOD == "hnsw"):
+        options = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    elif (VECTOR_INDEX_METHOD == "ivfflat"):
+        options = f"lists = {IVFFLAT_LISTS}"
+    else:
+        raise ValueError(f"DONCONFIADO_VECTOR_INDEX_METHOD no soportado: {VECTOR_INDEX_METHOD} (hnsw o ivfflat)")
+
+    return f"{table} USING {VECTOR_INDEX_METHOD} (embedding {vector_search_type.opclass}) WITH ({options})"
+
+
+def search_params(recall: VectorSearchRecall, top_k: int) -> dict:
+    # HNSW devuelve como mucho ef_search filas: nunca menos que las pedidas
+    return {"ef_search": str(max(recall.ef_search, top_k)), "probes": str(min(recall.probes, IVFFLAT_LISTS))}
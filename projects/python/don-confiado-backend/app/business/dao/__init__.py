@@ -1,5 +1,6 @@
 from .tercero_dao import TerceroDAO
 from .producto_dao import ProductoDAO
+from .async_tercero_dao import AsyncTerceroDAO
+from .async_producto_dao import AsyncProductoDAO
 
-__all__ = ['TerceroDAO', 'ProductoDAO']
-
+__all__ = ['TerceroDAO', 'ProductoDAO', 'AsyncTerceroDAO', 'AsyncProductoDAO']
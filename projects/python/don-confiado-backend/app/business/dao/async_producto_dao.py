@@ -0,0 +1,34 @@
+from business.entities.producto import Producto
+from business.common.async_dao import AsyncGenericDAO
+from business.common.text_search import PRODUCT_SEARCH_THRESHOLD
+from business.dao.producto_dao import ProductoDAO
+from sqlalchemy import select
+from typing import Any, Dict, List, Optional, Tuple
+
+class AsyncProductoDAO(AsyncGenericDAO[Producto]):
+    SYNC_DAO = ProductoDAO
+    ON_CONFLICT_OPTIONS = ProductoDAO.ON_CONFLICT_OPTIONS
+
+    def __init__(self, session):
+        super().__init__(session, Producto)
+
+    async def findBySku(self, sku: str) -> Optional[Producto]:
+        """Find a product by SKU."""
+        return await self.findBy(sku=sku)
+
+    async def findByProveedor(self, proveedor_id: int) -> List[Producto]:
+        """Find all products from a specific provider."""
+        return list(await self.session.scalars(select(Producto).where(Producto.proveedor_id == proveedor_id)))
+
+    async def findByNombre(self, nombre: str) -> List[Producto]:
+        """Find all products by name."""
+        return list(await self.session.scalars(select(Producto).where(Producto.nombre.ilike(f"%{nombre}%"))))
+
+    async def searchByNombre(self, texto: str, limit: int = 10, threshold: float = PRODUCT_SEARCH_THRESHOLD,
+                             proveedor_id: Optional[int] = None) -> List[Tuple[Producto, float]]:
+        """Ranked fuzzy search by name (see ProductoDAO.searchByNombre)."""
+        return await self._runSync("searchByNombre", texto, limit=limit, threshold=threshold, proveedor_id=proveedor_id)
+
+    async def upsertMany(self, items: List[Dict[str, Any]], on_conflict: str = "nothing") -> List[Dict[str, Any]]:
+        """Create several products with one INSERT ... ON CONFLICT and one commit (see ProductoDAO.upsertMany)."""
+        return await self._runSync("upsertMany", items, on_conflict=on_conflict)
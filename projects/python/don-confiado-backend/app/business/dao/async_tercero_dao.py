@@ -0,0 +1,15 @@
+from business.entities.tercero import Tercero
+from business.common.async_dao import AsyncGenericDAO
+from business.dao.tercero_dao import TerceroDAO
+
+class AsyncTerceroDAO(AsyncGenericDAO[Tercero]):
+    SYNC_DAO = TerceroDAO
+
+    def __init__(self, session):
+        super().__init__(session, Tercero)
+
+    async def findByNumeroDocumento(self, numero_documento: str):
+        return await self.findBy(numero_documento=numero_documento)
+
+    async def findByDocumento(self, tipo_documento: str, numero_documento: str):
+        return await self.findBy(tipo_documento=tipo_documento, numero_documento=numero_documento)
@@ -1,8 +1,19 @@
 from business.entities.producto import Producto
+from business.entities.tercero import Tercero
 from business.common.dao import GenericDAO
-from typing import List, Optional
+from business.common.text_search import NORMALIZE_FUNCTION, PRODUCT_SEARCH_THRESHOLD
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, List, Optional, Tuple
 
 class ProductoDAO(GenericDAO[Producto]):
+    # Behaviour when a SKU already exists: keep the stored product or update it with the new data
+    ON_CONFLICT_OPTIONS = ("nothing", "update")
+    # Words of the search text used as (ANDed) index conditions
+    SEARCH_MAX_WORDS = 5
+    # Document type of the providers given by document (invoice issuers are identified by NIT)
+    PROVEEDOR_TIPO_DOCUMENTO = "NIT"
+
     def __init__(self, session):
         super().__init__(session, Producto)
 
@@ -21,6 +32,172 @@ class ProductoDAO(GenericDAO[Producto]):
         return self.session.query(Producto).filter(
             Producto.nombre.ilike(f"%{nombre}%")
         ).all()
-    
 
+    def searchByNombre(self, texto: str, limit: int = 10, threshold: float = PRODUCT_SEARCH_THRESHOLD,
+                       proveedor_id: Optional[int] = None) -> List[Tuple[Producto, float]]:
+        """
+        Ranked fuzzy search by name, tolerant to typos and accents ("azucr" finds "Azúcar").
+
+        Uses the trigram GIN index on the generated `nombre_normalizado` column (see
+        business/migrations/revisions.py). Every word of 3+ letters must match a word of the
+        name with word similarity >= threshold (the index intersects the candidates per
+        word); if that finds nothing, the whole text is matched as a single phrase.
+        Returns (product, score) pairs, best first; score is the word similarity (0..1)
+        of the whole text within the product name.
+        """
+        normalize = getattr(func, NORMALIZE_FUNCTION)
+        nombre = literal_column("productos.nombre_normalizado")
+        score = func.word_similarity(normalize(texto), nombre)
+        words = [word for word in texto.split() if len(word) >= 3][:self.SEARCH_MAX_WORDS]
+
+        # The <% operator (index-backed) filters with the transaction-local threshold
+        self.session.execute(select(func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True)))
+
+        def search(conditions) -> List[Tuple[Producto, float]]:
+            statement = (
+                select(Producto, score.label("score"))
+                .where(*conditions)
+                .order_by(score.desc(), func.similarity(normalize(texto), nombre).desc(), Producto.id)
+                .limit(limit)
+            )
+
+            if (proveedor_id is not None):
+                statement = statement.where(Producto.proveedor_id == proveedor_id)
+
+            return [(producto, round(float(value), 4)) for producto, value in self.session.execute(statement)]
+
+        results = search([normalize(word).op("<%")(nombre) for word in words]) if (len(words) > 1) else []
+
+        return results or search([normalize(texto).op("<%")(nombre)])
+
+    def upsertMany(self, items: List[Dict[str, Any]], on_conflict: str = "nothing") -> List[Dict[str, Any]]:
+        """
+        Create several products with a single INSERT ... ON CONFLICT (sku) ... RETURNING and one commit.
+
+        Each item has sku, nombre, precio_venta, cantidad and optionally proveedor_id or
+        proveedor_documento (the provider's NIT; providers given by document are resolved with one query).
+        With on_conflict="update" an existing SKU takes the new name, price and provider
+        (if one was given) and adds the quantity to its stock.
+
+        Returns one outcome per item, in input order:
+        {"index", "sku", "status", "entity", "error"} where status is created, updated,
+        existing (SKU already stored), duplicate (repeated SKU in the batch) or invalid.
+        """
+        if (on_conflict not in self.ON_CONFLICT_OPTIONS):
+            raise ValueError(f"on_conflict must be one of {self.ON_CONFLICT_OPTIONS}")
+
+        report = [{"index": index, "sku": item.get("sku"), "status": None, "entity": None, "error": None} for index, item in enumerate(items)]
+        proveedores = self._resolveProveedores({item.get("proveedor_documento") for item in items} - {None, ""})
+
+        rows: Dict[str, Dict[str, Any]] = {}
+        indexes: Dict[str, int] = {}
+
+        for index, item in enumerate(items):
+            error = self._validate(item)
+
+            if (error):
+                report[index].update(status="invalid", error=error)
+                continue
+
+            if (item["sku"] in rows):
+                report[index].update(status="duplicate", error=f"SKU repetido en el lote (ítem {indexes[item['sku']]})")
+                continue
+
+            proveedor_id = item.get("proveedor_id") or proveedores.get(item.get("proveedor_documento"))
+
+            rows[item["sku"]] = {
+                "sku": item["sku"],
+                "nombre": item["nombre"],
+                "precio_venta": item["precio_venta"],
+                "cantidad": item.get("cantidad") or 0,
+                "proveedor_id": proveedor_id,
+            }
+            indexes[item["sku"]] = index
+
+        if (not rows):
+            return report
+
+        statement = insert(Producto).values(list(rows.values()))
+
+        if (on_conflict == "update"):
+            statement = statement.on_conflict_do_update(
+                index_elements=[Producto.sku],
+                set_={
+                    "nombre": statement.excluded.nombre,
+                    "precio_venta": statement.excluded.precio_venta,
+                    "cantidad": Producto.cantidad + statement.excluded.cantidad,
+                    "proveedor_id": func.coalesce(statement.excluded.proveedor_id, Producto.proveedor_id),
+                },
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[Producto.sku])
+
+        # xmax = 0 only for rows inserted by this statement (updated rows carry the locking transaction id)
+        statement = statement.returning(Producto, literal_column("xmax = 0").label("inserted"))
+
+        try:
+            results = self.session.execute(statement, execution_options={"populate_existing": True}).all()
+
+            for producto, inserted in results:
+                report[indexes[producto.sku]].update(status="created" if inserted else "updated", entity=producto)
+                # Detached before the commit so the returned values are not expired (no reload per product)
+                self.session.expunge(producto)
+
+            self._commit()
+        except Exception:
+            if (not self._inUnitOfWork()): self.session.rollback()
+            raise
+
+        # Updated SKUs may be cached with their previous values
+        self._invalidate([item["entity"].id for item in report if item["status"] == "updated"])
+
+        # With ON CONFLICT DO NOTHING the existing SKUs are not returned
+        for sku, index in indexes.items():
+            if (report[index]["status"] is None):
+                report[index].update(status="existing")
+
+        return report
+
+    def _resolveProveedores(self, documentos) -> Dict[str, int]:
+        """
+        Map numero_documento -> tercero id for the given NITs, by the (tipo_documento, numero_documento)
+        unique key: cache first (same entries as TerceroDAO.findByDocumento), then a single query.
+        """
+        resolved = {}
+        # Dentro de la unidad de trabajo no se usa la caché (ver `_cachedLookup`)
+        use_cache = not self._inUnitOfWork()
+        documento_key = lambda documento: {"tipo_documento": self.PROVEEDOR_TIPO_DOCUMENTO, "numero_documento": documento}
+
+        for documento in (documentos if use_cache else []):
+            tercero = self.cache.get(self.session, Tercero, documento_key(documento))
+            if (tercero is not None): resolved[documento] = tercero.id
+
+        pending = [documento for documento in documentos if documento not in resolved]
+
+        if (pending):
+            statement = select(Tercero).where(
+                Tercero.tipo_documento == self.PROVEEDOR_TIPO_DOCUMENTO,
+                Tercero.numero_documento.in_(pending),
+            )
+
+            for tercero in self.session.scalars(statement):
+                resolved[tercero.numero_documento] = tercero.id
+                if (use_cache): self.cache.put(Tercero, documento_key(tercero.numero_documento), tercero)
+
+        return resolved
+
+    @staticmethod
+    def _validate(item: Dict[str, Any]) -> Optional[str]:
+        if (not item.get("sku")):
+            return "SKU requerido"
+
+        if (not item.get("nombre")):
+            return "Nombre requerido"
+
+        if ((item.get("precio_venta") is None) or (item["precio_venta"] < 0)):
+            return "Precio de venta inválido"
+
+        if ((item.get("cantidad") or 0) < 0):
+            return "Cantidad inválida"
 
+        return None
@@ -7,3 +7,6 @@ class TerceroDAO(GenericDAO[Tercero]):
 
     def findByNumeroDocumento(self, numero_documento: str):
         return self.findBy(numero_documento=numero_documento)
+
+    def findByDocumento(self, tipo_documento: str, numero_documento: str):
+        return self.findBy(tipo_documento=tipo_documento, numero_documento=numero_documento)
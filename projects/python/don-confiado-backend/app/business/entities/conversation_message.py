@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Text, UniqueConstraint, TIMESTAMP
+from sqlalchemy.sql import func
+from ..common.base import Base
+
+
+class ConversationMessage(Base):
+    __tablename__ = "conversation_messages"
+    __table_args__ = (
+        UniqueConstraint("conversation_id", "seq", name="uq_conversation_messages_seq"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    conversation_id = Column(String(200), nullable=False)
+    seq = Column(Integer, nullable=False)
+    role = Column(String(10), nullable=False)
+    content = Column(Text, nullable=False)
+    fecha_creacion = Column(TIMESTAMP, nullable=True, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<ConversationMessage conversation_id='{self.conversation_id}' seq={self.seq} role='{self.role}'>"
+
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    conversation_id = Column(String(200), primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    first_seq = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(TIMESTAMP, nullable=True, server_default=func.current_timestamp())
+
+    def __repr__(self):
+        return f"<ConversationSummary conversation_id='{self.conversation_id}' first_seq={self.first_seq}>"
@@ -28,6 +28,8 @@ class Producto(Base):
     cantidad = Column(Integer, nullable=False, default=0)
     proveedor_id = Column(Integer, ForeignKey('terceros.id'), nullable=True)
     fecha_creacion = Column(TIMESTAMP, nullable=True, server_default=func.current_timestamp())
+    # La actualiza el trigger trg_*_fecha_actualizacion (migración 5)
+    fecha_actualizacion = Column(TIMESTAMP, nullable=True, server_default=func.current_timestamp())
     
     # Relationship to Tercero (provider)
     proveedor = relationship("Tercero", foreign_keys=[proveedor_id])
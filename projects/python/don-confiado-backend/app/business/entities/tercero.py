@@ -23,6 +23,8 @@ class Tercero(Base):
     email = Column(String(150), nullable=True)
     email_facturacion = Column(String(150), nullable=True)
     fecha_creacion = Column(TIMESTAMP, nullable=True, server_default=func.current_timestamp())
+    # La actualiza el trigger trg_*_fecha_actualizacion (migración 5)
+    fecha_actualizacion = Column(TIMESTAMP, nullable=True, server_default=func.current_timestamp())
 
     def __repr__(self):
         return (
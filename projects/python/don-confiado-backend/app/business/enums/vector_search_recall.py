@@ -0,0 +1,20 @@
+from enum import Enum
+
+class VectorSearchRecall(str, Enum):
+    """
+    Balance entre exhaustividad (recall) y latencia de la búsqueda vectorial aproximada:
+    candidatos que revisa un índice HNSW (hnsw.ef_search) y listas que visita uno IVFFlat (ivfflat.probes).
+    """
+
+    def __new__(cls, value: str, ef_search: int, probes: int):
+        member = str.__new__(cls, value)
+        member._value_ = value
+        member.ef_search = ef_search
+        member.probes = probes
+
+        return member
+
+    FAST = ("FAST", 20, 1)
+    BALANCED = ("BALANCED", 40, 10)
+    HIGH = ("HIGH", 100, 30)
+    MAX = ("MAX", 400, 100)
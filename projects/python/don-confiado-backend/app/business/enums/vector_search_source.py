@@ -0,0 +1,14 @@
+from enum import Enum
+
+class VectorSearchSource(str, Enum):
+
+    def __new__(cls, value: str, table: str):
+        member = str.__new__(cls, value)
+        member._value_ = value
+        # Tabla de embeddings de la fuente (ver business/utils/embedding_sync.py)
+        member.table = table
+
+        return member
+
+    PRODUCTOS = ("producto", "productos_vec")
+    PROVEEDORES = ("proveedor", "proveedores_vec")
@@ -2,13 +2,15 @@ from enum import Enum
 
 class VectorSearchType(str, Enum):
 
-    def __new__(cls, value: str, operator: str):
+    def __new__(cls, value: str, operator: str, opclass: str):
         member = str.__new__(cls, value)
         member._value_ = value
         member.operator = operator
+        # Clase de operadores de pgvector del índice que sirve a este operador
+        member.opclass = opclass
 
         return member
 
-    EUCLIDEAN_DISTANCE = ("EUCLIDEAN", "<->")
-    COSINE_DISTANCE = ("COSINE", "<=>")
-    DOT_PRODUCT_DISTANCE = ("DOT_PRODUCT", "<#>")
\ No newline at end of file
+    EUCLIDEAN_DISTANCE = ("EUCLIDEAN", "<->", "vector_l2_ops")
+    COSINE_DISTANCE = ("COSINE", "<=>", "vector_cosine_ops")
+    DOT_PRODUCT_DISTANCE = ("DOT_PRODUCT", "<#>", "vector_ip_ops")
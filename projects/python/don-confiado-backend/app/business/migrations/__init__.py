@@ -0,0 +1,4 @@
+from .runner import ConcurrentIndex, Migration, applied_versions, status, upgrade
+from .revisions import MIGRATIONS
+
+__all__ = ['ConcurrentIndex', 'Migration', 'MIGRATIONS', 'applied_versions', 'status', 'upgrade']
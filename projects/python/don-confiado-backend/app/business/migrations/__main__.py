@@ -0,0 +1,46 @@
+"""Migraciones del esquema (tablas, pgvector, búsqueda de productos e índices).
+
+Se corren al desplegar, antes de levantar el servidor, con la base configurada en `.env`.
+
+Uso (desde projects/python/don-confiado-backend/app):
+    python -m business.migrations upgrade            # aplica las revisiones pendientes
+    python -m business.migrations upgrade --to 3     # hasta la revisión 3 (inclusive)
+    python -m business.migrations status
+    python -m business.migrations sql                # SQL de las revisiones pendientes, sin aplicarlo
+"""
+import argparse
+
+from business.common.connection import engine
+from business.migrations import MIGRATIONS, status, upgrade
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("upgrade", "status", "sql"))
+    parser.add_argument("--to", type=int, default=None, help="Última revisión a aplicar")
+    args = parser.parse_args()
+
+    if (args.command == "upgrade"):
+        applied = upgrade(engine, MIGRATIONS, target=args.to)
+        print({"applied": [migration.version for migration in applied]})
+        return
+
+    revisions = status(engine, MIGRATIONS)
+
+    if (args.command == "status"):
+        for revision in revisions:
+            print(f"{revision['version']:04d} {revision['name']:<24} {'aplicada' if revision['applied'] else 'pendiente'}")
+        return
+
+    pending = {revision["version"] for revision in revisions if not revision["applied"]}
+
+    for migration in MIGRATIONS:
+        if ((migration.version not in pending) or ((args.to is not None) and (migration.version > args.to))): continue
+
+        print(f"-- {migration.version:04d} {migration.name}" + ("" if migration.transactional else " (fuera de transacción)"))
+        for step in migration.steps:
+            print(str(step).strip() + ";")
+
+
+if (__name__ == "__main__"):
+    main()
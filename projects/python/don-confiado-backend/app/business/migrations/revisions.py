@@ -0,0 +1,190 @@
+from ..common.vector_search import VECTOR_TABLES, vector_index_definition, vector_index_name
+from ..enums.vector_search_type import VectorSearchType
+from .runner import ConcurrentIndex, Migration
+
+# Revisiones del esquema, en orden. Una revisión aplicada no se modifica: los cambios van en una nueva.
+# El SQL queda escrito aquí (no se genera desde las entidades) para que cada revisión sea reproducible.
+
+MIGRATIONS = [
+    Migration(1, "esquema_relacional", [
+        """
+        CREATE TABLE IF NOT EXISTS terceros (
+            id SERIAL PRIMARY KEY,
+            tipo_documento VARCHAR(5) NOT NULL,
+            numero_documento VARCHAR(30) NOT NULL,
+            razon_social VARCHAR(200),
+            nombres VARCHAR(100),
+            apellidos VARCHAR(100),
+            telefono_fijo VARCHAR(20),
+            telefono_celular VARCHAR(20),
+            tipo_tercero VARCHAR(20) NOT NULL,
+            direccion TEXT,
+            email VARCHAR(150),
+            email_facturacion VARCHAR(150),
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT uq_documento UNIQUE (tipo_documento, numero_documento),
+            CONSTRAINT terceros_tipo_documento_check CHECK (tipo_documento IN ('CC', 'NIT', 'CE')),
+            CONSTRAINT terceros_tipo_tercero_check CHECK (tipo_tercero IN ('cliente', 'proveedor', 'empleado'))
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS productos (
+            id SERIAL PRIMARY KEY,
+            sku VARCHAR(50) NOT NULL,
+            nombre VARCHAR(200) NOT NULL,
+            precio_venta NUMERIC(15, 2) NOT NULL,
+            cantidad INTEGER NOT NULL,
+            proveedor_id INTEGER REFERENCES terceros (id),
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT productos_sku_key UNIQUE (sku),
+            CONSTRAINT productos_cantidad_check CHECK (cantidad >= 0),
+            CONSTRAINT productos_precio_venta_check CHECK (precio_venta >= 0)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS conversation_messages (
+            id BIGSERIAL PRIMARY KEY,
+            conversation_id VARCHAR(200) NOT NULL,
+            seq INTEGER NOT NULL,
+            role VARCHAR(10) NOT NULL,
+            content TEXT NOT NULL,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT uq_conversation_messages_seq UNIQUE (conversation_id, seq)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            conversation_id VARCHAR(200) PRIMARY KEY,
+            summary TEXT NOT NULL,
+            first_seq INTEGER NOT NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+
+    # Antes se creaba desde POST /api/setup_pgvector
+    Migration(2, "pgvector", [
+        "CREATE EXTENSION IF NOT EXISTS vector",
+        """
+        CREATE TABLE IF NOT EXISTS productos_vec (
+            id BIGSERIAL PRIMARY KEY,
+            source_id INTEGER REFERENCES productos(id) ON DELETE CASCADE,
+            chunk_index INTEGER DEFAULT 0,
+            content TEXT,
+            embedding vector(768),
+            metadata JSONB,
+            created_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE (source_id, chunk_index)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_productos_vec_embedding
+        ON productos_vec USING ivfflat (embedding vector_l2_ops) WITH (lists = 100)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS proveedores_vec (
+            id BIGSERIAL PRIMARY KEY,
+            source_id INTEGER REFERENCES terceros(id) ON DELETE CASCADE,
+            chunk_index INTEGER DEFAULT 0,
+            content TEXT,
+            embedding vector(768),
+            metadata JSONB,
+            created_at TIMESTAMP DEFAULT NOW(),
+            UNIQUE (source_id, chunk_index)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_proveedores_vec_embedding
+        ON proveedores_vec USING ivfflat (embedding vector_l2_ops) WITH (lists = 100)
+        """,
+    ]),
+
+    # Búsqueda difusa de productos (ver business/common/text_search.py); antes POST /api/setup_product_search.
+    # unaccent no es IMMUTABLE; el envoltorio con diccionario explícito sí se puede usar en columnas generadas.
+    # En Supabase las extensiones viven en el esquema `extensions`.
+    Migration(3, "busqueda_productos", [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        """
+        CREATE OR REPLACE FUNCTION donconfiado_normalize(value text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        SET search_path = public, extensions, pg_catalog
+        AS $$ SELECT lower(unaccent('unaccent'::regdictionary, value)) $$
+        """,
+        # La columna no está mapeada en la entidad Producto: la genera Postgres y solo la usan las búsquedas
+        """
+        ALTER TABLE productos ADD COLUMN IF NOT EXISTS nombre_normalizado text
+        GENERATED ALWAYS AS (donconfiado_normalize(nombre)) STORED
+        """,
+    ]),
+
+    # Índices de las columnas por las que filtran las búsquedas, la sincronización y la paginación.
+    # CONCURRENTLY: se construyen sin bloquear las escrituras de una base en uso.
+    Migration(4, "indices_consultas", [
+        # searchByNombre (columna normalizada) y findByNombre (ILIKE '%texto%')
+        ConcurrentIndex("idx_productos_nombre_normalizado_trgm", "productos USING gin (nombre_normalizado gin_trgm_ops)"),
+        ConcurrentIndex("idx_productos_nombre_trgm", "productos USING gin (nombre gin_trgm_ops)"),
+        # findByProveedor y findPage/iterAll(proveedor_id=...) ordenados por id
+        ConcurrentIndex("idx_productos_proveedor_id_id", "productos (proveedor_id, id)"),
+        # Reemplazado por el anterior (lo creaba /api/setup_product_search)
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_productos_proveedor_id",
+        # iterAll/findPage(tipo_tercero=...) ordenados por id (sincronización de proveedores, catálogo)
+        ConcurrentIndex("idx_terceros_tipo_tercero_id", "terceros (tipo_tercero, id)"),
+        # findByNumeroDocumento (uq_documento empieza por tipo_documento)
+        ConcurrentIndex("idx_terceros_numero_documento", "terceros (numero_documento)"),
+    ], transactional=False),
+
+    # Sincronización incremental de embeddings (ver business/utils/embedding_sync.py): el hash del
+    # contenido vectorizado se guarda junto a cada fila *_vec, y fecha_actualizacion (mantenida por
+    # un trigger, también para UPDATEs hechos fuera de la aplicación) permite sincronizar "desde".
+    # Sin condición WHEN: Postgres no permite OLD.*/NEW.* en un trigger BEFORE de una tabla con columnas
+    # generadas (productos.nombre_normalizado); un UPDATE sin cambios solo hace que la fila se relea.
+    Migration(5, "sincronizacion_incremental", [
+        "ALTER TABLE productos_vec ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+        "ALTER TABLE proveedores_vec ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+        "ALTER TABLE productos ADD COLUMN IF NOT EXISTS fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+        "ALTER TABLE terceros ADD COLUMN IF NOT EXISTS fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+        """
+        CREATE OR REPLACE FUNCTION donconfiado_touch_fecha_actualizacion() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            NEW.fecha_actualizacion := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END
+        $$
+        """,
+        "DROP TRIGGER IF EXISTS trg_productos_fecha_actualizacion ON productos",
+        """
+        CREATE TRIGGER trg_productos_fecha_actualizacion BEFORE UPDATE ON productos
+        FOR EACH ROW
+        EXECUTE FUNCTION donconfiado_touch_fecha_actualizacion()
+        """,
+        "DROP TRIGGER IF EXISTS trg_terceros_fecha_actualizacion ON terceros",
+        """
+        CREATE TRIGGER trg_terceros_fecha_actualizacion BEFORE UPDATE ON terceros
+        FOR EACH ROW
+        EXECUTE FUNCTION donconfiado_touch_fecha_actualizacion()
+        """,
+    ]),
+
+    # POST /api/sync_embeddings?since=... (filas modificadas desde una fecha)
+    Migration(6, "indices_fecha_actualizacion", [
+        ConcurrentIndex("idx_productos_fecha_actualizacion", "productos (fecha_actualizacion)"),
+        ConcurrentIndex("idx_terceros_fecha_actualizacion", "terceros (fecha_actualizacion)"),
+    ], transactional=False),
+
+    # Un índice ANN por operador de distancia (VectorSearchType): un índice solo sirve a las consultas
+    # con el operador de su clase de operadores; sin él, coseno y producto punto recorren toda la tabla.
+    # Método y parámetros según DONCONFIADO_VECTOR_INDEX_METHOD (ver business/common/vector_search.py).
+    Migration(7, "indices_vectoriales", [
+        *[
+            ConcurrentIndex(vector_index_name(table, vector_search_type), vector_index_definition(table, vector_search_type))
+            for table in VECTOR_TABLES
+            for vector_search_type in VectorSearchType
+        ],
+        # Reemplazados por los anteriores (ivfflat L2 de la revisión 2)
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_productos_vec_embedding",
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_proveedores_vec_embedding",
+    ], transactional=False),
+]
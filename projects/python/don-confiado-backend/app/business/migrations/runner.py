@@ -0,0 +1,148 @@
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+# Llave del advisory lock de Postgres: dos despliegues simultáneos no aplican migraciones a la vez
+MIGRATIONS_LOCK_KEY = 7_341_001
+MIGRATIONS_TABLE = "schema_migrations"
+
+MIGRATIONS_TABLE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INTEGER
+)
+"""
+
+
+class ConcurrentIndex:
+    """
+    Paso `CREATE INDEX CONCURRENTLY` (no bloquea escrituras en la tabla). Un intento previo
+    fallido deja el índice INVALID: se borra antes de volver a crearlo, así el paso es idempotente.
+    """
+
+    def __init__(self, name: str, definition: str):
+        self.name = name
+        self.definition = definition
+
+    def __call__(self, connection: Connection) -> None:
+        valid = connection.execute(text("""
+            SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND pg_catalog.pg_table_is_visible(c.oid)
+        """), {"name": self.name}).scalar()
+
+        if (valid is False):
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.name}"))
+
+        connection.execute(text(str(self)))
+
+    def __str__(self) -> str:
+        return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {self.definition}"
+
+
+Step = Union[str, Callable[[Connection], None]]
+
+
+@dataclass
+class Migration:
+    """
+    Revisión del esquema. Los pasos deben ser idempotentes (IF NOT EXISTS, ...): así una base
+    creada antes de las migraciones (create_all, /api/setup_pgvector) se pone al día sin errores.
+
+    transactional=False para pasos que Postgres no permite dentro de una transacción
+    (CREATE INDEX CONCURRENTLY): cada paso se confirma por separado.
+    """
+    version: int
+    name: str
+    steps: Sequence[Step] = field(default_factory=list)
+    transactional: bool = True
+
+
+def _run_step(connection: Connection, step: Step) -> None:
+    if (callable(step)):
+        step(connection)
+    else:
+        connection.execute(text(step))
+
+
+def _record(connection: Connection, migration: Migration, started: float) -> None:
+    connection.execute(
+        text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name, duration_ms) VALUES (:version, :name, :duration_ms)"),
+        {"version": migration.version, "name": migration.name, "duration_ms": int((time.perf_counter() - started) * 1000)},
+    )
+
+
+def _check_order(migrations: Sequence[Migration]) -> None:
+    versions = [migration.version for migration in migrations]
+
+    if (versions != sorted(set(versions))):
+        raise ValueError(f"Las versiones de las migraciones deben ser únicas y crecientes: {versions}")
+
+
+def applied_versions(connection: Connection) -> Dict[int, str]:
+    connection.execute(text(MIGRATIONS_TABLE_DDL))
+
+    return dict(connection.execute(text(f"SELECT version, name FROM {MIGRATIONS_TABLE} ORDER BY version")).all())
+
+
+def status(engine: Engine, migrations: Sequence[Migration]) -> List[dict]:
+    """Estado de cada revisión (aplicada o pendiente)."""
+    _check_order(migrations)
+
+    with engine.begin() as connection:
+        applied = applied_versions(connection)
+
+    return [
+        {"version": migration.version, "name": migration.name, "applied": migration.version in applied}
+        for migration in migrations
+    ]
+
+
+def upgrade(engine: Engine, migrations: Sequence[Migration], target: Optional[int] = None) -> List[Migration]:
+    """
+    Aplica en orden las revisiones pendientes (hasta `target`, inclusive). Cada revisión
+    transaccional se aplica y se registra en una sola transacción. Devuelve las aplicadas.
+    """
+    _check_order(migrations)
+    done: List[Migration] = []
+
+    with engine.connect() as lock_connection:
+        lock_connection = lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        lock_connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+
+        try:
+            with engine.begin() as connection:
+                applied = applied_versions(connection)
+
+            for migration in migrations:
+                if ((target is not None) and (migration.version > target)): break
+                if (migration.version in applied): continue
+
+                print(f"🛠️ Migración {migration.version:04d} {migration.name}")
+                started = time.perf_counter()
+
+                if (migration.transactional):
+                    with engine.begin() as connection:
+                        for step in migration.steps:
+                            _run_step(connection, step)
+
+                        _record(connection, migration, started)
+                else:
+                    with engine.connect() as connection:
+                        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+
+                        for step in migration.steps:
+                            _run_step(connection, step)
+
+                        _record(connection, migration, started)
+
+                done.append(migration)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+
+    return done
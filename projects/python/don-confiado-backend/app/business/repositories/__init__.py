@@ -0,0 +1,5 @@
+from .entity_repository import EntityRepository, get_entity_repository
+from .sql_repository import SqlAlchemyRepository
+from .supabase_repository import SupabaseRestRepository
+
+__all__ = ['EntityRepository', 'get_entity_repository', 'SqlAlchemyRepository', 'SupabaseRestRepository']
@@ -0,0 +1,73 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+
+def serialize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Fila con tipos serializables a JSON (igual a lo que devuelve la API REST de Supabase)."""
+    values = {}
+
+    for key, value in row.items():
+        if isinstance(value, Decimal): value = float(value)
+        elif isinstance(value, (datetime, date)): value = value.isoformat()
+
+        values[key] = value
+
+    return values
+
+
+class EntityRepository(ABC):
+    """
+    Camino único de escritura para los servicios: inserta registros (dict) en una tabla
+    y devuelve las filas creadas (con id y valores por defecto) como dicts serializables.
+    """
+
+    # Tablas que se pueden escribir desde los servicios
+    TABLES = ("productos", "terceros")
+
+    @abstractmethod
+    def insert_many(self, table: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inserta varios registros en una sola operación (una sentencia / una petición)."""
+
+    def insert(self, table: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        rows = self.insert_many(table, [record])
+
+        return rows[0] if rows else {}
+
+    def is_configured(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+    def _check_table(self, table: str) -> None:
+        if (table not in self.TABLES): raise ValueError(f"Tabla no soportada: {table}")
+
+
+_repository: Optional[EntityRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_entity_repository() -> EntityRepository:
+    """
+    Repositorio del proceso según DONCONFIADO_WRITE_BACKEND:
+    'sql' (por defecto, pool de SQLAlchemy) o 'supabase' (API REST con pool HTTP keep-alive).
+    """
+    global _repository
+
+    if (_repository is None):
+        with _repository_lock:
+            if (_repository is None):
+                backend = os.getenv("DONCONFIADO_WRITE_BACKEND", "sql").lower()
+
+                if (backend == "supabase"):
+                    from business.repositories.supabase_repository import SupabaseRestRepository
+                    _repository = SupabaseRestRepository()
+                else:
+                    from business.repositories.sql_repository import SqlAlchemyRepository
+                    _repository = SqlAlchemyRepository()
+
+    return _repository
@@ -0,0 +1,62 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from business.entities.producto import Producto
+from business.entities.tercero import Tercero
+from business.repositories.entity_repository import EntityRepository, serialize_row
+
+
+class SqlAlchemyRepository(EntityRepository):
+    """Escritura directa a Postgres usando el pool de conexiones de `SessionLocal`."""
+
+    MODELS = {
+        "productos": Producto,
+        "terceros": Tercero,
+    }
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._session_factory = session_factory
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        # Import diferido: la conexión se configura desde variables de entorno al importarse
+        if (self._session_factory is None):
+            from business.common.connection import SessionLocal
+            self._session_factory = SessionLocal
+
+        return self._session_factory
+
+    def insert_many(self, table: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._check_table(table)
+        if (not records): return []
+
+        model_table = self.MODELS[table].__table__
+        session = self.session_factory()
+
+        # Registros con las mismas columnas van juntos: SQLAlchemy los envía como INSERT ... VALUES (...), (...) RETURNING *
+        # ("insertmanyvalues") y devuelve las filas en el orden de los parámetros
+        groups: Dict[tuple, List[int]] = {}
+        for index, record in enumerate(records):
+            groups.setdefault(tuple(sorted(record)), []).append(index)
+
+        rows: List[Dict[str, Any]] = [{}] * len(records)
+
+        try:
+            for indexes in groups.values():
+                statement = insert(model_table).returning(*model_table.c, sort_by_parameter_order=True)
+                result = session.execute(statement, [records[i] for i in indexes])
+
+                for index, row in zip(indexes, result.mappings().all()):
+                    rows[index] = serialize_row(dict(row))
+
+            # Un solo commit por lote
+            session.commit()
+
+            return rows
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
@@ -0,0 +1,62 @@
+import atexit
+import os
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from business.repositories.entity_repository import EntityRepository
+
+
+class SupabaseRestRepository(EntityRepository):
+    """
+    Adaptador opcional sobre la API REST de Supabase (PostgREST).
+
+    Reutiliza un único cliente HTTP con conexiones keep-alive (en lugar de crear un
+    cliente por petición) y envía las inserciones por lote en una sola petición.
+    """
+
+    def __init__(self,
+                 url: Optional[str] = None,
+                 key: Optional[str] = None,
+                 max_connections: int = int(os.getenv("DONCONFIADO_SUPABASE_MAX_CONNECTIONS", "20")),
+                 max_keepalive: int = int(os.getenv("DONCONFIADO_SUPABASE_MAX_KEEPALIVE", "10")),
+                 timeout_seconds: float = float(os.getenv("DONCONFIADO_SUPABASE_TIMEOUT_SECONDS", "10"))):
+        self.url = (url or os.getenv("SUPABASE_URL") or "").rstrip("/")
+        self.key = key or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive, keepalive_expiry=60)
+        self._timeout = timeout_seconds
+        self._client: Optional[httpx.Client] = None
+
+    def is_configured(self) -> bool:
+        return bool(self.url and self.key)
+
+    @property
+    def client(self) -> httpx.Client:
+        if (self._client is None):
+            self._client = httpx.Client(
+                base_url=f"{self.url}/rest/v1",
+                headers={
+                    "apikey": self.key,
+                    "Authorization": f"Bearer {self.key}",
+                    "Prefer": "return=representation",
+                },
+                limits=self._limits,
+                timeout=self._timeout,
+            )
+            atexit.register(self.close)
+
+        return self._client
+
+    def insert_many(self, table: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._check_table(table)
+        if (not records): return []
+
+        response = self.client.post(f"/{table}", json=records)
+        response.raise_for_status()
+
+        return response.json()
+
+    def close(self) -> None:
+        if (self._client is not None):
+            self._client.close()
+            self._client = None
@@ -1,11 +1,14 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-
 from endpoints.dto.message_dto import (ChatRequestDTO)
 from business.utils.llm_utils import LLMUtils
+from business.utils.llm_registry import DEFAULT_CHAT_MODEL, get_llm_registry
+from business.utils.response_cache import ResponseCache
+
+# Respuestas a preguntas frecuentes; solo se cachean turnos sin historial previo del usuario
+RESPONSE_CACHE: ResponseCache = ResponseCache("chat_v1")
 
 class BasicService():
 
-    def process(self, request: ChatRequestDTO, llm: ChatGoogleGenerativeAI, append_human_message: bool=True, user_intention: str=None) -> dict[str, any]:
+    async def process(self, request: ChatRequestDTO, model_name: str=DEFAULT_CHAT_MODEL, append_human_message: bool=True, user_intention: str=None, prior_history: str=None) -> dict[str, any]:
         system_prompt = """ROLE:
             Don Confiado, un asistente de inteligencia artificial que actúa como un asesor
             empresarial confiable, experimentado y cercano. Es el socio virtual de las
@@ -77,8 +80,9 @@ class BasicService():
             - Sé amigable y profesional en cada respuesta.
             """
 
-        # Construcción de historial y prompt como texto
-        history_text = LLMUtils._history_as_text(request.user_id)
+        # Construcción de historial y prompt como texto; `prior_history` es el historial tomado antes de
+        # registrar el mensaje actual (cuando quien llama ya lo registró, p. ej. /api/chat_v1.1)
+        history_text = LLMUtils._history_as_text(request.user_id) if prior_history is None else prior_history
         user_input = request.message
         if (append_human_message): LLMUtils._append_message(request.user_id, "human", user_input)
 
@@ -89,9 +93,18 @@ class BasicService():
             f"Asistente:"
         )
 
-        # Respuesta final directa del modelo
-        ai_result = llm.invoke(prompt_text)
-        reply = getattr(ai_result, "content", str(ai_result))
+        # Sin turnos previos la respuesta solo depende del mensaje: se puede servir desde la caché
+        cache_lookup = await RESPONSE_CACHE.lookup(user_input, model_name) if not history_text else None
+        if (cache_lookup is None): RESPONSE_CACHE.skip()
+
+        if (cache_lookup is not None and cache_lookup.hit):
+            reply = cache_lookup.value
+        else:
+            # Respuesta final directa del modelo
+            ai_result = await get_llm_registry().ainvoke(prompt_text, model_name)
+            reply = getattr(ai_result, "content", str(ai_result))
+            if (cache_lookup is not None): RESPONSE_CACHE.store(cache_lookup, reply)
+
         LLMUtils._append_message(request.user_id, "ai", reply)
 
         resp: dict[str, any] = {
@@ -1,55 +1,123 @@
-import os
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from supabase import create_client, Client
+from starlette.concurrency import run_in_threadpool
 
+from business.repositories import get_entity_repository
 from business.utils.llm_utils import LLMUtils
+from business.utils.conversation_memory import PROMPT_HISTORY_MAX_TOKENS
+from business.utils.llm_registry import DEFAULT_CHAT_MODEL, get_llm_registry
+from business.utils.extraction_utils import clean_text, extraction_args
+from business.utils.reply_templates import LLM_REPLY_PHRASING, render_reply
 from endpoints.dto.message_dto import (ChatRequestDTO)
 
+TIPOS_DOCUMENTO = ["CC", "NIT", "CE"]
+REQUIRED_FIELDS = ["tipo_documento", "numero_documento", "razon_social", "nombres", "apellidos"]
+OPTIONAL_FIELDS = ["telefono_fijo", "telefono_celular", "direccion", "email"]
+
+# Una sola llamada estructurada: campos extraídos + campos que el usuario aún no ha dado
+EXTRACTION_SCHEMA = {
+    "title": "DistribuidorData",
+    "description": (
+        "Extra unicamente los campos que el usuario proporciona. No inventes valores. "
+        "Lista en missing_fields los requisitos que no aparecen."
+    ),
+    "type": "object",
+    "properties": {
+        "tipo_documento": {
+            "type": "string",
+            "enum": TIPOS_DOCUMENTO,
+            "description": "Tipo de documento: CC, NIT o CE"
+        },
+        "numero_documento": {"type": "string"},
+        "razon_social": {"type": "string"},
+        "nombres": {"type": "string"},
+        "apellidos": {"type": "string"},
+        "telefono_fijo": {"type": "string"},
+        "telefono_celular": {"type": "string"},
+        "direccion": {"type": "string"},
+        "email": {"type": "string"},
+        "missing_fields": {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "enum": REQUIRED_FIELDS
+            }
+        }
+    },
+    "required": ["missing_fields"],
+    "additionalProperties": False,
+}
+
+
+def _validate_distributor(extracted: dict) -> tuple[dict, list[str]]:
+    """
+    Requisitos: tipo_documento (CC/NIT/CE), numero_documento y razon_social o (nombres y apellidos).
+    Devuelve el registro normalizado y los campos faltantes.
+    """
+    record: dict = {}
+    missing_fields: list[str] = []
+
+    tipo_documento = (clean_text(extracted.get("tipo_documento")) or "").upper().replace(".", "")
+
+    if (tipo_documento in TIPOS_DOCUMENTO): record["tipo_documento"] = tipo_documento
+    else: missing_fields.append("tipo_documento")
+
+    # Solo dígitos y el guion del dígito de verificación (NIT 900.123.456-7 -> 900123456-7)
+    numero_documento = "".join(ch for ch in (clean_text(extracted.get("numero_documento")) or "") if ch.isdigit() or ch == "-").strip("-")
+
+    if (numero_documento): record["numero_documento"] = numero_documento
+    else: missing_fields.append("numero_documento")
+
+    for field in ("razon_social", "nombres", "apellidos", *OPTIONAL_FIELDS):
+        value = clean_text(extracted.get(field))
+        if (value is not None): record[field] = value
+
+    if (not record.get("razon_social") and not (record.get("nombres") and record.get("apellidos"))):
+        # Persona natural (CC/CE): nombres y apellidos; empresa (NIT o sin tipo): razón social
+        if (tipo_documento in ("CC", "CE")):
+            missing_fields += [field for field in ("nombres", "apellidos") if not record.get(field)]
+        else:
+            missing_fields.append("razon_social")
+
+    return record, missing_fields
+
 class DistributorService():
 
-    def create(self, request: ChatRequestDTO, llm: ChatGoogleGenerativeAI) -> dict[str, any]:
-        # Rama 'Create_distribuitor': validar completitud y luego extraer datos     
-        # 1) Verificación de completitud
-        completeness_schema = {
-            "title": "DistribuidorCompleteness",
-            "type": "object",
-            "properties": {
-                "is_complete": {"type": "boolean"},
-                "missing_fields": {
-                    "type": "array",
-                    "items": {
-                        "type": "string",
-                        "enum": [
-                            "tipo_documento",
-                            "numero_documento",
-                            "razon_social",
-                            "nombres",
-                            "apellidos"
-                        ]
-                    }
-                }
-            },
-            "required": ["is_complete", "missing_fields"],
-            "additionalProperties": False,
-        }       
-
-        completeness_model = llm.with_structured_output(completeness_schema)
-        completeness_text = (
-            "Evalúa si el mensaje contiene la información completa para crear un distribuidor. "
+    async def _reply(self, request: ChatRequestDTO, model_name: str, prompt_text: str, template_status: str, **values) -> str:
+        # Mensajes de estado fijos: plantilla sin llamada al modelo, salvo que se active la redacción con LLM
+        if (LLM_REPLY_PHRASING):
+            reply_obj = await get_llm_registry().ainvoke(prompt_text, model_name)
+            reply_text = getattr(reply_obj, "content", str(reply_obj))
+        else:
+            reply_text = render_reply("distribuidor", template_status, **values)
+
+        LLMUtils._append_message(request.user_id, "ai", reply_text)
+
+        return reply_text
+
+    async def create(self, request: ChatRequestDTO, model_name: str = DEFAULT_CHAT_MODEL) -> dict[str, any]:
+        # Rama 'Create_distribuitor': una sola extracción (campos + faltantes) y validación local
+        llm_registry = get_llm_registry()
+
+        history_text = LLMUtils._history_as_text(request.user_id, max_tokens=PROMPT_HISTORY_MAX_TOKENS)
+        extract_text = (
+            "Extrae los campos del distribuidor que el usuario quiere crear. No inventes datos. "
             "Requisitos: tipo_documento (CC/NIT/CE), numero_documento y (razon_social) o (nombres y apellidos). "
-            "Devuelve is_complete=true solo si todos los requisitos están presentes en el mensaje. "
-            "Si falta algo, lista los campos faltantes en missing_fields.") + f"\n\nMensaje del usuario: {request.message}"     
-      
-        completeness = completeness_model.invoke(completeness_text)
-        print(completeness)    
+            "Usa el historial solo para completar datos del mismo distribuidor. "
+            "Si un campo no está presente, omítelo (no devuelvas null); si es un requisito, inclúyelo en missing_fields.\n\n"
+            f"Historial:\n{history_text}\n\n"
+            f"Mensaje del usuario: {request.message}"
+        )
+
+        extracted_payload = await llm_registry.ainvoke(extract_text, model_name, schema=EXTRACTION_SCHEMA)
+        print(extracted_payload)
+
+        extracted = extraction_args(extracted_payload)
+        extracted.pop("missing_fields", None)
 
-        is_complete = bool(completeness[0]["args"].get("is_complete", False))
-        missing_fields = completeness[0]["args"].get("missing_fields", []) or []
+        # Validación determinística: los faltantes se calculan aquí, no se confía en el modelo
+        record, missing_fields = _validate_distributor(extracted)
 
-        if not is_complete:
+        if (missing_fields):
             # Solicitud de datos faltantes (prompt plano + memoria)
-            history_text = LLMUtils._history_as_text(request.user_id)
             user_input = request.message        
             request_missing_text = (
                 "ROLE: Don Confiado, asesor empresarial amable y claro.\n"
@@ -60,10 +128,7 @@ class DistributorService():
                 f"Asistente:"
             )       
 
-            reply_obj = llm.invoke(request_missing_text)
-            reply_text = getattr(reply_obj, "content", str(reply_obj))
-
-            LLMUtils._append_message(request.user_id, "ai", reply_text)     
+            reply_text = await self._reply(request, model_name, request_missing_text, "need_more_data", missing_fields=missing_fields)
             
             return {
                 "userintention": "Create_distribuitor",
@@ -71,67 +136,11 @@ class DistributorService():
                 "missing_fields": missing_fields,
                 "reply": reply_text,
             }
-            
-        # 2) Extracción de datos (solo cuando está completo)
-        extraction_schema = {
-            "title": "DistribuidorData",
-            "description": (
-                "Extra unicamente los campos que el usuario proporciona. No inventes valores."
-            ),
-            "type": "object",
-            "properties": {
-                "tipo_documento": {
-                    "type": "string",
-                    "enum": ["CC", "NIT", "CE"],
-                    "description": "Tipo de documento: CC, NIT o CE"
-                },
-                "numero_documento": {"type": "string"},
-                "razon_social": {"type": "string"},
-                "nombres": {"type": "string"},
-                "apellidos": {"type": "string"},
-                "telefono_fijo": {"type": "string"},
-                "telefono_celular": {"type": "string"},
-                "direccion": {"type": "string"},
-                "email": {"type": "string"}
-            },
-            "additionalProperties": False,
-        }
-
-        extractor = llm.with_structured_output(extraction_schema)
-        extract_text = (
-            "Extrae los campos del distribuidor desde el mensaje del usuario. No inventes datos. "
-            "Si un campo no está presente, omítelo (no devuelvas null).\n\n"
-            f"Mensaje del usuario: {request.message}"
-        )
-
-        extracted_payload = extractor.invoke(extract_text)
-        print(extracted_payload)
-
-        extracted = extracted_payload[0]["args"] if isinstance(extracted_payload, list) else extracted_payload
-        tipo_documento = extracted.get("tipo_documento")
-        numero_documento = extracted.get("numero_documento")
-        razon_social = extracted.get("razon_social")
-        nombres = extracted.get("nombres")
-        apellidos = extracted.get("apellidos")      
         
-        # Sanitizar registro (evitar null, vacíos y "null")
-        def _valid_value(value: object) -> bool:
-            if value is None: return False      
-            text = str(value).strip()       
-            
-            if text == "": return False     
-            if text.lower() == "null": return False     
-            
-            return True     
-        
-        # Validación credenciales Supabase
-        supabase_url = os.getenv("SUPABASE_URL")
-        print(f"supabase_url={supabase_url}")       
-        
-        upabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-        print(f"supabase_key={supabase_key}")       
-        
-        if not supabase_url or not supabase_key:
+        # Repositorio de escritura (pool de SQLAlchemy por defecto; Supabase REST si así se configura)
+        repository = get_entity_repository()
+
+        if not repository.is_configured():
             # Respuesta breve informando falta de credenciales
             user_input = request.message        
             creds_text = (
@@ -141,10 +150,7 @@ class DistributorService():
                 f"Usuario: {user_input}\n"
                 f"Asistente:"
             )       
-            reply_obj = llm.invoke(creds_text)
-            reply_text = getattr(reply_obj, "content", str(reply_obj))
-            
-            LLMUtils._append_message(request.user_id, "ai", reply_text)     
+            reply_text = await self._reply(request, model_name, creds_text, "missing_credentials")
             
             return {
                 "userintention": "Create_distribuitor",
@@ -153,20 +159,11 @@ class DistributorService():
                 "reply": reply_text,
                 "extracted": extracted,
             }       
-        # Inicialización cliente Supabase
-        global _supabase_client
-
-        try:
-            _supabase_client
-        except NameError:
-            _supabase_client = create_client(supabase_url, supabase_key)        
-        record = {k: v for k, v in extracted.items() if _valid_value(v)}
         record["tipo_tercero"] = "proveedor"        
         
         try:
-            # Inserción en Supabase y confirmación
-            response = _supabase_client.table("terceros").insert(record).execute()
-            data = getattr(response, "data", None)      
+            # Inserción y confirmación
+            data = await run_in_threadpool(repository.insert_many, "terceros", [record])
             user_input = request.message        
             confirm_text = (
                 "ROLE: Don Confiado, asesor empresarial.\n"
@@ -174,10 +171,7 @@ class DistributorService():
                 f"Usuario: {user_input}\n"
                 f"Asistente:"
             )
-            reply_obj = llm.invoke(confirm_text)
-            reply_text = getattr(reply_obj, "content", str(reply_obj))
-
-            LLMUtils._append_message(request.user_id, "ai", reply_text)
+            reply_text = await self._reply(request, model_name, confirm_text, "created", nombre=record.get("razon_social") or f"{record.get('nombres', '')} {record.get('apellidos', '')}")
 
             return {
                 "userintention": "Create_distribuitor",
@@ -195,10 +189,7 @@ class DistributorService():
                 f"Usuario: {user_input}\n"
                 f"Asistente:"
             )
-            reply_obj = llm.invoke(error_text)
-            reply_text = getattr(reply_obj, "content", str(reply_obj))
-            
-            LLMUtils._append_message(request.user_id, "ai", reply_text)     
+            reply_text = await self._reply(request, model_name, error_text, "error")
             
             return {
                 "userintention": "Create_distribuitor",
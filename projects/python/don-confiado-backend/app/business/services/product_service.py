@@ -1,18 +1,63 @@
-import os
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from supabase import create_client, Client
+from starlette.concurrency import run_in_threadpool
 
+from business.repositories import get_entity_repository
 from business.utils.llm_utils import LLMUtils
+from business.utils.conversation_memory import PROMPT_HISTORY_MAX_TOKENS
+from business.utils.llm_registry import DEFAULT_CHAT_MODEL, get_llm_registry
+from business.utils.reply_templates import LLM_REPLY_PHRASING, render_reply
+from business.utils.extraction_utils import as_int, as_number, clean_text, extraction_args, validate_fields
 from endpoints.dto.message_dto import (ChatRequestDTO)
 
+# Campos obligatorios y su validación/normalización (determinística, del lado del servicio)
+REQUIRED_FIELDS = {
+    "sku": clean_text,
+    "nombre": clean_text,
+    "precio_venta": lambda value: as_number(value, minimum=0.01),
+    "cantidad": lambda value: as_int(value, minimum=0),
+    "proveedor_id": lambda value: as_int(value, minimum=1),
+}
+
+# Una sola llamada estructurada: campos extraídos + campos que el usuario aún no ha dado
+EXTRACTION_SCHEMA = {
+    "title": "ProductData",
+    "description": (
+        "Extra unicamente los campos que el usuario proporciona. No inventes valores. "
+        "Lista en missing_fields los requisitos que no aparecen."
+    ),
+    "type": "object",
+    "properties": {
+        "sku": {"type": "string"},
+        "nombre": {"type": "string"},
+        "precio_venta": {"type": "number"},
+        "cantidad": {"type": "integer"},
+        "proveedor_id": {"type": "integer"},
+        "missing_fields": {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "enum": list(REQUIRED_FIELDS)
+            }
+        }
+    },
+    "required": ["missing_fields"],
+    "additionalProperties": False,
+}
+
+# Estado de la respuesta -> plantilla de reply_templates
+TEMPLATE_STATUS = {
+    "need_more_data": "need_more_data",
+    "error1": "missing_credentials",
+    "error2": "error",
+    "created": "created",
+}
+
 class ProductService():
 
     def _get_invoke_value(self, request: ChatRequestDTO, status: str, missing_fields: str = None):
         role_detail: str = ""
 
         if (status == "need_more_data"):
-            history_text = LLMUtils._history_as_text(request.user_id)
+            history_text = LLMUtils._history_as_text(request.user_id, max_tokens=PROMPT_HISTORY_MAX_TOKENS)
             missing_fields_list = ', '.join(missing_fields)
 
             role_detail = f"Pide al usuario, en una sola oración y sin tecnicismos, los datos faltantes: {missing_fields_list}.\n\n Historial:\n{history_text}"       
@@ -32,18 +77,23 @@ class ProductService():
         Asistente:
         """
             
-    def _build_response(self,
+    async def _build_response(self,
                         request: ChatRequestDTO,
-                        llm: ChatGoogleGenerativeAI,
+                        model_name: str,
                         status: str,
                         missing_fields: str = None,
                         error: str = None,
                         extracted: str = None,
-                        data: any = None):
-        invoke_value: str = self._get_invoke_value(request=request, status=status, missing_fields=missing_fields)
+                        data: any = None,
+                        record: dict = None):
+        if (LLM_REPLY_PHRASING):
+            invoke_value: str = self._get_invoke_value(request=request, status=status, missing_fields=missing_fields)
 
-        reply_obj = llm.invoke(invoke_value)
-        reply_text = getattr(reply_obj, "content", str(reply_obj))
+            reply_obj = await get_llm_registry().ainvoke(invoke_value, model_name)
+            reply_text = getattr(reply_obj, "content", str(reply_obj))
+        else:
+            # Mensajes de estado fijos: plantilla, sin llamada al modelo
+            reply_text = render_reply("producto", TEMPLATE_STATUS[status], missing_fields=missing_fields, **(record or {}))
 
         LLMUtils._append_message(request.user_id, "ai", reply_text)
         
@@ -60,125 +110,45 @@ class ProductService():
 
         return resp
 
-    def create(self, request: ChatRequestDTO, llm: ChatGoogleGenerativeAI) -> dict[str, any]:
-       # Rama 'Create_product': Validar completitud y luego extraer datos.
-
-       # 1) Verificación de completitud
-       completeness_schema = {
-           "title": "ProductCompleteness",
-           "type": "object",
-           "properties": {
-               "is_complete": {"type": "boolean"},
-               "missing_fields": {
-                   "type": "array",
-                   "items": {
-                       "type": "string",
-                       "enum": [
-                           "sku",
-                           "nombre",
-                           "precio_venta",
-                           "cantidad",
-                           "proveedor_id"
-                       ]
-                   }
-               }
-           },
-           "required": ["is_complete", "missing_fields"],
-           "additionalProperties": False,
-       }
-
-       completeness_model = llm.with_structured_output(completeness_schema)
-       completeness_text = (
-           "Evalúa si el mensaje contiene la información completa para crear un producto. "
-           "Requisitos: SKU, nombre, precio de venta, cantidad y proveedor (Nombre y/o documento del proveedor). "
-           "Devuelve is_complete=true solo si todos los requisitos están presentes en el mensaje. "
-           "Si falta algo, lista los campos faltantes en missing_fields.") + f"\n\nMensaje del usuario: {request.message}"
-       
-       completeness = completeness_model.invoke(completeness_text)
-       print(completeness)
-       
-       is_complete = bool(completeness[0]["args"].get("is_complete", False))
-       missing_fields = completeness[0]["args"].get("missing_fields", []) or []
-       
-       if not is_complete:
-           # Solicitud de datos faltantes (prompt plano + memoria)
-           return self._build_response(request=request, llm=llm, status="need_more_data", missing_fields=missing_fields)
-
-       # 2) Extracción de datos (solo cuando está completo)
-       extraction_schema = {
-           "title": "ProductData",
-           "description": (
-               "Extra unicamente los campos que el usuario proporciona. No inventes valores."
-           ),
-           "type": "object",
-           "properties": {
-               "sku": {"type": "string"},
-               "nombre": {"type": "string"},
-               "precio_venta": {"type": "number"},
-               "cantidad": {"type": "integer"},
-               "proveedor_id": {"type": "integer"}
-           },
-           "additionalProperties": False,
-       }
-
-       extractor = llm.with_structured_output(extraction_schema)
+    async def create(self, request: ChatRequestDTO, model_name: str = DEFAULT_CHAT_MODEL) -> dict[str, any]:
+       # Rama 'Create_product': una sola extracción (campos + faltantes) y validación local
+
+       history_text = LLMUtils._history_as_text(request.user_id, max_tokens=PROMPT_HISTORY_MAX_TOKENS)
        extract_text = (
-           "Extrae los campos del producto desde el mensaje del usuario. No inventes datos. "
-           "Si un campo no está presente, omítelo (no devuelvas null).\n\n"
+           "Extrae los campos del producto que el usuario quiere crear. No inventes datos. "
+           "Requisitos: SKU, nombre, precio de venta, cantidad y proveedor (proveedor_id). "
+           "Usa el historial solo para completar datos del mismo producto. "
+           "Si un campo no está presente, omítelo (no devuelvas null) y inclúyelo en missing_fields.\n\n"
+           f"Historial:\n{history_text}\n\n"
            f"Mensaje del usuario: {request.message}"
        )
 
-       extracted_payload = extractor.invoke(extract_text)
+       extracted_payload = await get_llm_registry().ainvoke(extract_text, model_name, schema=EXTRACTION_SCHEMA)
        print(extracted_payload)
-       
-       extracted = extracted_payload[0]["args"] if isinstance(extracted_payload, list) else extracted_payload
-       
-       sku = extracted.get("sku")
-       nombre = extracted.get("nombre")
-       precio_venta = extracted.get("precio_venta")
-       cantidad: int = int(extracted.get("cantidad"))
-       proveedor_id = extracted.get("proveedor_id")
-       
-       # Sanitizar registro (evitar null, vacíos y "null")
-       def _valid_value(value: object) -> bool:
-           if value is None: return False
-           text = str(value).strip()
-
-           if text == "": return False
-           if text.lower() == "null": return False
-
-           return True
-       
-       # Validación credenciales Supabase
-       supabase_url = os.getenv("SUPABASE_URL")
-       print(f"supabase_url={supabase_url}")
-       
-       supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-       print(f"supabase_key={supabase_key}")
-       
-       if ((not supabase_url) or (not supabase_key)):
-           return self._build_response(request=request, llm=llm, status="error1", error="Missing Supabase credentials", extracted=extracted)
-
-       # Inicialización cliente Supabase
-       global _supabase_client
 
-       try:
-           _supabase_client
-       except NameError:
-           _supabase_client = create_client(supabase_url, supabase_key)
+       extracted = extraction_args(extracted_payload)
+       extracted.pop("missing_fields", None)
+
+       # Validación determinística: los faltantes se calculan aquí, no se confía en el modelo
+       record, missing_fields = validate_fields(extracted, REQUIRED_FIELDS)
+
+       if (missing_fields):
+           # Solicitud de datos faltantes (prompt plano + memoria)
+           return await self._build_response(request=request, model_name=model_name, status="need_more_data", missing_fields=missing_fields)
+
+       # Repositorio de escritura (pool de SQLAlchemy por defecto; Supabase REST si así se configura)
+       repository = get_entity_repository()
 
-       record = {k: v for k, v in extracted.items() if _valid_value(v)}
-       record["cantidad"] = int(record["cantidad"])
-       record["proveedor_id"] = int(record["proveedor_id"])
+       if (not repository.is_configured()):
+           return await self._build_response(request=request, model_name=model_name, status="error1", error="Missing Supabase credentials", extracted=extracted)
 
        try:
-           # Inserción en Supabase y confirmación
-           response = _supabase_client.table("productos").insert(record).execute()
-           data = getattr(response, "data", None)
+           # Inserción y confirmación
+           data = await run_in_threadpool(repository.insert_many, "productos", [record])
                     
-           return self._build_response(request=request,llm=llm,status="created", data=data)
+           return await self._build_response(request=request,model_name=model_name,status="created", data=data, record=record)
        except Exception as ex:
            # Manejo de error al crear distribuidor (prompt plano)
            print(ex)
                    
-           return self._build_response(request=request, llm=llm, status="error2", error=str(ex), extracted=extracted)
\ No newline at end of file
+           return await self._build_response(request=request, model_name=model_name, status="error2", error=str(ex), extracted=extracted)
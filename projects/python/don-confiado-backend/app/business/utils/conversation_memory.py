@@ -0,0 +1,175 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+from business.utils.conversation_store import ConversationState, ConversationStore, InMemoryConversationStore, message_text, render_message
+
+SUMMARY_PROMPT = (
+    "Resume en español, en máximo 5 frases, la conversación entre el usuario y Don Confiado. "
+    "Conserva nombres, documentos (NIT/CC), productos, cantidades, precios y pendientes. "
+    "No inventes datos.\n\n"
+    "Resumen previo:\n{summary}\n\n"
+    "Mensajes nuevos:\n{transcript}\n\n"
+    "Resumen actualizado:"
+)
+
+# Ventana de historial (en tokens) para prompts que solo necesitan el contexto reciente:
+# clasificación de intención y solicitud de datos faltantes
+PROMPT_HISTORY_MAX_TOKENS = int(os.getenv("DONCONFIADO_PROMPT_HISTORY_MAX_TOKENS", "800"))
+
+
+class ConversationMemory:
+    """
+    Memoria de conversaciones por usuario con presupuesto de tokens.
+
+    - Cuando un usuario supera `max_tokens_per_user`, los turnos más antiguos se
+      resumen en segundo plano y se reemplazan por un resumen acumulado.
+    - Si el resumen no alcanza (o no hay event loop), se descartan los más antiguos
+      al superar el doble del presupuesto.
+    - El almacenamiento (y la expulsión LRU/TTL) depende del `ConversationStore`.
+    """
+
+    def __init__(self,
+                 store: Optional[ConversationStore] = None,
+                 max_tokens_per_user: int = int(os.getenv("DONCONFIADO_MEMORY_MAX_TOKENS_PER_USER", "2000")),
+                 keep_recent_messages: int = int(os.getenv("DONCONFIADO_MEMORY_KEEP_RECENT", "6")),
+                 summary_model: Optional[str] = None):
+        self.store = store or InMemoryConversationStore()
+        self.max_tokens_per_user = max_tokens_per_user
+        self.keep_recent_messages = keep_recent_messages
+        self.summary_model = summary_model
+        self._summarizing: set = set()
+        # asyncio solo guarda referencias débiles a las tareas: sin esta referencia un resumen en curso podría ser recolectado
+        self._summary_tasks: set = set()
+        self._summaries = 0
+        self._lock = threading.RLock()
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+
+    async def refresh(self, user_id: str) -> None:
+        """Al inicio de cada turno: trae la conversación del store compartido sin bloquear el event loop (fuera del lock)."""
+        await self.store.refresh(user_id)
+
+    def messages(self, user_id: str) -> List[BaseMessage]:
+        """Mensajes a enviar al modelo: resumen acumulado (si existe) + turnos recientes."""
+        with self._lock:
+            state = self.store.load(user_id)
+            messages = list(state.messages)
+
+            if (state.summary):
+                messages.insert(0, SystemMessage(content=f"Resumen de la conversación anterior: {state.summary}"))
+
+            return messages
+
+    def history_as_text(self, user_id: str, max_messages: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
+        """Transcript pre-renderado (resumen + mensajes), completo o por ventana de mensajes/tokens."""
+        with self._lock:
+            state = self.store.load(user_id)
+            transcript = state.transcript(max_messages=max_messages, max_tokens=max_tokens)
+
+            if (not state.summary): return transcript
+
+            return f"Resumen previo: {state.summary}\n{transcript}" if transcript else f"Resumen previo: {state.summary}"
+
+    # -------------------------------------------------------------------------
+    # Escritura
+    # -------------------------------------------------------------------------
+
+    def append(self, user_id: str, message: BaseMessage) -> None:
+        with self._lock:
+            state = self.store.append(user_id, message)
+            self._enforce_budget(state)
+
+    def replace_last(self, user_id: str, message: BaseMessage) -> None:
+        with self._lock:
+            self.store.replace_last(user_id, message)
+
+    def clear(self, user_id: str) -> None:
+        with self._lock:
+            self.store.delete(user_id)
+
+    # -------------------------------------------------------------------------
+    # Presupuesto por usuario y resúmenes
+    # -------------------------------------------------------------------------
+
+    def _enforce_budget(self, state: ConversationState) -> None:
+        if (state.total_tokens <= self.max_tokens_per_user): return
+
+        summarizable = len(state.messages) - self.keep_recent_messages
+
+        if (summarizable > 0 and state.user_id not in self._summarizing):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+
+            if (loop is not None):
+                self._summarizing.add(state.user_id)
+                task = loop.create_task(self._summarize(state.user_id, list(state.messages[:summarizable]), state.first_seq + summarizable, state.summary))
+                self._summary_tasks.add(task)
+                task.add_done_callback(self._summary_tasks.discard)
+
+        # Límite duro: si el resumen no llega a tiempo, se descartan los turnos más antiguos
+        while (state.total_tokens > 2 * self.max_tokens_per_user and len(state.messages) > self.keep_recent_messages):
+            state = self.store.compact(state.user_id, state.first_seq + 1, state.summary)
+
+    async def _summarize(self, user_id: str, pending: List[BaseMessage], until_seq: int, previous_summary: str) -> None:
+        # Import diferido: el registro depende de langchain y no es necesario para leer/escribir memoria
+        from business.utils.llm_registry import DEFAULT_CHAT_MODEL, get_llm_registry
+
+        try:
+            transcript = "\n".join(render_message(msg) for msg in pending)
+            prompt = SUMMARY_PROMPT.format(summary=previous_summary or "(sin resumen)", transcript=transcript)
+            result = await get_llm_registry().ainvoke(prompt, self.summary_model or DEFAULT_CHAT_MODEL)
+            summary = getattr(result, "content", str(result))
+
+            with self._lock:
+                # La secuencia identifica los mensajes resumidos aunque el límite duro haya descartado algunos
+                self.store.compact(user_id, until_seq, summary)
+                self._summaries += 1
+        except Exception as ex:
+            print(f"⚠️ Conversation summary failed for {user_id}: {str(ex)}")
+        finally:
+            self._summarizing.discard(user_id)
+
+    # -------------------------------------------------------------------------
+    # Métricas
+    # -------------------------------------------------------------------------
+
+    def user_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for state in self.store.states():
+                if (state.user_id == user_id):
+                    return self._describe(state, time.monotonic())
+
+            return None
+
+    def stats(self, include_users: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            stats: Dict[str, Any] = self.store.stats()
+            stats.update({
+                "max_tokens_per_user": self.max_tokens_per_user,
+                "summaries": self._summaries,
+            })
+
+            if (include_users):
+                stats["per_user"] = {state.user_id: self._describe(state, now) for state in self.store.states()}
+
+            return stats
+
+    def _describe(self, state: ConversationState, now: float) -> Dict[str, Any]:
+        return {
+            "messages": len(state.messages),
+            "tokens": state.tokens,
+            "summary_tokens": state.summary_tokens,
+            "bytes": sum(len(message_text(msg).encode("utf-8")) for msg in state.messages) + len(state.summary.encode("utf-8")),
+            "idle_seconds": round(now - state.last_access, 1),
+            "summarizing": state.user_id in self._summarizing,
+        }
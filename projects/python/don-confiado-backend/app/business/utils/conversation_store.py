@@ -0,0 +1,683 @@
+import atexit
+import bisect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+# Costo aproximado (en tokens) de una imagen o audio adjunto en Gemini
+MEDIA_TOKEN_COST = 258
+
+
+def estimate_tokens(content: Any) -> int:
+    """Estimación barata de tokens (~4 caracteres por token); los adjuntos tienen costo fijo."""
+    if isinstance(content, str):
+        return len(content) // 4 + 1
+
+    tokens = 0
+
+    for part in (content or []):
+        if isinstance(part, dict) and part.get("type") == "text":
+            tokens += len(part.get("text", "")) // 4 + 1
+        else:
+            tokens += MEDIA_TOKEN_COST
+
+    return tokens
+
+
+def message_text(message: BaseMessage) -> str:
+    """Texto de un mensaje, ignorando las partes multimedia (base64)."""
+    content = message.content
+
+    if isinstance(content, str):
+        return content
+
+    return " ".join(
+        part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text"
+    )
+
+
+def render_message(message: BaseMessage) -> str:
+    """Línea del transcript ('Usuario: ...' / 'Asistente: ...') para un mensaje."""
+    speaker = "Usuario" if isinstance(message, HumanMessage) else "Asistente"
+
+    return f"{speaker}: {message_text(message)}"
+
+
+class ConversationState:
+    """
+    Mensajes recientes + resumen acumulado de un usuario.
+
+    Cada mensaje tiene un número de secuencia (`first_seq + posición`) que no cambia
+    al compactar, de modo que un resumen calculado en segundo plano (o en otro worker)
+    sabe exactamente qué mensajes reemplaza.
+
+    El transcript se mantiene pre-renderado (una línea por mensaje + tokens acumulados),
+    así que agregar un mensaje es O(1) y las vistas por ventana no recorren todo el historial.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.messages: List[BaseMessage] = []
+        self.message_tokens: List[int] = []
+        self.summary: str = ""
+        self.summary_tokens: int = 0
+        self.tokens: int = 0
+        self.lines: List[str] = []
+        self.cum_tokens: List[int] = []
+        self._text: Optional[str] = None
+        self.first_seq: int = 0
+        self.last_access: float = time.monotonic()
+        self.loaded_at: float = self.last_access
+
+    @property
+    def total_tokens(self) -> int:
+        return self.tokens + self.summary_tokens
+
+    @property
+    def next_seq(self) -> int:
+        return self.first_seq + len(self.messages)
+
+    def append(self, message: BaseMessage) -> None:
+        tokens = estimate_tokens(message.content)
+        self.messages.append(message)
+        self.message_tokens.append(tokens)
+        self.tokens += tokens
+        self.lines.append(render_message(message))
+        self.cum_tokens.append((self.cum_tokens[-1] if self.cum_tokens else 0) + tokens)
+        self._text = None
+
+    def replace_last(self, message: BaseMessage) -> None:
+        tokens = estimate_tokens(message.content)
+        delta = tokens - self.message_tokens[-1]
+        self.tokens += delta
+        self.messages[-1] = message
+        self.message_tokens[-1] = tokens
+        self.lines[-1] = render_message(message)
+        self.cum_tokens[-1] += delta
+        self._text = None
+
+    def drop_until(self, seq: int) -> int:
+        """Descarta los mensajes con secuencia menor a `seq`; devuelve cuántos se quitaron."""
+        count = max(0, min(seq - self.first_seq, len(self.messages)))
+        self.tokens -= sum(self.message_tokens[:count])
+        del self.messages[:count]
+        del self.message_tokens[:count]
+        del self.lines[:count]
+        del self.cum_tokens[:count]
+        self.first_seq += count
+        self._text = None
+
+        return count
+
+    def transcript(self, max_messages: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
+        """
+        Transcript de los mensajes recientes; opcionalmente solo los últimos
+        `max_messages` mensajes y/o los últimos `max_tokens` tokens.
+        """
+        if (max_messages is None and max_tokens is None):
+            if (self._text is None): self._text = "\n".join(self.lines)
+
+            return self._text
+
+        start = 0 if max_messages is None else max(0, len(self.lines) - max_messages)
+
+        if (max_tokens is not None and self.cum_tokens):
+            # Primer índice cuyas líneas hasta el final suman como máximo max_tokens
+            threshold = self.cum_tokens[-1] - max_tokens
+            if (threshold > 0): start = max(start, bisect.bisect_left(self.cum_tokens, threshold) + 1)
+
+        return "\n".join(self.lines[start:])
+
+    def set_summary(self, summary: str) -> None:
+        self.summary = summary or ""
+        self.summary_tokens = estimate_tokens(summary) if summary else 0
+
+
+class ConversationStore(ABC):
+    """
+    Almacenamiento de conversaciones usado por `ConversationMemory`.
+
+    Todas las mutaciones pasan por el store para que pueda llevar la cuenta de
+    tokens (límites globales) o persistir los cambios.
+    """
+
+    # True cuando varios procesos/workers ven las mismas conversaciones
+    shared: bool = False
+
+    @abstractmethod
+    def load(self, user_id: str) -> ConversationState: ...
+
+    async def refresh(self, user_id: str) -> None:
+        """Pone al día la copia local de la conversación antes de un turno (sin bloquear el event loop)."""
+
+    @abstractmethod
+    def append(self, user_id: str, message: BaseMessage) -> ConversationState: ...
+
+    @abstractmethod
+    def replace_last(self, user_id: str, message: BaseMessage) -> ConversationState: ...
+
+    @abstractmethod
+    def compact(self, user_id: str, first_seq: int, summary: str) -> ConversationState:
+        """Descarta los mensajes anteriores a `first_seq` y guarda el resumen que los reemplaza."""
+
+    @abstractmethod
+    def delete(self, user_id: str) -> None: ...
+
+    @abstractmethod
+    def states(self) -> Iterable[ConversationState]: ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]: ...
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Store en el proceso con expulsión LRU/TTL.
+
+    Los usuarios inactivos se expulsan tras `idle_ttl_seconds` y, al superar
+    `max_users` o `max_total_tokens`, se expulsa el usuario usado hace más tiempo.
+    """
+
+    def __init__(self,
+                 max_users: int = int(os.getenv("DONCONFIADO_MEMORY_MAX_USERS", "10000")),
+                 max_total_tokens: int = int(os.getenv("DONCONFIADO_MEMORY_MAX_TOTAL_TOKENS", "5000000")),
+                 idle_ttl_seconds: float = float(os.getenv("DONCONFIADO_MEMORY_IDLE_TTL_SECONDS", "86400"))):
+        self.max_users = max_users
+        self.max_total_tokens = max_total_tokens
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._states: "OrderedDict[str, ConversationState]" = OrderedDict()
+        self._total_tokens = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    def get(self, user_id: str) -> Optional[ConversationState]:
+        with self._lock:
+            return self._states.get(user_id)
+
+    def put(self, state: ConversationState) -> ConversationState:
+        with self._lock:
+            previous = self._states.pop(state.user_id, None)
+            if (previous is not None): self._total_tokens -= previous.total_tokens
+
+            self._states[state.user_id] = state
+            self._total_tokens += state.total_tokens
+            self._evict(protect=state.user_id)
+
+            return state
+
+    def load(self, user_id: str) -> ConversationState:
+        with self._lock:
+            state = self._states.get(user_id)
+
+            if (state is None):
+                state = self.put(ConversationState(user_id))
+            else:
+                self._states.move_to_end(user_id)
+
+            state.last_access = time.monotonic()
+
+            return state
+
+    def append(self, user_id: str, message: BaseMessage) -> ConversationState:
+        return self._mutate(user_id, lambda state: state.append(message))
+
+    def replace_last(self, user_id: str, message: BaseMessage) -> ConversationState:
+        return self._mutate(user_id, lambda state: state.replace_last(message) if state.messages else state.append(message))
+
+    def compact(self, user_id: str, first_seq: int, summary: str) -> ConversationState:
+        def _compact(state: ConversationState) -> None:
+            state.drop_until(first_seq)
+            state.set_summary(summary)
+
+        return self._mutate(user_id, _compact)
+
+    def delete(self, user_id: str) -> None:
+        with self._lock:
+            state = self._states.pop(user_id, None)
+            if (state is not None): self._total_tokens -= state.total_tokens
+
+    def states(self) -> Iterable[ConversationState]:
+        with self._lock:
+            return list(self._states.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "users": len(self._states),
+                "total_tokens": self._total_tokens,
+                "max_total_tokens": self.max_total_tokens,
+                "evictions": self._evictions,
+            }
+
+    def _mutate(self, user_id: str, change) -> ConversationState:
+        with self._lock:
+            state = self.load(user_id)
+            before = state.total_tokens
+            change(state)
+            self._total_tokens += state.total_tokens - before
+            self._evict(protect=user_id)
+
+            return state
+
+    def _evict(self, protect: Optional[str] = None) -> None:
+        now = time.monotonic()
+
+        # Inactivos: el orden LRU permite detenerse en el primer usuario reciente
+        while (self._states):
+            user_id, state = next(iter(self._states.items()))
+            if (user_id == protect or now - state.last_access <= self.idle_ttl_seconds): break
+
+            self._remove_oldest()
+
+        while (len(self._states) > 1 and (len(self._states) > self.max_users or self._total_tokens > self.max_total_tokens)):
+            if (next(iter(self._states)) == protect): break
+
+            self._remove_oldest()
+
+    def _remove_oldest(self) -> None:
+        _, state = self._states.popitem(last=False)
+        self._total_tokens -= state.total_tokens
+        self._evictions += 1
+
+
+class SqlConversationStore(ConversationStore):
+    """
+    Store compartido entre workers sobre Postgres (primaria, `primary_session`).
+
+    Las escrituras se encolan y un hilo las envía en lote (write-behind), fuera del
+    camino crítico de la respuesta. Las lecturas se hacen al inicio de cada turno con
+    `refresh` (en el threadpool, si la copia local tiene más de `cache_ttl_seconds`);
+    durante el turno `load` solo usa la copia local.
+
+    La secuencia de un mensaje nuevo se calcula con la copia local, que puede estar
+    atrasada si otro worker atiende al mismo usuario: el INSERT no sobrescribe
+    (ON CONFLICT DO NOTHING) y, si una fila choca, los mensajes de esa conversación se
+    reubican después del último guardado y la copia local se descarta para releerla.
+    """
+
+    shared = True
+
+    def __init__(self,
+                 namespace: str,
+                 session_factory=None,
+                 cache_ttl_seconds: float = float(os.getenv("DONCONFIADO_CONVERSATION_CACHE_TTL_SECONDS", "2")),
+                 batch_size: int = int(os.getenv("DONCONFIADO_CONVERSATION_BATCH_SIZE", "200")),
+                 flush_interval_seconds: float = float(os.getenv("DONCONFIADO_CONVERSATION_FLUSH_INTERVAL_SECONDS", "0.5"))):
+        if (session_factory is None):
+            # Relee lo que otro worker acaba de escribir: nunca de una réplica atrasada
+            from business.common.connection import primary_session
+            session_factory = primary_session
+
+        self.namespace = namespace
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._session_factory = session_factory
+        self._cache = InMemoryConversationStore(idle_ttl_seconds=max(cache_ttl_seconds * 10, 60))
+        self._pending: List[Tuple] = []
+        self._pending_keys: Dict[str, int] = {}
+        self._inflight_keys: set = set()
+        # Desplazamiento de secuencia de las conversaciones reubicadas (ver _relocate)
+        self._seq_shift: Dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed = threading.Condition(self._pending_lock)
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flushes = 0
+        self._flushed_ops = 0
+        self._flush_errors = 0
+        self._loads = 0
+        self._worker: Optional[threading.Thread] = None
+
+        atexit.register(self.close)
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.namespace}:{user_id}"
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+
+    def load(self, user_id: str) -> ConversationState:
+        # Copia local (refrescada por `refresh` al inicio del turno); solo se lee de la base
+        # si no la hay, p. ej. fuera de los endpoints (scripts)
+        if (self._cache.get(user_id) is not None):
+            return self._cache.load(user_id)
+
+        return self._reload(user_id)
+
+    async def refresh(self, user_id: str) -> None:
+        state = self._cache.get(user_id)
+
+        if (state is not None and time.monotonic() - state.loaded_at <= self.cache_ttl_seconds): return
+
+        from starlette.concurrency import run_in_threadpool
+
+        await run_in_threadpool(self._reload, user_id)
+
+    def _reload(self, user_id: str) -> ConversationState:
+        # Lo propio aún no enviado debe estar en la base antes de releer: se espera al hilo de escritura
+        self._wait_flushed(self._key(user_id))
+
+        return self._cache.put(self._read(user_id))
+
+    def _wait_flushed(self, key: str) -> None:
+        with self._flushed:
+            if ((key not in self._pending_keys) and (key not in self._inflight_keys)): return
+
+            if (not self._closed):
+                self._wakeup.set()
+                # Un flush fallido deja las operaciones en la cola: no se espera indefinidamente
+                self._flushed.wait_for(
+                    lambda: (key not in self._pending_keys) and (key not in self._inflight_keys),
+                    timeout=max(self.flush_interval_seconds * 4, 2),
+                )
+                return
+
+        # Sin hilo de escritura (store cerrado) se envía aquí
+        self.flush()
+
+    def _read(self, user_id: str) -> ConversationState:
+        from business.entities.conversation_message import ConversationMessage, ConversationSummary
+
+        key = self._key(user_id)
+        state = ConversationState(user_id)
+        session = self._session_factory()
+
+        try:
+            summary = session.get(ConversationSummary, key)
+
+            if (summary is not None):
+                state.first_seq = summary.first_seq
+                state.set_summary(summary.summary)
+
+            rows = (
+                session.query(ConversationMessage.seq, ConversationMessage.role, ConversationMessage.content)
+                .filter(ConversationMessage.conversation_id == key, ConversationMessage.seq >= state.first_seq)
+                .order_by(ConversationMessage.seq)
+                .all()
+            )
+
+            for seq, role, content in rows:
+                # Si hay huecos (mensajes ya compactados en otro worker) la secuencia manda
+                if (not state.messages): state.first_seq = seq
+                state.append(HumanMessage(content=content) if role == "human" else AIMessage(content=content))
+        finally:
+            session.close()
+
+        # Las secuencias de la copia nueva ya son las de la base
+        with self._pending_lock:
+            if ((key not in self._pending_keys) and (key not in self._inflight_keys)): self._seq_shift.pop(key, None)
+
+        self._loads += 1
+
+        return state
+
+    # -------------------------------------------------------------------------
+    # Escritura (write-behind)
+    # -------------------------------------------------------------------------
+
+    def append(self, user_id: str, message: BaseMessage) -> ConversationState:
+        self.load(user_id)  # la copia local (refrescada al inicio del turno)
+        state = self._cache.append(user_id, message)
+        self._enqueue(("append", self._key(user_id), state.next_seq - 1, self._role(message), message_text(message)))
+
+        return state
+
+    def replace_last(self, user_id: str, message: BaseMessage) -> ConversationState:
+        self.load(user_id)  # la copia local (refrescada al inicio del turno)
+        state = self._cache.replace_last(user_id, message)
+        self._enqueue(("replace", self._key(user_id), state.next_seq - 1, self._role(message), message_text(message)))
+
+        return state
+
+    def compact(self, user_id: str, first_seq: int, summary: str) -> ConversationState:
+        self.load(user_id)  # la copia local (refrescada al inicio del turno)
+        state = self._cache.compact(user_id, first_seq, summary)
+        self._enqueue(("compact", self._key(user_id), state.first_seq, state.summary))
+
+        return state
+
+    def delete(self, user_id: str) -> None:
+        self._cache.delete(user_id)
+        self._enqueue(("delete", self._key(user_id)))
+
+    @staticmethod
+    def _role(message: BaseMessage) -> str:
+        return "human" if isinstance(message, HumanMessage) else "ai"
+
+    def _enqueue(self, op: Tuple) -> None:
+        with self._pending_lock:
+            self._pending.append(op)
+            self._pending_keys[op[1]] = self._pending_keys.get(op[1], 0) + 1
+            full = len(self._pending) >= self.batch_size
+
+        self._ensure_worker()
+        if (full): self._wakeup.set()
+
+    def _requeue(self, ops: List[Tuple]) -> None:
+        # Un flush fallido devuelve sus operaciones al inicio de la cola, en orden, para el siguiente intento
+        with self._pending_lock:
+            self._pending[:0] = ops
+
+            for op in ops:
+                self._pending_keys[op[1]] = self._pending_keys.get(op[1], 0) + 1
+
+    def _ensure_worker(self) -> None:
+        if (self._worker is not None and self._worker.is_alive()): return
+
+        self._worker = threading.Thread(target=self._run, name=f"conversation-store-{self.namespace}", daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        while (not self._closed):
+            self._wakeup.wait(self.flush_interval_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        from sqlalchemy import delete
+        from sqlalchemy.dialects.postgresql import insert
+        from business.entities.conversation_message import ConversationMessage, ConversationSummary
+
+        with self._flush_lock:
+            with self._pending_lock:
+                ops, self._pending = self._pending, []
+                self._inflight_keys = set(self._pending_keys)
+                self._pending_keys = {}
+                # Los desplazamientos se calculan sobre una copia: solo cuentan si el lote se confirma
+                shifts = dict(self._seq_shift)
+
+            if (not ops):
+                self._done_flushing()
+                return
+
+            session = None
+            relocated: Dict[str, int] = {}
+
+            try:
+                session = self._session_factory()
+                # Se respeta el orden de las operaciones; los mensajes consecutivos van en un solo INSERT
+                i = 0
+
+                while (i < len(ops)):
+                    if (ops[i][0] in ("append", "replace")):
+                        appends: Dict[Tuple[str, int], Dict[str, Any]] = {}
+                        replaces: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+                        while (i < len(ops) and ops[i][0] in ("append", "replace")):
+                            kind, key, seq, role, content = ops[i]
+                            seq += shifts.get(key, 0)
+                            row = {"conversation_id": key, "seq": seq, "role": role, "content": content}
+
+                            # Reemplazar un mensaje que aún no se envió es enviarlo ya reemplazado
+                            if ((kind == "append") or ((key, seq) in appends)):
+                                appends[(key, seq)] = row
+                            else:
+                                replaces[(key, seq)] = row
+                            i += 1
+
+                        if (appends):
+                            for key, shift in self._insert_messages(session, list(appends.values())).items():
+                                relocated[key] = relocated.get(key, 0) + shift
+                                shifts[key] = shifts.get(key, 0) + shift
+
+                        if (replaces):
+                            stmt = insert(ConversationMessage).values(list(replaces.values()))
+                            session.execute(stmt.on_conflict_do_update(
+                                index_elements=["conversation_id", "seq"],
+                                set_={"role": stmt.excluded.role, "content": stmt.excluded.content},
+                            ))
+                        continue
+
+                    if (ops[i][0] == "compact"):
+                        _, key, first_seq, summary = ops[i]
+                        first_seq += shifts.get(key, 0)
+                        stmt = insert(ConversationSummary).values(conversation_id=key, summary=summary, first_seq=first_seq)
+                        session.execute(stmt.on_conflict_do_update(
+                            index_elements=["conversation_id"],
+                            set_={"summary": stmt.excluded.summary, "first_seq": stmt.excluded.first_seq},
+                        ))
+                        session.execute(delete(ConversationMessage).where(
+                            ConversationMessage.conversation_id == key, ConversationMessage.seq < first_seq
+                        ))
+                    else:
+                        _, key = ops[i]
+                        session.execute(delete(ConversationMessage).where(ConversationMessage.conversation_id == key))
+                        session.execute(delete(ConversationSummary).where(ConversationSummary.conversation_id == key))
+                        relocated.pop(key, None)
+                        shifts[key] = 0
+
+                    i += 1
+
+                session.commit()
+                self._flushes += 1
+                self._flushed_ops += len(ops)
+
+                # Conversaciones del lote (en vuelo: `_read` no las toca); un desplazamiento 0 se descarta
+                with self._pending_lock:
+                    for key in {op[1] for op in ops}:
+                        if (shifts.get(key, 0)):
+                            self._seq_shift[key] = shifts[key]
+                        else:
+                            self._seq_shift.pop(key, None)
+
+                for key, shift in relocated.items():
+                    print(f"⚠️ Conversación {key}: secuencias ocupadas por otro worker, mensajes reubicados (+{shift})")
+
+                # La copia local de una conversación reubicada tiene secuencias viejas: se relee en el próximo turno
+                for key in relocated:
+                    state = self._cache.get(key[len(self.namespace) + 1:])
+                    if (state is not None): state.loaded_at = float("-inf")
+            except Exception as ex:
+                if (session is not None): session.rollback()
+                self._flush_errors += 1
+                self._requeue(ops)
+                print(f"⚠️ Conversation store flush failed ({len(ops)} ops, se reintentarán): {str(ex)}")
+            finally:
+                if (session is not None): session.close()
+                self._done_flushing()
+
+    def _done_flushing(self) -> None:
+        with self._flushed:
+            self._inflight_keys = set()
+            self._flushed.notify_all()
+
+    def _insert_messages(self, session, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Inserta mensajes nuevos sin sobrescribir los de otro worker. Devuelve las conversaciones
+        en las que alguna secuencia ya estaba ocupada (sus mensajes se reubicaron al final) con
+        el desplazamiento aplicado.
+        """
+        from sqlalchemy import delete
+        from sqlalchemy.dialects.postgresql import insert
+        from business.entities.conversation_message import ConversationMessage
+
+        stmt = insert(ConversationMessage).values(rows).on_conflict_do_nothing(index_elements=["conversation_id", "seq"])
+        inserted = set(session.execute(stmt.returning(ConversationMessage.conversation_id, ConversationMessage.seq)).all())
+        conflicted = {row["conversation_id"] for row in rows if (row["conversation_id"], row["seq"]) not in inserted}
+
+        shifts = {}
+
+        for key in conflicted:
+            own = [row for row in rows if row["conversation_id"] == key]
+            # Lo que sí entró de esta conversación se vuelve a insertar junto al resto para conservar el orden
+            session.execute(delete(ConversationMessage).where(
+                ConversationMessage.conversation_id == key,
+                ConversationMessage.seq.in_([seq for inserted_key, seq in inserted if inserted_key == key]),
+            ))
+            shifts[key] = self._relocate(session, key, own)
+
+        return shifts
+
+    def _relocate(self, session, key: str, rows: List[Dict[str, Any]]) -> int:
+        from sqlalchemy import func, select
+        from sqlalchemy.dialects.postgresql import insert
+        from business.entities.conversation_message import ConversationMessage
+
+        while (True):
+            base = session.execute(
+                select(func.coalesce(func.max(ConversationMessage.seq) + 1, 0)).where(ConversationMessage.conversation_id == key)
+            ).scalar()
+            stmt = insert(ConversationMessage).values([{**row, "seq": base + offset} for offset, row in enumerate(rows)])
+            # Con la restricción única, otro worker que escribe a la vez hace fallar el INSERT completo: se reintenta
+            savepoint = session.begin_nested()
+
+            try:
+                session.execute(stmt)
+                savepoint.commit()
+                break
+            except Exception as ex:
+                savepoint.rollback()
+                if ("uq_conversation_messages_seq" not in str(ex)): raise
+
+        return base - rows[0]["seq"]
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+
+    # -------------------------------------------------------------------------
+    # Métricas
+    # -------------------------------------------------------------------------
+
+    def states(self) -> Iterable[ConversationState]:
+        return self._cache.states()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({
+            "backend": "sql",
+            "namespace": self.namespace,
+            "pending_writes": len(self._pending),
+            "flushes": self._flushes,
+            "flushed_ops": self._flushed_ops,
+            "flush_errors": self._flush_errors,
+            "loads": self._loads,
+        })
+
+        return stats
+
+
+def build_conversation_store(namespace: str) -> ConversationStore:
+    """Store según DONCONFIADO_CONVERSATION_STORE: 'memory' (por defecto) o 'sql' (multi-worker)."""
+    backend = os.getenv("DONCONFIADO_CONVERSATION_STORE", "memory").lower()
+
+    if (backend == "sql"):
+        return SqlConversationStore(namespace)
+
+    return InMemoryConversationStore()
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import Select, and_, column, delete, exists, inspect, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Textos (chunks) por llamada a la API de embeddings; Gemini acepta hasta 100 por lote
+EMBEDDING_BATCH_SIZE = int(os.getenv("DONCONFIADO_EMBEDDING_BATCH_SIZE", "100"))
+# Lotes de embeddings en vuelo a la vez durante una sincronización
+EMBEDDING_SYNC_CONCURRENCY = int(os.getenv("DONCONFIADO_EMBEDDING_SYNC_CONCURRENCY", "4"))
+# Límite de llamadas por minuto a la API de embeddings durante la sincronización (0 = sin límite)
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("DONCONFIADO_EMBEDDING_REQUESTS_PER_MINUTE", "0"))
+
+
+@dataclass
+class EmbeddingDocument:
+    """
+    Una fila a vectorizar: sus chunks se guardan como (source_id, chunk_index) en la tabla *_vec.
+    Si `content_hash` coincide con el guardado en la tabla (`stored_hash`) la fila no se vuelve a vectorizar.
+    """
+    source_id: int
+    chunks: List[str]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    content_hash: Optional[str] = None
+    stored_hash: Optional[str] = None
+
+
+def content_hash(*parts: Any) -> str:
+    """Hash (sha256) del contenido a vectorizar: texto, metadata y modelo de embeddings."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def vec_table(name: str):
+    return table(name, column("source_id"), column("chunk_index"), column("content_hash"))
+
+
+class RateLimiter:
+    """Espacia las llamadas para no pasar de `requests_per_minute` (0 = sin límite)."""
+
+    def __init__(self, requests_per_minute: float = EMBEDDING_REQUESTS_PER_MINUTE):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if (not self.interval): return
+
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+
+        if (wait > 0): await asyncio.sleep(wait)
+
+
+class EmbeddingSync:
+    """
+    Sincroniza una tabla *_vec a partir de un flujo de documentos:
+
+    1. Los documentos llegan de un cursor del lado del servidor (`source_rows`), sin cargar la tabla.
+    2. Los chunks de muchos documentos se agrupan en lotes de `batch_size` textos
+       (los chunks de un documento no se parten entre lotes).
+    3. Hasta `concurrency` lotes se vectorizan a la vez (`aembed_documents`), respetando
+       el límite de llamadas por minuto.
+    4. Cada lote se guarda con un solo executemany (INSERT ... ON CONFLICT, sentencia preparada con
+       el vector como parámetro binario) y su propio commit: una sincronización interrumpida conserva
+       lo ya escrito y se puede repetir.
+
+    Es incremental: solo se vectorizan las filas cuyo hash de contenido cambió (o no tienen
+    vectores), salvo con force=True (p. ej. al cambiar de modelo de embeddings).
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 table: str,
+                 session_factory: Callable[[], AsyncSession],
+                 batch_size: int = EMBEDDING_BATCH_SIZE,
+                 concurrency: int = EMBEDDING_SYNC_CONCURRENCY,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 force: bool = False):
+        self.embeddings = embeddings
+        self.table = table
+        self.force = force
+        self.session_factory = session_factory
+        self.batch_size = max(batch_size, 1)
+        self.concurrency = max(concurrency, 1)
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+        self._upsert = text(f"""
+            INSERT INTO {table} (source_id, chunk_index, content, embedding, metadata, content_hash)
+            VALUES (:source_id, :chunk_index, :content, CAST(:embedding AS vector), CAST(:metadata AS jsonb), :content_hash)
+            ON CONFLICT (source_id, chunk_index) DO UPDATE SET
+                content = EXCLUDED.content,
+                embedding = EXCLUDED.embedding,
+                metadata = EXCLUDED.metadata,
+                content_hash = EXCLUDED.content_hash,
+                created_at = NOW()
+        """)
+        # Si el contenido de una fila se acortó, sus chunks sobrantes de una sincronización anterior se borran
+        self._trim = text(f"""
+            DELETE FROM {table} v
+            USING unnest(CAST(:source_ids AS integer[]), CAST(:chunk_counts AS integer[])) AS c(source_id, chunk_count)
+            WHERE v.source_id = c.source_id AND v.chunk_index >= c.chunk_count
+        """)
+
+    async def source_rows(self, session: AsyncSession, model, options: Sequence[Any] = (), where: Sequence[Any] = (),
+                          batch_size: int = 500) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+        """
+        Filas de `model` (en orden de llave primaria, con cursor del lado del servidor) junto con
+        el hash guardado de sus vectores (None si aún no tienen), en una sola consulta.
+        """
+        vec = vec_table(self.table)
+        primary_key = inspect(model).primary_key[0]
+        statement = (
+            select(model, vec.c.content_hash)
+            .outerjoin(vec, and_(vec.c.source_id == primary_key, vec.c.chunk_index == 0))
+            .where(*where)
+            .options(*options)
+            .order_by(primary_key)
+            .execution_options(yield_per=batch_size)
+        )
+
+        async for entity, stored_hash in await session.stream(statement):
+            yield entity, stored_hash
+
+    async def delete_orphans(self, valid_ids: Select) -> int:
+        """Borra los vectores cuya fila de origen ya no existe o ya no cumple el filtro de `valid_ids` (un SELECT de ids)."""
+        vec = vec_table(self.table)
+        source_id = valid_ids.selected_columns[0]
+        statement = delete(vec).where(~exists(valid_ids.where(source_id == vec.c.source_id))).returning(vec.c.source_id)
+
+        async with self.session_factory() as session:
+            deleted = len(set((await session.execute(statement)).scalars()))
+            await session.commit()
+
+        return deleted
+
+    async def run(self, documents: AsyncIterator[EmbeddingDocument]) -> Dict[str, Any]:
+        stats = {"documents": 0, "unchanged": 0, "chunks": 0, "batches": 0}
+        started = time.perf_counter()
+        pending: set = set()
+
+        async with self.session_factory() as session:
+            try:
+                async for batch in self._batches(documents, stats):
+                    if (len(pending) >= self.concurrency):
+                        await self._write_done(session, pending, stats, asyncio.FIRST_COMPLETED)
+
+                    pending.add(asyncio.create_task(self._embed(batch)))
+
+                while (pending):
+                    await self._write_done(session, pending, stats, asyncio.ALL_COMPLETED)
+            except BaseException:
+                for task in pending: task.cancel()
+                raise
+
+        elapsed = time.perf_counter() - started
+        stats.update(elapsed_s=round(elapsed, 3), chunks_per_s=round(stats["chunks"] / elapsed, 1) if elapsed else None)
+
+        return stats
+
+    async def _batches(self, documents: AsyncIterator[EmbeddingDocument], stats: Dict[str, Any]) -> AsyncIterator[List[EmbeddingDocument]]:
+        batch: List[EmbeddingDocument] = []
+        size = 0
+
+        async for document in documents:
+            if (not document.chunks): continue
+
+            if ((not self.force) and document.content_hash and (document.content_hash == document.stored_hash)):
+                stats["unchanged"] += 1
+                continue
+
+            if (batch and (size + len(document.chunks) > self.batch_size)):
+                yield batch
+                batch, size = [], 0
+
+            batch.append(document)
+            size += len(document.chunks)
+
+        if (batch): yield batch
+
+    async def _embed(self, batch: List[EmbeddingDocument]):
+        texts = [chunk for document in batch for chunk in document.chunks]
+        await self.rate_limiter.acquire()
+
+        return batch, await self.embeddings.aembed_documents(texts)
+
+    async def _write_done(self, session: AsyncSession, pending: set, stats: Dict[str, Any], return_when) -> None:
+        done, _ = await asyncio.wait(pending, return_when=return_when)
+
+        for task in done:
+            pending.discard(task)
+            batch, vectors = task.result()
+            await self._write(session, batch, vectors)
+
+            stats["documents"] += len(batch)
+            stats["chunks"] += len(vectors)
+            stats["batches"] += 1
+
+    async def _write(self, session: AsyncSession, batch: List[EmbeddingDocument], vectors: List[List[float]]) -> None:
+        rows = []
+        position = 0
+
+        for document in batch:
+            metadata = json.dumps(document.metadata, default=str)
+
+            for index, chunk in enumerate(document.chunks):
+                rows.append({
+                    "source_id": document.source_id,
+                    "chunk_index": index,
+                    "content": chunk,
+                    "embedding": vectors[position],
+                    "metadata": metadata,
+                    "content_hash": document.content_hash,
+                })
+                position += 1
+
+        await session.execute(self._upsert, rows)
+        await session.execute(self._trim, {
+            "source_ids": [document.source_id for document in batch],
+            "chunk_counts": [len(document.chunks) for document in batch],
+        })
+        await session.commit()
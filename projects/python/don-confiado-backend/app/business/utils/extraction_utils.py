@@ -0,0 +1,68 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def extraction_args(result: Any) -> Dict[str, Any]:
+    """Argumentos de una salida estructurada con schema JSON (lista de tool calls o dict)."""
+    if isinstance(result, list):
+        return (result[0].get("args") or {}) if result else {}
+
+    return result or {}
+
+
+def clean_text(value: Any) -> Optional[str]:
+    """Texto sin espacios sobrantes; None si viene vacío o como 'null'."""
+    if (value is None): return None
+
+    text = str(value).strip()
+    if (text == "" or text.lower() in ("null", "none", "n/a")): return None
+
+    return text
+
+
+def as_number(value: Any, minimum: Optional[float] = None) -> Optional[float]:
+    """Número (acepta '3.500', '3,5', '$ 12000'); None si no es válido o es menor que `minimum`."""
+    if (isinstance(value, bool)): return None
+
+    if (not isinstance(value, (int, float))):
+        text = clean_text(value)
+        if (text is None): return None
+
+        text = re.sub(r"[^\d,.\-]", "", text)
+
+        # '3.500' / '1.234.567' son separadores de miles; '3,5' es decimal
+        if (re.fullmatch(r"-?\d{1,3}(\.\d{3})+", text)): text = text.replace(".", "")
+        text = text.replace(",", ".")
+
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+
+    if (minimum is not None and value < minimum): return None
+
+    return value
+
+
+def as_int(value: Any, minimum: Optional[int] = None) -> Optional[int]:
+    """Entero; None si no es válido, tiene decimales o es menor que `minimum`."""
+    number = as_number(value, minimum)
+    if (number is None or int(number) != number): return None
+
+    return int(number)
+
+
+def validate_fields(extracted: Dict[str, Any], parsers: Dict[str, Callable[[Any], Any]]) -> Tuple[Dict[str, Any], List[str]]:
+    """Aplica un parser por campo: devuelve (registro con los válidos, campos faltantes o inválidos)."""
+    record: Dict[str, Any] = {}
+    missing: List[str] = []
+
+    for field, parse in parsers.items():
+        value = parse(extracted.get(field))
+
+        if (value is None):
+            missing.append(field)
+        else:
+            record[field] = value
+
+    return record, missing
@@ -0,0 +1,354 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from business.utils.response_cache import normalize_message
+
+# Umbral de confianza del modelo lineal para decidir sin llamar al LLM
+DEFAULT_INTENT_THRESHOLD = float(os.getenv("DONCONFIADO_INTENT_THRESHOLD", "0.9"))
+# Directorio de los modelos entrenados (intent_<namespace>.npz)
+INTENT_MODEL_DIR = os.getenv("DONCONFIADO_INTENT_MODEL_DIR", os.path.join("ai", "models"))
+# Archivo JSONL donde se registran las clasificaciones del LLM (datos de entrenamiento); vacío = sin registro
+INTENT_LOG_PATH = os.getenv("DONCONFIADO_INTENT_LOG_PATH", "")
+
+FEATURE_DIM = 2 ** 14
+
+# Reglas: el mensaje completo debe estar formado solo por estas frases (y palabras de relleno)
+BYE_PHRASES = {
+    "chao", "chau", "adios", "bye", "hasta luego", "hasta pronto", "hasta manana",
+    "nos vemos", "me despido", "feliz dia", "feliz tarde", "feliz noche",
+}
+GREETING_PHRASES = {
+    "hola", "holi", "buenas", "buenos dias", "buenas tardes", "buenas noches", "hey",
+    "que tal", "saludos", "como estas", "como esta", "como vas", "gracias", "muchas gracias",
+    "mil gracias", "te agradezco", "muy amable",
+}
+FILLER_WORDS = {"don", "confiado", "senor", "muy", "bien", "ok", "listo", "perfecto", "bueno", "pues", "y", "entonces", "por", "todo"}
+
+
+@dataclass
+class LocalIntent:
+    """Intención decidida localmente (sin LLM)."""
+    label: str
+    confidence: float
+    source: str
+    latency_us: float
+
+
+def match_rules(normalized: str) -> Optional[str]:
+    """'bye' / 'other' / 'none' si el mensaje completo es una despedida, saludo/agradecimiento o está vacío."""
+    if (not normalized): return "none"
+
+    words = normalized.split()
+    found: Set[str] = set()
+    i = 0
+
+    while (i < len(words)):
+        # Frases de hasta tres palabras, la más larga primero
+        for size in (3, 2, 1):
+            phrase = " ".join(words[i:i + size])
+
+            if (phrase in BYE_PHRASES):
+                found.add("bye")
+                break
+            if (phrase in GREETING_PHRASES):
+                found.add("other")
+                break
+        else:
+            if (words[i] not in FILLER_WORDS): return None
+
+            size = 1
+
+        i += size
+
+    if ("bye" in found): return "bye"
+    if ("other" in found): return "other"
+
+    return None
+
+
+def extract_features(normalized: str, dim: int = FEATURE_DIM) -> np.ndarray:
+    """Índices (hashing) de palabras, bigramas y trigramas de caracteres del mensaje normalizado."""
+    words = normalized.split()
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+
+    for w in words:
+        padded = f"<{w}>"
+        grams += [f"c:{padded[j:j + 3]}" for j in range(len(padded) - 2)]
+
+    grams.append("len:" + str(min(len(words), 10)))
+
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64, count=len(grams)))
+
+
+class LinearIntentModel:
+    """Regresión logística multinomial sobre features hasheadas (entrenada fuera de línea)."""
+
+    def __init__(self, labels: Sequence[str], dim: int = FEATURE_DIM, weights: Optional[np.ndarray] = None, bias: Optional[np.ndarray] = None):
+        self.labels = list(labels)
+        self.dim = dim
+        self.weights = weights if weights is not None else np.zeros((dim, len(self.labels)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(self.labels), dtype=np.float32)
+
+    def probabilities(self, normalized: str) -> np.ndarray:
+        logits = self.weights[extract_features(normalized, self.dim)].sum(axis=0) + self.bias
+        logits = np.exp(logits - logits.max())
+
+        return logits / logits.sum()
+
+    def predict(self, normalized: str) -> Tuple[str, float]:
+        probs = self.probabilities(normalized)
+        best = int(np.argmax(probs))
+
+        return self.labels[best], float(probs[best])
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str], epochs: int = 10, learning_rate: float = 0.3, l2: float = 1e-5, seed: int = 13) -> "LinearIntentModel":
+        features = [extract_features(normalize_message(t), self.dim) for t in texts]
+        targets = [self.labels.index(label) for label in labels]
+        order = list(range(len(features)))
+        rng = random.Random(seed)
+
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + epoch)
+
+            for idx in order:
+                feats = features[idx]
+                logits = self.weights[feats].sum(axis=0) + self.bias
+                probs = np.exp(logits - logits.max())
+                probs /= probs.sum()
+                probs[targets[idx]] -= 1.0
+
+                self.weights[feats] -= rate * (probs + l2 * self.weights[feats])
+                self.bias -= rate * probs
+
+        return self
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, labels=np.array(self.labels), dim=self.dim, weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> "LinearIntentModel":
+        data = np.load(path)
+
+        return cls([str(label) for label in data["labels"]], int(data["dim"]), data["weights"], data["bias"])
+
+
+class LocalIntentClassifier:
+    """
+    Clasificador de intención local que se ejecuta antes del clasificador LLM.
+
+    Primero aplica reglas (despedidas, saludos/agradecimientos, mensaje vacío) y luego,
+    si hay un modelo entrenado, lo usa cuando su confianza supera `threshold`. Solo decide
+    etiquetas de `decidable_labels`: el resto (p. ej. crear entidades, que además requiere
+    extraer datos) se escala al LLM. `label_map` traduce las etiquetas de las reglas al
+    vocabulario del endpoint.
+    """
+
+    def __init__(self,
+                 namespace: str,
+                 decidable_labels: Iterable[str] = ("bye", "other", "none"),
+                 label_map: Optional[Dict[str, str]] = None,
+                 threshold: float = DEFAULT_INTENT_THRESHOLD,
+                 model_path: Optional[str] = None,
+                 log_path: str = INTENT_LOG_PATH):
+        self.namespace = namespace
+        self.decidable_labels = set(decidable_labels)
+        self.label_map = label_map or {}
+        self.threshold = threshold
+        self.model_path = model_path or os.path.join(INTENT_MODEL_DIR, f"intent_{namespace}.npz")
+        self.log_path = log_path
+        self.model: Optional[LinearIntentModel] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Any] = {"rule": 0, "model": 0, "escalated": 0, "logged": 0, "latency_us_total": 0.0}
+        self._decided_by_label: Dict[str, int] = {}
+
+        if (os.path.exists(self.model_path)):
+            try:
+                self.model = LinearIntentModel.load(self.model_path)
+            except Exception as ex:
+                print(f"⚠️ Intent model could not be loaded ({self.model_path}): {str(ex)}")
+
+    def classify(self, text: str) -> Optional[LocalIntent]:
+        """Intención decidida localmente, o None si se debe escalar al LLM."""
+        started = time.perf_counter()
+        normalized = normalize_message(text)
+        label, confidence, source = None, 0.0, "rule"
+
+        rule_label = match_rules(normalized)
+
+        if (rule_label is not None):
+            label, confidence = self.label_map.get(rule_label, rule_label), 1.0
+        elif (self.model is not None):
+            label, confidence = self.model.predict(normalized)
+            source = "model"
+
+        latency_us = (time.perf_counter() - started) * 1e6
+        decided = label in self.decidable_labels and confidence >= self.threshold
+
+        with self._lock:
+            self._counters["latency_us_total"] += latency_us
+
+            if (not decided):
+                self._counters["escalated"] += 1
+                return None
+
+            self._counters[source] += 1
+            self._decided_by_label[label] = self._decided_by_label.get(label, 0) + 1
+
+        return LocalIntent(label, confidence, source, latency_us)
+
+    def log(self, text: str, label: str) -> None:
+        """Registra una clasificación del LLM como ejemplo de entrenamiento (si hay archivo configurado)."""
+        if (not self.log_path or not text): return
+
+        record = json.dumps({"namespace": self.namespace, "text": text, "label": label, "ts": time.time()}, ensure_ascii=False)
+
+        try:
+            with self._lock:
+                with open(self.log_path, "a", encoding="utf-8") as fh:
+                    fh.write(record + "\n")
+
+                self._counters["logged"] += 1
+        except OSError as ex:
+            print(f"⚠️ Intent log write failed ({self.log_path}): {str(ex)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            total = stats["rule"] + stats["model"] + stats["escalated"]
+            stats.update({
+                "namespace": self.namespace,
+                "model_loaded": self.model is not None,
+                "threshold": self.threshold,
+                "decided_by_label": dict(self._decided_by_label),
+                "local_rate": round((stats["rule"] + stats["model"]) / total, 4) if total else 0.0,
+                "avg_latency_us": round(stats.pop("latency_us_total") / total, 2) if total else 0.0,
+            })
+
+            return stats
+
+
+def build_intent_classifier(namespace: str, **kwargs) -> LocalIntentClassifier:
+    """Clasificador con las etiquetas de cada endpoint: chat_v1 (v1.1) o chat_v2 (v2.0)."""
+    if (namespace == "chat_v1"):
+        return LocalIntentClassifier(
+            namespace,
+            decidable_labels=("Other",),
+            label_map={"bye": "Other", "other": "Other", "none": "Other"},
+            **kwargs
+        )
+
+    return LocalIntentClassifier(namespace, decidable_labels=("bye", "other", "none"), **kwargs)
+
+
+# -----------------------------------------------------------------------------
+# Entrenamiento y reporte fuera de línea
+#   python -m business.utils.intent_classifier train --data intent_log.jsonl --namespace chat_v2
+#   python -m business.utils.intent_classifier report --data intent_log.jsonl --namespace chat_v2
+# -----------------------------------------------------------------------------
+
+def load_examples(path: str, namespace: str) -> Tuple[List[str], List[str]]:
+    texts, labels = [], []
+
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if (not line.strip()): continue
+
+            record = json.loads(line)
+
+            if (record.get("namespace") == namespace and record.get("text") and record.get("label")):
+                texts.append(record["text"])
+                labels.append(record["label"])
+
+    return texts, labels
+
+
+def evaluate(classifier: LocalIntentClassifier, texts: Sequence[str], labels: Sequence[str]) -> Dict[str, Any]:
+    """Exactitud del modelo, cobertura/exactitud de lo decidido localmente y latencia por mensaje."""
+    latencies: List[float] = []
+    decided = decided_ok = model_ok = 0
+    per_label: Dict[str, Dict[str, int]] = {}
+
+    for text, label in zip(texts, labels):
+        started = time.perf_counter()
+        local = classifier.classify(text)
+        latencies.append((time.perf_counter() - started) * 1e6)
+
+        if (classifier.model is not None):
+            model_ok += int(classifier.model.predict(normalize_message(text))[0] == label)
+
+        counts = per_label.setdefault(label, {"total": 0, "decided": 0, "correct": 0})
+        counts["total"] += 1
+
+        if (local is not None):
+            decided += 1
+            counts["decided"] += 1
+            decided_ok += int(local.label == label)
+            counts["correct"] += int(local.label == label)
+
+    lat = np.array(latencies) if latencies else np.zeros(1)
+
+    return {
+        "examples": len(texts),
+        "model_accuracy": round(model_ok / len(texts), 4) if texts and classifier.model is not None else None,
+        "local_coverage": round(decided / len(texts), 4) if texts else 0.0,
+        "local_accuracy": round(decided_ok / decided, 4) if decided else None,
+        "llm_calls_saved": decided,
+        "latency_us": {
+            "p50": round(float(np.percentile(lat, 50)), 2),
+            "p99": round(float(np.percentile(lat, 99)), 2),
+            "max": round(float(lat.max()), 2),
+        },
+        "per_label": per_label,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Entrena y evalúa el clasificador local de intención.")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--data", required=True, help="JSONL registrado con DONCONFIADO_INTENT_LOG_PATH")
+    parser.add_argument("--namespace", default="chat_v2", choices=["chat_v1", "chat_v2"])
+    parser.add_argument("--model", default=None, help="ruta del modelo (.npz); por defecto ai/models/intent_<namespace>.npz")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_INTENT_THRESHOLD)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    texts, labels = load_examples(args.data, args.namespace)
+    if (not texts): raise SystemExit(f"No hay ejemplos para '{args.namespace}' en {args.data}")
+
+    model_path = args.model or os.path.join(INTENT_MODEL_DIR, f"intent_{args.namespace}.npz")
+    classifier = build_intent_classifier(args.namespace, threshold=args.threshold, model_path=model_path, log_path="")
+
+    if (args.command == "train"):
+        order = list(range(len(texts)))
+        random.Random(7).shuffle(order)
+        cut = int(len(order) * (1 - args.holdout))
+        train_idx, test_idx = order[:cut], order[cut:] or order[:cut]
+
+        started = time.perf_counter()
+        model = LinearIntentModel(sorted(set(labels))).fit([texts[i] for i in train_idx], [labels[i] for i in train_idx], epochs=args.epochs)
+        print(f"Entrenado con {len(train_idx)} ejemplos en {time.perf_counter() - started:.1f}s")
+
+        model.save(model_path)
+        classifier.model = model
+        print(f"Modelo guardado en {model_path}")
+
+        texts, labels = [texts[i] for i in test_idx], [labels[i] for i in test_idx]
+
+    print(json.dumps(evaluate(classifier, texts, labels), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, Hashable, Optional, Tuple
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from business.utils.usage_tracker import TrackedEmbeddings, get_usage_tracker
+
+DEFAULT_MODEL_PROVIDER = "google_genai"
+DEFAULT_CHAT_MODEL = "gemini-2.5-flash"
+DEFAULT_EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Límite de llamadas concurrentes por modelo. Se puede ajustar por modelo con
+# DONCONFIADO_LLM_CONCURRENCY="gemini-2.5-flash=8,gemini-2.0-flash=4"
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("DONCONFIADO_LLM_MAX_CONCURRENCY", "16"))
+
+
+class LLMRegistry:
+    """
+    Registro de clientes LLM compartido por todo el proceso.
+
+    Mantiene un cliente de chat por nombre de modelo y un runnable de salida
+    estructurada por (modelo, schema), de modo que los endpoints y servicios
+    no construyan clientes ni transportes HTTP en cada petición.
+    """
+
+    def __init__(self,
+                 model_provider: str = DEFAULT_MODEL_PROVIDER,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 concurrency_limits: Optional[Dict[str, int]] = None):
+        self._model_provider = model_provider
+        self._max_concurrency = max_concurrency
+        self._concurrency_limits: Dict[str, int] = self._parse_concurrency_limits(os.getenv("DONCONFIADO_LLM_CONCURRENCY"))
+        self._concurrency_limits.update(concurrency_limits or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._chat_models: Dict[str, BaseChatModel] = {}
+        self._structured: Dict[Tuple[str, Hashable], Runnable] = {}
+        self._embeddings: Dict[str, Embeddings] = {}
+        self._lock = threading.RLock()
+
+    def warm_up(self, *model_names: str) -> "LLMRegistry":
+        for model_name in model_names:
+            self.chat_model(model_name)
+
+        return self
+
+    def register(self, model_name: str, llm: BaseChatModel) -> None:
+        # Permite inyectar un modelo ya construido (p. ej. un modelo falso en benchmarks)
+        with self._lock:
+            if (not llm.callbacks): llm.callbacks = [get_usage_tracker().handler]
+            self._chat_models[model_name] = llm
+            self._structured = {k: v for k, v in self._structured.items() if k[0] != model_name}
+
+    def chat_model(self, model_name: str = DEFAULT_CHAT_MODEL) -> BaseChatModel:
+        llm = self._chat_models.get(model_name)
+        if (llm is not None): return llm
+
+        with self._lock:
+            llm = self._chat_models.get(model_name)
+
+            if (llm is None):
+                # El callback de uso registra tokens y latencia de toda llamada al modelo (también la estructurada)
+                llm = init_chat_model(model_name, model_provider=self._model_provider, callbacks=[get_usage_tracker().handler], **self._credentials())
+                self._chat_models[model_name] = llm
+
+            return llm
+
+    def structured(self, schema: Any, model_name: str = DEFAULT_CHAT_MODEL) -> Runnable:
+        key = (model_name, self._schema_key(schema))
+        runnable = self._structured.get(key)
+        if (runnable is not None): return runnable
+
+        with self._lock:
+            runnable = self._structured.get(key)
+
+            if (runnable is None):
+                runnable = self.chat_model(model_name).with_structured_output(schema)
+                self._structured[key] = runnable
+
+            return runnable
+
+    def embeddings(self, model_name: str = DEFAULT_EMBEDDING_MODEL) -> Embeddings:
+        emb = self._embeddings.get(model_name)
+        if (emb is not None): return emb
+
+        with self._lock:
+            emb = self._embeddings.get(model_name)
+
+            if (emb is None):
+                emb = TrackedEmbeddings(GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=os.getenv("GOOGLE_API_KEY")), model_name)
+                self._embeddings[model_name] = emb
+
+            return emb
+
+    def set_concurrency_limit(self, model_name: str, limit: int) -> None:
+        with self._lock:
+            self._concurrency_limits[model_name] = limit
+            self._semaphores.pop(model_name, None)
+
+    def semaphore(self, model_name: str = DEFAULT_CHAT_MODEL) -> asyncio.Semaphore:
+        sem = self._semaphores.get(model_name)
+        if (sem is not None): return sem
+
+        with self._lock:
+            sem = self._semaphores.get(model_name)
+
+            if (sem is None):
+                sem = asyncio.Semaphore(self._concurrency_limits.get(model_name, self._max_concurrency))
+                self._semaphores[model_name] = sem
+
+            return sem
+
+    async def ainvoke(self, value: Any, model_name: str = DEFAULT_CHAT_MODEL, schema: Any = None) -> Any:
+        """
+        Invoca el modelo (o su variante estructurada si se indica `schema`) sin
+        bloquear el event loop, respetando el límite de concurrencia del modelo.
+        """
+        runnable = self.chat_model(model_name) if (schema is None) else self.structured(schema, model_name)
+        config = {"metadata": {"donconfiado_operation": self._operation_name(schema)}}
+
+        async with self.semaphore(model_name):
+            return await runnable.ainvoke(value, config=config)
+
+    async def astream(self, value: Any, model_name: str = DEFAULT_CHAT_MODEL) -> AsyncIterator[Any]:
+        """Emite los chunks de la respuesta a medida que se generan (mismo límite de concurrencia)."""
+        async with self.semaphore(model_name):
+            async for chunk in self.chat_model(model_name).astream(value, config={"metadata": {"donconfiado_operation": "stream"}}):
+                yield chunk
+
+    @staticmethod
+    def _parse_concurrency_limits(raw: Optional[str]) -> Dict[str, int]:
+        limits: Dict[str, int] = {}
+
+        for item in (raw or "").split(","):
+            name, _, limit = item.partition("=")
+            if (name.strip() and limit.strip()):
+                limits[name.strip()] = int(limit)
+
+        return limits
+
+    @staticmethod
+    def _credentials() -> Dict[str, str]:
+        api_key = os.getenv("GOOGLE_API_KEY")
+
+        return {"api_key": api_key} if api_key else {}
+
+    @staticmethod
+    def _operation_name(schema: Any) -> str:
+        # Nombre con el que se agrupa el uso de tokens: 'chat' o el nombre del schema estructurado
+        if (schema is None): return "chat"
+        if isinstance(schema, dict): return schema.get("title", "structured")
+
+        return getattr(schema, "__name__", "structured")
+
+    @staticmethod
+    def _schema_key(schema: Any) -> Hashable:
+        # Los schemas JSON (dict) no son hashables: se usa su serialización canónica
+        if isinstance(schema, dict):
+            return json.dumps(schema, sort_keys=True)
+
+        return schema
+
+
+_registry: Optional[LLMRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def init_llm_registry(*model_names: str) -> LLMRegistry:
+    """Crea el registro del proceso (si no existe) y precalienta los modelos indicados."""
+    global _registry
+
+    with _registry_lock:
+        if (_registry is None):
+            _registry = LLMRegistry()
+
+    return _registry.warm_up(*model_names)
+
+
+def get_llm_registry() -> LLMRegistry:
+    if (_registry is None):
+        return init_llm_registry()
+
+    return _registry
@@ -1,27 +1,28 @@
+from typing import Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from business.utils.conversation_memory import ConversationMemory
+from business.utils.conversation_store import build_conversation_store
+
 class LLMUtils:
 
-    MEMORY_STORE: dict = {}
+    # Memoria por usuario con presupuesto de tokens y resúmenes; el store (memoria LRU o SQL) se elige por entorno
+    MEMORY_STORE: ConversationMemory = ConversationMemory(build_conversation_store("chat_v1"))
 
     @staticmethod
-    def _get_history(user_id: str):
-       if user_id not in LLMUtils.MEMORY_STORE:
-           LLMUtils.MEMORY_STORE[user_id] = []
+    async def _refresh_history(user_id: str) -> None:
+       await LLMUtils.MEMORY_STORE.refresh(user_id)
 
-       return LLMUtils.MEMORY_STORE[user_id]
+    @staticmethod
+    def _get_history(user_id: str):
+       return LLMUtils.MEMORY_STORE.messages(user_id)
 
     @staticmethod
     def _append_message(user_id: str, role: str, content: str) -> None:
-       history = LLMUtils._get_history(user_id)
-       history.append({"role": role, "content": content})
+       message = HumanMessage(content=content) if role == "human" else AIMessage(content=content)
+       LLMUtils.MEMORY_STORE.append(user_id, message)
 
     @staticmethod
-    def _history_as_text(user_id: str) -> str:
-       lines = []
-
-       for msg in LLMUtils._get_history(user_id):
-           if msg.get("role") == "human":
-               lines.append(f"Usuario: {msg.get('content', '')}")
-           elif msg.get("role") == "ai":
-               lines.append(f"Asistente: {msg.get('content', '')}")
-
-       return "\n".join(lines)
\ No newline at end of file
+    def _history_as_text(user_id: str, max_messages: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
+       return LLMUtils.MEMORY_STORE.history_as_text(user_id, max_messages=max_messages, max_tokens=max_tokens)
@@ -0,0 +1,91 @@
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+# Si es true, las respuestas de estado se redactan con el LLM (comportamiento anterior); por defecto se usan plantillas
+LLM_REPLY_PHRASING = os.getenv("DONCONFIADO_LLM_REPLY_PHRASING", "false").lower() == "true"
+
+# Nombre legible de cada campo para pedir datos faltantes
+FIELD_LABELS: Dict[str, str] = {
+    "sku": "el SKU",
+    "nombre": "el nombre",
+    "precio_venta": "el precio de venta",
+    "cantidad": "la cantidad",
+    "proveedor_id": "el proveedor",
+    "tipo_documento": "el tipo de documento (CC, NIT o CE)",
+    "numero_documento": "el número de documento",
+    "razon_social": "la razón social",
+    "nombres": "los nombres",
+    "apellidos": "los apellidos",
+}
+
+# Plantillas por entidad y estado; se elige una variante al azar para que no suene repetitivo
+REPLY_TEMPLATES: Dict[str, Dict[str, List[str]]] = {
+    "producto": {
+        "need_more_data": [
+            "¡Con gusto creo el producto! Solo necesito {faltantes}.",
+            "Para registrar el producto necesito {faltantes}. ¿Me ayudas con eso?",
+            "Vamos bien. Para terminar de crear el producto necesito {faltantes}.",
+        ],
+        "created": [
+            "¡Listo! El producto {nombre} (SKU {sku}) quedó creado.",
+            "Producto {nombre} registrado con éxito (SKU {sku}).",
+            "Hecho: ya tienes el producto {nombre} en tu inventario (SKU {sku}).",
+        ],
+        "missing_credentials": [
+            "Aún no puedo guardar el producto: faltan las credenciales de Supabase (SUPABASE_URL y SUPABASE_SERVICE_ROLE_KEY). Configúralas y lo intentamos de nuevo.",
+            "Para crear productos primero hay que configurar SUPABASE_URL y SUPABASE_SERVICE_ROLE_KEY. Cuando estén listas, lo registramos.",
+        ],
+        "error": [
+            "Tuve un problema al crear el producto. ¿Lo intentamos de nuevo?",
+            "No pude registrar el producto en este momento. Por favor, inténtalo otra vez.",
+        ],
+    },
+    "distribuidor": {
+        "need_more_data": [
+            "¡Con gusto registro el distribuidor! Solo necesito {faltantes}.",
+            "Para crear el distribuidor necesito {faltantes}. ¿Me ayudas con eso?",
+            "Vamos bien. Para terminar de registrar el distribuidor necesito {faltantes}.",
+        ],
+        "created": [
+            "¡Listo! El distribuidor {nombre} quedó registrado.",
+            "Distribuidor {nombre} creado con éxito.",
+            "Hecho: {nombre} ya está en tu lista de distribuidores.",
+        ],
+        "missing_credentials": [
+            "Aún no puedo guardar el distribuidor: faltan las credenciales de Supabase (SUPABASE_URL y SUPABASE_SERVICE_ROLE_KEY). Configúralas y lo intentamos de nuevo.",
+            "Para crear distribuidores primero hay que configurar SUPABASE_URL y SUPABASE_SERVICE_ROLE_KEY. Cuando estén listas, lo registramos.",
+        ],
+        "error": [
+            "Tuve un problema al crear el distribuidor. ¿Lo intentamos de nuevo?",
+            "No pude registrar el distribuidor en este momento. Por favor, inténtalo otra vez.",
+        ],
+    },
+}
+
+
+class _Defaults(dict):
+    # Un dato ausente no rompe la plantilla: se deja vacío
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+def join_fields(fields: List[str]) -> str:
+    """['sku', 'cantidad'] -> 'el SKU y la cantidad'."""
+    labels = [FIELD_LABELS.get(field, field) for field in fields]
+
+    if (len(labels) <= 1): return "".join(labels)
+
+    return ", ".join(labels[:-1]) + " y " + labels[-1]
+
+
+def render_reply(entity: str, status: str, missing_fields: Optional[List[str]] = None, rng: Optional[random.Random] = None, **values: Any) -> str:
+    """Respuesta de estado a partir de las plantillas (sin llamar al modelo)."""
+    variants = REPLY_TEMPLATES[entity][status]
+    template = (rng or random).choice(variants)
+    values["faltantes"] = join_fields(missing_fields or [])
+
+    reply = template.format_map(_Defaults({k: v for k, v in values.items() if v is not None}))
+
+    # Un dato vacío puede dejar espacios dobles
+    return " ".join(reply.split())
@@ -0,0 +1,266 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from business.utils.llm_registry import DEFAULT_EMBEDDING_MODEL, get_llm_registry
+
+
+def normalize_message(text: str) -> str:
+    """Minúsculas, sin tildes, sin puntuación y con espacios colapsados."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+
+    return " ".join(text.split())
+
+
+@dataclass
+class CacheLookup:
+    """Resultado de una consulta a la caché; si no hubo acierto se usa para guardar la respuesta."""
+    scope: str
+    normalized: str
+    value: Any = None
+    level: Optional[str] = None
+    similarity: Optional[float] = None
+    vector: Optional[np.ndarray] = None
+    # Embedding original (sin normalizar) de la pregunta, reutilizable por quien consulta (p. ej. búsqueda RAG)
+    embedding: Optional[List[float]] = None
+
+    @property
+    def hit(self) -> bool:
+        return self.level is not None
+
+
+class _CacheEntry:
+    __slots__ = ("value", "created_at", "slot")
+
+    def __init__(self, value: Any, created_at: float, slot: Optional[int]):
+        self.value = value
+        self.created_at = created_at
+        self.slot = slot
+
+
+class ResponseCache:
+    """
+    Caché de respuestas en dos niveles para preguntas frecuentes:
+
+    1. Coincidencia exacta sobre el mensaje normalizado.
+    2. Vecino más cercano (similitud coseno) sobre el embedding de la pregunta,
+       aceptado solo por encima de `similarity_threshold`.
+
+    Las entradas expiran tras `ttl_seconds` y, al superar `max_entries`, se expulsa
+    la menos usada (LRU). `scope` separa respuestas que no son intercambiables
+    (p. ej. distinto modelo o tipo de búsqueda). Quien la usa decide qué es cacheable:
+    nada que dependa del historial del usuario debe pasar por aquí.
+    """
+
+    def __init__(self,
+                 namespace: str,
+                 max_entries: int = int(os.getenv("DONCONFIADO_RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+                 ttl_seconds: float = float(os.getenv("DONCONFIADO_RESPONSE_CACHE_TTL_SECONDS", "3600")),
+                 similarity_threshold: float = float(os.getenv("DONCONFIADO_RESPONSE_CACHE_SIMILARITY", "0.92")),
+                 semantic: bool = os.getenv("DONCONFIADO_RESPONSE_CACHE_SEMANTIC", "true").lower() == "true",
+                 enabled: bool = os.getenv("DONCONFIADO_RESPONSE_CACHE", "true").lower() == "true",
+                 embedding_model: str = DEFAULT_EMBEDDING_MODEL):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.semantic = semantic
+        self.enabled = enabled
+        self.embedding_model = embedding_model
+
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        # Índice semántico: una fila por entrada (vectores normalizados) en una matriz preasignada
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[Tuple[str, str]]] = [None] * max_entries
+        self._slot_scopes = np.full(max_entries, -1, dtype=np.int32)
+        self._free_slots: List[int] = list(range(max_entries - 1, -1, -1))
+        self._scope_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self._counters: Dict[str, int] = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "skipped": 0,
+            "stores": 0,
+            "expired": 0,
+            "evicted": 0,
+            "embedding_errors": 0,
+        }
+
+    # -------------------------------------------------------------------------
+    # Consulta y escritura
+    # -------------------------------------------------------------------------
+
+    async def lookup(self, text: str, scope: str = "") -> CacheLookup:
+        lookup = CacheLookup(scope=scope, normalized=normalize_message(text))
+        if (not self.enabled or not lookup.normalized): return lookup
+
+        with self._lock:
+            entry = self._get_entry((scope, lookup.normalized))
+
+            if (entry is not None):
+                self._counters["exact_hits"] += 1
+                lookup.value, lookup.level, lookup.similarity = entry.value, "exact", 1.0
+
+                return lookup
+
+        if (self.semantic):
+            lookup.embedding = await self._embed(text)
+            lookup.vector = self._normalize(lookup.embedding)
+
+            if (lookup.vector is not None):
+                with self._lock:
+                    match = self._nearest(scope, lookup.vector)
+
+                    if (match is not None):
+                        entry, similarity = match
+                        self._counters["semantic_hits"] += 1
+                        lookup.value, lookup.level, lookup.similarity = entry.value, "semantic", similarity
+
+                        return lookup
+
+        with self._lock:
+            self._counters["misses"] += 1
+
+        return lookup
+
+    def store(self, lookup: CacheLookup, value: Any) -> None:
+        if (not self.enabled or not lookup.normalized or lookup.hit): return
+
+        key = (lookup.scope, lookup.normalized)
+
+        with self._lock:
+            self._remove(key)
+
+            while (len(self._entries) >= self.max_entries):
+                self._remove(next(iter(self._entries)))
+                self._counters["evicted"] += 1
+
+            slot = None
+
+            if (lookup.vector is not None):
+                if (self._vectors is None):
+                    self._vectors = np.zeros((self.max_entries, lookup.vector.shape[0]), dtype=np.float32)
+
+                slot = self._free_slots.pop()
+                self._vectors[slot] = lookup.vector
+                self._slot_keys[slot] = key
+                self._slot_scopes[slot] = self._scope_id(lookup.scope)
+
+            self._entries[key] = _CacheEntry(value, time.monotonic(), slot)
+            self._counters["stores"] += 1
+
+    def skip(self) -> None:
+        """Registra una petición que no pasó por la caché (p. ej. depende del historial)."""
+        with self._lock:
+            self._counters["skipped"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    # -------------------------------------------------------------------------
+    # Métricas
+    # -------------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+            stats.update({
+                "namespace": self.namespace,
+                "enabled": self.enabled,
+                "semantic": self.semantic,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hit_rate": round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0,
+            })
+
+            return stats
+
+    # -------------------------------------------------------------------------
+    # Internos (se llaman con el lock tomado, salvo _embed)
+    # -------------------------------------------------------------------------
+
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            return await get_llm_registry().embeddings(self.embedding_model).aembed_query(text)
+        except Exception as ex:
+            print(f"⚠️ Response cache embedding failed ({self.namespace}): {str(ex)}")
+            with self._lock:
+                self._counters["embedding_errors"] += 1
+
+            return None
+
+    @staticmethod
+    def _normalize(embedding: Optional[List[float]]) -> Optional[np.ndarray]:
+        if (not embedding): return None
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+
+        return vector / norm if norm else None
+
+    def _get_entry(self, key: Tuple[str, str]) -> Optional[_CacheEntry]:
+        entry = self._entries.get(key)
+        if (entry is None): return None
+
+        if (self._expired(entry)):
+            self._remove(key)
+            self._counters["expired"] += 1
+
+            return None
+
+        self._entries.move_to_end(key)
+
+        return entry
+
+    def _nearest(self, scope: str, vector: np.ndarray) -> Optional[Tuple[_CacheEntry, float]]:
+        scope_id = self._scope_ids.get(scope)
+        if (self._vectors is None or scope_id is None or vector.shape[0] != self._vectors.shape[1]): return None
+
+        candidates = np.flatnonzero(self._slot_scopes == scope_id)
+
+        while (candidates.size):
+            similarities = self._vectors[candidates] @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+
+            if (similarity < self.similarity_threshold): return None
+
+            entry = self._get_entry(self._slot_keys[candidates[best]])
+            if (entry is not None): return entry, similarity
+
+            # La mejor candidata había expirado: se descarta y se prueba la siguiente
+            candidates = np.delete(candidates, best)
+
+        return None
+
+    def _expired(self, entry: _CacheEntry) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+
+        if (entry is not None and entry.slot is not None):
+            self._slot_keys[entry.slot] = None
+            self._slot_scopes[entry.slot] = -1
+            self._free_slots.append(entry.slot)
+
+    def _scope_id(self, scope: str) -> int:
+        if (scope not in self._scope_ids): self._scope_ids[scope] = len(self._scope_ids)
+
+        return self._scope_ids[scope]
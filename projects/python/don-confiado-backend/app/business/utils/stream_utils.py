@@ -0,0 +1,30 @@
+import json
+from typing import Any
+
+# Cabeceras para que proxies (nginx) no acumulen la respuesta antes de enviarla
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Serializa un evento Server-Sent Events con datos JSON."""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def chunk_text(chunk: Any) -> str:
+    """Extrae el texto de un chunk de `astream` (contenido simple o lista de partes)."""
+    content = getattr(chunk, "content", chunk)
+
+    if isinstance(content, str):
+        return content
+
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in (content or [])
+    )
@@ -0,0 +1,341 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.outputs import LLMResult
+
+from business.utils.conversation_store import estimate_tokens
+
+# Límites de lo que se guarda en memoria para las métricas
+USAGE_MAX_USERS = int(os.getenv("DONCONFIADO_USAGE_MAX_USERS", "1000"))
+USAGE_RECENT_CALLS = int(os.getenv("DONCONFIADO_USAGE_RECENT_CALLS", "200"))
+
+
+class UsageStats:
+    """Acumulado de llamadas, tokens y latencia."""
+
+    __slots__ = ("calls", "errors", "prompt_tokens", "completion_tokens", "latency_ms_total", "latency_ms_max")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, latency_ms: float, error: bool) -> None:
+        self.calls += 1
+        self.errors += int(error)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latency_ms_total += latency_ms
+        self.latency_ms_max = max(self.latency_ms_max, latency_ms)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "latency_ms_total": round(self.latency_ms_total, 1),
+            "latency_ms_avg": round(self.latency_ms_total / self.calls, 1) if self.calls else 0.0,
+            "latency_ms_max": round(self.latency_ms_max, 1),
+        }
+
+
+class UsageScope:
+    """Petición en curso: endpoint, usuario y acumulado de sus llamadas a modelos."""
+
+    def __init__(self, endpoint: str, user_id: Optional[str] = None):
+        self.request_id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.user_id = user_id
+        self.totals = UsageStats()
+
+
+_current_scope: ContextVar[Optional[UsageScope]] = ContextVar("donconfiado_usage_scope", default=None)
+
+
+def begin_usage_scope(endpoint: str, user_id: Optional[str] = None) -> UsageScope:
+    scope = UsageScope(endpoint, user_id)
+    _current_scope.set(scope)
+
+    return scope
+
+
+def set_usage_user(user_id: Optional[str]) -> None:
+    """Asocia el usuario a la petición en curso (el endpoint lo conoce tras leer el body)."""
+    scope = _current_scope.get()
+
+    if (scope is None):
+        begin_usage_scope("(sin endpoint)", user_id)
+    else:
+        scope.user_id = user_id
+
+
+class UsageTracker:
+    """
+    Contabilidad de tokens y latencia de las llamadas a modelos (chat y embeddings),
+    agregada por endpoint, usuario, modelo y operación (endpoint + schema/tipo de llamada).
+    """
+
+    def __init__(self, max_users: int = USAGE_MAX_USERS, recent_calls: int = USAGE_RECENT_CALLS):
+        self.max_users = max_users
+        self.handler = UsageCallbackHandler(self)
+        self._lock = threading.Lock()
+        self.reset(recent_calls)
+
+    def reset(self, recent_calls: Optional[int] = None) -> None:
+        with self._lock:
+            self._totals = UsageStats()
+            self._by_endpoint: Dict[str, UsageStats] = {}
+            self._by_model: Dict[str, UsageStats] = {}
+            self._by_operation: Dict[str, UsageStats] = {}
+            self._by_user: "OrderedDict[str, UsageStats]" = OrderedDict()
+            self._recent: deque = deque(maxlen=recent_calls if recent_calls is not None else self._recent.maxlen)
+
+    def record(self, kind: str, model: str, operation: str, prompt_tokens: int, completion_tokens: int, latency_ms: float, error: bool = False, scope: Optional[UsageScope] = None) -> None:
+        scope = scope or _current_scope.get()
+        endpoint = scope.endpoint if scope else "(sin endpoint)"
+        user_id = (scope.user_id if scope else None) or "(anónimo)"
+
+        with self._lock:
+            for stats in (
+                self._totals,
+                self._by_endpoint.setdefault(endpoint, UsageStats()),
+                self._by_model.setdefault(model, UsageStats()),
+                self._by_operation.setdefault(f"{endpoint} {kind}:{operation}", UsageStats()),
+                self._user_stats(user_id),
+                scope.totals if scope else None,
+            ):
+                if (stats is not None): stats.add(prompt_tokens, completion_tokens, latency_ms, error)
+
+            self._recent.append({
+                "request_id": scope.request_id if scope else None,
+                "endpoint": endpoint,
+                "user_id": user_id,
+                "kind": kind,
+                "model": model,
+                "operation": operation,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latency_ms": round(latency_ms, 1),
+                "error": error,
+                "ts": time.time(),
+            })
+
+    def stats(self, user_id: Optional[str] = None, recent: int = 0) -> Dict[str, Any]:
+        with self._lock:
+            if (user_id):
+                stats = self._by_user.get(user_id)
+                calls = [c for c in self._recent if c["user_id"] == user_id]
+
+                return {
+                    "user_id": user_id,
+                    "usage": stats.as_dict() if stats else None,
+                    "recent": calls[-recent:] if recent else [],
+                }
+
+            return {
+                "totals": self._totals.as_dict(),
+                "by_endpoint": {k: v.as_dict() for k, v in self._by_endpoint.items()},
+                "by_model": {k: v.as_dict() for k, v in self._by_model.items()},
+                # Ordenado por tokens: las operaciones más costosas primero
+                "by_operation": dict(sorted(
+                    ((k, v.as_dict()) for k, v in self._by_operation.items()),
+                    key=lambda item: item[1]["total_tokens"], reverse=True
+                )),
+                "users": len(self._by_user),
+                "top_users": dict(sorted(
+                    ((k, v.as_dict()) for k, v in self._by_user.items()),
+                    key=lambda item: item[1]["total_tokens"], reverse=True
+                )[:20]),
+                "recent": list(self._recent)[-recent:] if recent else [],
+            }
+
+    def _user_stats(self, user_id: str) -> UsageStats:
+        stats = self._by_user.get(user_id)
+
+        if (stats is None):
+            stats = self._by_user[user_id] = UsageStats()
+
+            while (len(self._by_user) > self.max_users):
+                self._by_user.popitem(last=False)
+        else:
+            self._by_user.move_to_end(user_id)
+
+        return stats
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Callback de LangChain: mide cada llamada al modelo y lee el uso de tokens de la respuesta."""
+
+    # Se ejecuta en el mismo hilo/event loop de la llamada (solo actualiza contadores)
+    run_inline = True
+
+    def __init__(self, tracker: UsageTracker):
+        self.tracker = tracker
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, metadata, kwargs)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._start(run_id, metadata, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id)
+        if (run is None): return
+
+        prompt_tokens, completion_tokens = self._usage(response)
+        self.tracker.record("chat", run["model"], run["operation"], prompt_tokens, completion_tokens, run["latency_ms"], scope=run["scope"])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._finish(run_id)
+        if (run is None): return
+
+        self.tracker.record("chat", run["model"], run["operation"], 0, 0, run["latency_ms"], error=True, scope=run["scope"])
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        model = metadata.get("ls_model_name") or params.get("model") or params.get("model_name") or "(desconocido)"
+
+        with self._lock:
+            self._runs[run_id] = {
+                "started": time.perf_counter(),
+                "model": str(model).removeprefix("models/"),
+                "operation": metadata.get("donconfiado_operation", "chat"),
+                "scope": _current_scope.get(),
+            }
+
+    def _finish(self, run_id: UUID) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+
+        if (run is not None): run["latency_ms"] = (time.perf_counter() - run["started"]) * 1000
+
+        return run
+
+    @staticmethod
+    def _usage(response: LLMResult) -> tuple:
+        prompt_tokens = completion_tokens = 0
+
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+
+                if (usage):
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+
+        if (not prompt_tokens and not completion_tokens and response.llm_output):
+            usage = response.llm_output.get("usage_metadata") or response.llm_output.get("token_usage") or {}
+            prompt_tokens = usage.get("input_tokens", usage.get("prompt_tokens", 0)) or 0
+            completion_tokens = usage.get("output_tokens", usage.get("completion_tokens", 0)) or 0
+
+        return prompt_tokens, completion_tokens
+
+
+class TrackedEmbeddings(Embeddings):
+    """
+    Envuelve un cliente de embeddings para registrar latencia y tokens.
+    La API de embeddings no devuelve uso: los tokens se estiman por longitud del texto.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str, tracker: Optional[UsageTracker] = None):
+        self.inner = inner
+        self.model_name = model_name.removeprefix("models/")
+        self.tracker = tracker or get_usage_tracker()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+
+        try:
+            result = self.inner.embed_documents(texts)
+            self._record("embed_documents", texts, started)
+
+            return result
+        except Exception:
+            self._record("embed_documents", texts, started, error=True)
+            raise
+
+    def embed_query(self, text: str) -> List[float]:
+        started = time.perf_counter()
+
+        try:
+            result = self.inner.embed_query(text)
+            self._record("embed_query", [text], started)
+
+            return result
+        except Exception:
+            self._record("embed_query", [text], started, error=True)
+            raise
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+
+        try:
+            result = await self.inner.aembed_documents(texts)
+            self._record("embed_documents", texts, started)
+
+            return result
+        except Exception:
+            self._record("embed_documents", texts, started, error=True)
+            raise
+
+    async def aembed_query(self, text: str) -> List[float]:
+        started = time.perf_counter()
+
+        try:
+            result = await self.inner.aembed_query(text)
+            self._record("embed_query", [text], started)
+
+            return result
+        except Exception:
+            self._record("embed_query", [text], started, error=True)
+            raise
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    def _record(self, operation: str, texts: List[str], started: float, error: bool = False) -> None:
+        tokens = 0 if error else sum(estimate_tokens(t) for t in texts)
+        self.tracker.record("embedding", self.model_name, operation, tokens, 0, (time.perf_counter() - started) * 1000, error=error)
+
+
+_tracker = UsageTracker()
+
+
+def get_usage_tracker() -> UsageTracker:
+    return _tracker
+
+
+async def usage_middleware(request, call_next):
+    """
+    Middleware HTTP: abre un scope de uso por petición a /api/* y, en respuestas que no son
+    streaming, devuelve el acumulado en cabeceras X-LLM-*.
+    """
+    path = request.url.path
+    if (not path.startswith("/api/") or path.startswith("/api/metrics")): return await call_next(request)
+
+    scope = begin_usage_scope(path)
+    response = await call_next(request)
+
+    if (not response.headers.get("content-type", "").startswith("text/event-stream")):
+        totals = scope.totals.as_dict()
+        response.headers["X-LLM-Calls"] = str(totals["calls"])
+        response.headers["X-LLM-Tokens"] = str(totals["total_tokens"])
+        response.headers["X-LLM-Latency-Ms"] = str(totals["latency_ms_total"])
+
+    return response
@@ -0,0 +1,68 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi_utils.cbv import cbv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from business.common.async_connection import get_async_session
+from business.common.text_search import PRODUCT_SEARCH_THRESHOLD
+from business.dao import AsyncProductoDAO, AsyncTerceroDAO
+from business.repositories.entity_repository import serialize_row
+
+
+catalog_webservice_api_router = APIRouter()
+
+# Tamaño máximo de página del catálogo
+CATALOG_MAX_PAGE_SIZE = 500
+
+
+def _as_dict(entity) -> dict:
+    return serialize_row({column.key: getattr(entity, column.key) for column in entity.__table__.columns})
+
+
+async def _page(dao, after_id: Optional[int], limit: int, **filters) -> dict:
+    items = [_as_dict(entity) for entity in await dao.findPage(after_id=after_id, limit=limit, **filters)]
+
+    return {
+        "items": items,
+        # Cursor para la siguiente página (None si no hay más)
+        "next_after_id": items[-1]["id"] if len(items) == limit else None,
+    }
+
+
+# La sesión (async) es la del request: get_async_session la cierra al terminar
+@cbv(catalog_webservice_api_router)
+class CatalogWebService:
+    # Listado de productos paginado por llave (after_id): el costo no crece con el número de página
+    @catalog_webservice_api_router.get("/api/catalog/productos")
+    async def list_productos(self, after_id: Optional[int] = None, limit: int = Query(100, ge=1, le=CATALOG_MAX_PAGE_SIZE), proveedor_id: Optional[int] = None,
+                             session: AsyncSession = Depends(get_async_session)):
+        try:
+            filters = {"proveedor_id": proveedor_id} if proveedor_id is not None else {}
+
+            return await _page(AsyncProductoDAO(session), after_id, limit, **filters)
+        except Exception as ex:
+            raise HTTPException(status_code=500, detail=str(ex))
+
+    # Búsqueda difusa por nombre (tolerante a errores de digitación y tildes), ordenada por similitud
+    @catalog_webservice_api_router.get("/api/catalog/productos/search")
+    async def search_productos(self, q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=CATALOG_MAX_PAGE_SIZE),
+                               threshold: float = Query(PRODUCT_SEARCH_THRESHOLD, ge=0, le=1), proveedor_id: Optional[int] = None,
+                               session: AsyncSession = Depends(get_async_session)):
+        try:
+            results = await AsyncProductoDAO(session).searchByNombre(q, limit=limit, threshold=threshold, proveedor_id=proveedor_id)
+
+            return {"items": [{**_as_dict(producto), "score": score} for producto, score in results]}
+        except Exception as ex:
+            raise HTTPException(status_code=500, detail=str(ex))
+
+    # Listado de terceros (proveedores, clientes, empleados) paginado por llave
+    @catalog_webservice_api_router.get("/api/catalog/terceros")
+    async def list_terceros(self, after_id: Optional[int] = None, limit: int = Query(100, ge=1, le=CATALOG_MAX_PAGE_SIZE), tipo_tercero: Optional[str] = None,
+                            session: AsyncSession = Depends(get_async_session)):
+        try:
+            filters = {"tipo_tercero": tipo_tercero} if tipo_tercero else {}
+
+            return await _page(AsyncTerceroDAO(session), after_id, limit, **filters)
+        except Exception as ex:
+            raise HTTPException(status_code=500, detail=str(ex))
@@ -1,22 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi_utils.cbv import cbv
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional, Sequence
+from datetime import datetime
+from functools import lru_cache
 import os
 import json
 from dotenv import load_dotenv
-from sqlalchemy import text, bindparam
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import Session
+from sqlalchemy import TIMESTAMP, func, literal, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 # LangChain / Google GenAI
-from langchain.chat_models import init_chat_model
+from langchain_core.embeddings import Embeddings
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
 # Local imports
 from endpoints.dto.message_dto import ChatRequestDTO
-from business.common.connection import SessionLocal, engine
+from business.common.async_connection import AsyncSessionLocal
+from business.common.vector_search import SET_SEARCH_PARAMS_SQL, VECTOR_SEARCH_RECALL, search_params
+from business.entities.producto import Producto
+from business.entities.tercero import Tercero
+from business.enums.vector_search_recall import VectorSearchRecall
+from business.enums.vector_search_source import VectorSearchSource
 from business.enums.vector_search_type import VectorSearchType
+from business.utils.embedding_sync import EMBEDDING_BATCH_SIZE, EmbeddingDocument, EmbeddingSync, content_hash
+from business.utils.llm_registry import get_llm_registry
+from business.utils.response_cache import ResponseCache
+from business.utils.stream_utils import SSE_HEADERS, SSE_MEDIA_TYPE, chunk_text, sse_event
+from business.utils.usage_tracker import set_usage_user
 
 chat_clase_03_api_router = APIRouter()
 
@@ -25,6 +37,8 @@ chat_clase_03_api_router = APIRouter()
 EMBEDDING_MODEL_NAME = "models/text-embedding-004"  # 768-dim as of Google GenAI
 EMBEDDING_DIM = 768 #dimensiones del embedding
 CHAT_MODEL_NAME = "gemini-2.5-flash"
+# Filas leídas por viaje al servidor al recorrer productos/proveedores en la sincronización
+SYNC_READ_BATCH_SIZE = int(os.getenv("DONCONFIADO_SYNC_READ_BATCH_SIZE", "500"))
 
 DONCONFIADO_RAG_SYSTEM = (
     "Eres Don Confiado, asesor empresarial. Usa estrictamente el contexto recuperado "
@@ -32,48 +46,9 @@ DONCONFIADO_RAG_SYSTEM = (
     "Si la información no está en el contexto, dilo sin inventar."
 )
 
-# se encarga de asegurar que la extension pg_vector esté instalada en supabase
-def _ensure_pgvector_extension(session: Session) -> None:
-    session.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-
-# creacion de las tablas de vector de productos
-def _create_vector_tables(session: Session) -> None:
-    session.execute(text(f"""
-        CREATE TABLE IF NOT EXISTS productos_vec (
-            id BIGSERIAL PRIMARY KEY,
-            source_id INTEGER REFERENCES productos(id) ON DELETE CASCADE,
-            chunk_index INTEGER DEFAULT 0,
-            content TEXT,
-            embedding vector({EMBEDDING_DIM}),
-            metadata JSONB,
-            created_at TIMESTAMP DEFAULT NOW(),
-            UNIQUE (source_id, chunk_index)
-        );
-    """))
-    session.execute(text(f"""
-        CREATE INDEX IF NOT EXISTS idx_productos_vec_embedding
-        ON productos_vec USING ivfflat (embedding vector_l2_ops) WITH (lists = 100);
-    """))
-
-    # Proveedores (distribuidores) con segmentación por chunks
-    session.execute(text(f"""
-        CREATE TABLE IF NOT EXISTS proveedores_vec (
-            id BIGSERIAL PRIMARY KEY,
-            source_id INTEGER REFERENCES terceros(id) ON DELETE CASCADE,
-            chunk_index INTEGER DEFAULT 0,
-            content TEXT,
-            embedding vector({EMBEDDING_DIM}),
-            metadata JSONB,
-            created_at TIMESTAMP DEFAULT NOW(),
-            UNIQUE (source_id, chunk_index)
-        );
-    """))
-    session.execute(text(f"""
-        CREATE INDEX IF NOT EXISTS idx_proveedores_vec_embedding
-        ON proveedores_vec USING ivfflat (embedding vector_l2_ops) WITH (lists = 100);
-    """))
-
-    # Clientes: eliminado
+# Respuestas RAG sin historial: se cachean por pregunta (exacta o semánticamente similar) y
+# tipo de búsqueda; se vacía al sincronizar embeddings porque el contexto recuperado cambia
+RESPONSE_CACHE: ResponseCache = ResponseCache("chat_clase_03", embedding_model=EMBEDDING_MODEL_NAME)
 
 # Chunking: Dividir textos largos en partes ("chunks") más pequeñas y solapadas facilita el procesamiento y la búsqueda semántica.
 # El sobrelapamiento ("overlap") entre chunks asegura contexto suficiente entre segmentos consecutivos.
@@ -98,18 +73,42 @@ def _chunk_text(text_value: str, chunk_size: int = 600, overlap: int = 100) -> L
 
     return chunks
 
-# Convierte una lista de valores float a un string SQL válido para el vector
-def _arr_to_sql_vector(values: List[float]) -> str:
-    # Build ARRAY[...]::vector(D)
-    floats = ",".join(f"{v:.8f}" for v in values)
+# Búsqueda de contexto por tipo de distancia y fuentes. El vector de la pregunta va como parámetro (formato
+# binario de pgvector, ver async_connection.py), no como literal en el SQL: el texto de la sentencia es
+# siempre el mismo y asyncpg la prepara una vez por conexión en lugar de analizar ~10 KB de SQL en cada pregunta.
+# Cada fuente es su propio `ORDER BY embedding <op> :embedding LIMIT :k_per_source` (la forma que puede
+# resolver el índice ANN del operador, revisión 7, leyendo solo k filas); los resultados se mezclan por distancia.
+# Antes un UNION ALL calculaba la distancia de todas las filas de ambas tablas y luego ordenaba.
+@lru_cache(maxsize=None)
+def _search_context_sql(vector_search_type: VectorSearchType, sources: Tuple[VectorSearchSource, ...]):
+    distance = f"embedding {vector_search_type.operator} CAST(:embedding AS vector({EMBEDDING_DIM}))"
+    per_source = "\n        UNION ALL\n".join(
+        f"""        (SELECT '{source.value}' AS source, source_id, content, {distance} AS distance
+         FROM {source.table}
+         ORDER BY {distance}
+         LIMIT :k_per_source)"""
+        for source in sources
+    )
+
+    return text(f"""
+        SELECT source, source_id, content, distance FROM (
+{per_source}
+        ) AS hits
+        ORDER BY distance ASC
+        LIMIT :k
+    """)
+
+_SET_SEARCH_PARAMS = text(SET_SEARCH_PARAMS_SQL)
 
-    return f"ARRAY[{floats}]::vector({EMBEDDING_DIM})"
+# Fuentes pedidas en el orden del enum y sin repetidos (todas si no se pide ninguna)
+def _selected_sources(sources: Optional[Sequence[VectorSearchSource]]) -> Tuple[VectorSearchSource, ...]:
+    return tuple(source for source in VectorSearchSource if (not sources) or (source in sources))
 
-# Convierte una lista de textos a una lista de vectores
-def _embed_texts(emb: GoogleGenerativeAIEmbeddings, texts: List[str]) -> List[List[float]]:
-    if (not texts): return []
+# Variante de la caché de respuestas: el contexto recuperado depende de todos los parámetros de búsqueda
+def _cache_variant(vector_search_type: VectorSearchType, recall: VectorSearchRecall, sources: Optional[Sequence[VectorSearchSource]], per_source_k: Optional[int]) -> str:
+    source_names = ",".join(source.name for source in _selected_sources(sources))
 
-    return emb.embed_documents(texts)
+    return f"{CHAT_MODEL_NAME}:{vector_search_type.name}:{recall.name}:{source_names}:{per_source_k or ''}"
 
 # Construye el contenido del producto
 def _build_product_content(row: Dict[str, Any]) -> str:
@@ -138,101 +137,93 @@ def _build_tercero_content(row: Dict[str, Any]) -> str:
         f"Dirección: {row.get('direccion') or ''}. Email: {row.get('email') or row.get('email_facturacion') or ''}."
     )
 
-def _sync_productos_embedding(session, embeddings: List[List[float]]):
-    sql_select: str = text("""
-        SELECT 
-            p.id,
-            p.sku,
-            p.nombre,
-            p.precio_venta,
-            p.cantidad,
-            p.proveedor_id,
-            COALESCE(t.razon_social, (COALESCE(t.nombres, '') || ' ' || COALESCE(t.apellidos, ''))) AS proveedor_nombre
-        FROM 
-            productos p
-        LEFT JOIN terceros t ON t.id = p.proveedor_id
-        """)
-    productos = session.execute(sql_select).mappings().all()
-
-    for producto in productos:
-        base_text = _build_product_content(producto)
-
-        chunks = _chunk_text(base_text, chunk_size=600, overlap=100)
-        if (not chunks): chunks = [base_text]
-
-        chunk_vecs = _embed_texts(embeddings, chunks)
-
-        for idx, (chunk, vec) in enumerate(zip(chunks, chunk_vecs)):
-            sql_insert = text(f"""
-                INSERT INTO 
-                    productos_vec (source_id, chunk_index, content, embedding, metadata)
-                VALUES (:source_id, :chunk_index, :content, { _arr_to_sql_vector(vec) }, :metadata)
-                ON CONFLICT (source_id, chunk_index) DO UPDATE SET
-                    content = EXCLUDED.content,
-                    embedding = EXCLUDED.embedding,
-                    metadata = EXCLUDED.metadata,
-                    created_at = NOW();
-                """).bindparams(bindparam("metadata", type_=JSONB))
-
-        params_insert: dict[str, Any] = {
-            "source_id": producto["id"],
-            "chunk_index": idx,
-            "content": chunk,
-            "metadata": {
-                "proveedor_id": producto["proveedor_id"],
-                "proveedor_nombre": producto["proveedor_nombre"],
-            }
-        }
+# Fila de producto (con el nombre del proveedor) para construir el contenido y la metadata
+def _producto_row(producto: Producto) -> Dict[str, Any]:
+    proveedor = producto.proveedor
+    proveedor_nombre = None
+
+    if (proveedor is not None):
+        proveedor_nombre = proveedor.razon_social or f"{proveedor.nombres or ''} {proveedor.apellidos or ''}"
+
+    return {
+        "id": producto.id,
+        "sku": producto.sku,
+        "nombre": producto.nombre,
+        "precio_venta": producto.precio_venta,
+        "cantidad": producto.cantidad,
+        "proveedor_id": producto.proveedor_id,
+        "proveedor_nombre": proveedor_nombre,
+    }
+
+# Documento a vectorizar de un producto: chunks del contenido y metadata con el proveedor.
+# El hash cubre el contenido, la metadata y el modelo: si ninguno cambió, la fila no se vuelve a vectorizar
+def _producto_document(producto: Producto, stored_hash: Optional[str] = None) -> EmbeddingDocument:
+    row = _producto_row(producto)
+    base_text = _build_product_content(row)
+    metadata = {"proveedor_id": row["proveedor_id"], "proveedor_nombre": row["proveedor_nombre"]}
+
+    return EmbeddingDocument(
+        source_id=row["id"],
+        chunks=_chunk_text(base_text, chunk_size=600, overlap=100) or [base_text],
+        metadata=metadata,
+        content_hash=content_hash(EMBEDDING_MODEL_NAME, base_text, metadata),
+        stored_hash=stored_hash,
+    )
 
-        session.execute(sql_insert, params_insert)
-
-def _sync_proveedor_embedding(session, embeddings: List[List[float]]):
-    sql_select: str = text("""
-        SELECT 
-            id, 
-            tipo_documento, 
-            numero_documento, 
-            razon_social, 
-            nombres, 
-            apellidos, 
-            telefono_fijo, 
-            telefono_celular, 
-            direccion, 
-            email, 
-            email_facturacion
-        FROM 
-            terceros 
-        WHERE 
-            tipo_tercero = 'proveedor'
-        """)
-    proveedores = session.execute(sql_select).mappings().all()
-
-    for proveedor in proveedores:
-        base_text = _build_tercero_content(proveedor)
-
-        chunks = _chunk_text(base_text, chunk_size=600, overlap=100)
-        if (not chunks): chunks = [base_text]
-                
-        chunk_vecs = _embed_texts(embeddings, chunks)
-
-        for idx, (chunk, vec) in enumerate(zip(chunks, chunk_vecs)):
-            sql_insert: str = text(f"""
-                INSERT INTO proveedores_vec (source_id, chunk_index, content, embedding, metadata)
-                VALUES (:source_id, :chunk_index, :content, { _arr_to_sql_vector(vec) }, '{{}}'::jsonb)
-                ON CONFLICT (source_id, chunk_index) DO UPDATE SET
-                    content = EXCLUDED.content,
-                    embedding = EXCLUDED.embedding,
-                    metadata = EXCLUDED.metadata,
-                    created_at = NOW();
-                """)
-            
-            params_insert: dict[str, Any] = {
-                "source_id": proveedor["id"],
-                "chunk_index": idx,
-                "content": chunk
-            }
+def _tercero_document(tercero: Tercero, stored_hash: Optional[str] = None) -> EmbeddingDocument:
+    base_text = _build_tercero_content({column.key: getattr(tercero, column.key) for column in Tercero.__table__.columns})
+
+    return EmbeddingDocument(
+        source_id=tercero.id,
+        chunks=_chunk_text(base_text, chunk_size=600, overlap=100) or [base_text],
+        content_hash=content_hash(EMBEDDING_MODEL_NAME, base_text),
+        stored_hash=stored_hash,
+    )
+
+def _since_as_db_timestamp(since: datetime):
+    # fecha_actualizacion es TIMESTAMP sin zona (hora local de la sesión de Postgres, la escribe CURRENT_TIMESTAMP):
+    # una fecha con zona (p. ej. ...Z) se convierte a esa zona en la base en lugar de enviarla con tzinfo
+    if (since.tzinfo is None): return since
+
+    return func.timezone(func.current_setting("TimeZone"), literal(since, TIMESTAMP(timezone=True)))
+
+# Sincronización incremental: cada fila se lee junto con el hash guardado de sus vectores y solo se
+# vectorizan las que cambiaron; `since` limita la lectura a las filas modificadas desde esa fecha
+# (fecha_actualizacion la mantiene un trigger) y los vectores de filas borradas se eliminan
+async def _sync_productos_embedding(embeddings: Embeddings, batch_size: int = EMBEDDING_BATCH_SIZE,
+                                    since: Optional[datetime] = None, force: bool = False) -> Dict[str, Any]:
+    sync = EmbeddingSync(embeddings, "productos_vec", AsyncSessionLocal, batch_size=batch_size, force=force)
+    since = None if since is None else _since_as_db_timestamp(since)
+    # El contenido incluye el nombre del proveedor: un cambio en el proveedor también cuenta
+    where = [] if since is None else [or_(
+        Producto.fecha_actualizacion >= since,
+        Producto.proveedor.has(Tercero.fecha_actualizacion >= since),
+    )]
+
+    # Lectura en streaming (cursor del lado del servidor, réplica si hay) con el proveedor en el mismo SELECT
+    async with AsyncSessionLocal() as session:
+        rows = sync.source_rows(session, Producto, options=[joinedload(Producto.proveedor)], where=where, batch_size=SYNC_READ_BATCH_SIZE)
+        stats = await sync.run(_producto_document(producto, stored_hash) async for producto, stored_hash in rows)
+
+    stats["deleted"] = await sync.delete_orphans(select(Producto.id))
+
+    return stats
+
+async def _sync_proveedor_embedding(embeddings: Embeddings, batch_size: int = EMBEDDING_BATCH_SIZE,
+                                    since: Optional[datetime] = None, force: bool = False) -> Dict[str, Any]:
+    sync = EmbeddingSync(embeddings, "proveedores_vec", AsyncSessionLocal, batch_size=batch_size, force=force)
+    where = [Tercero.tipo_tercero == "proveedor"]
+
+    if (since is not None): where.append(Tercero.fecha_actualizacion >= _since_as_db_timestamp(since))
+
+    async with AsyncSessionLocal() as session:
+        rows = sync.source_rows(session, Tercero, where=where, batch_size=SYNC_READ_BATCH_SIZE)
+        stats = await sync.run(_tercero_document(tercero, stored_hash) async for tercero, stored_hash in rows)
+
+    # También los de terceros que dejaron de ser proveedores
+    stats["deleted"] = await sync.delete_orphans(select(Tercero.id).where(Tercero.tipo_tercero == "proveedor"))
 
-            session.execute(sql_insert, params_insert)
+    return stats
 
 # clase que se encarga de la configuración y el procesamiento de los datos
 # se incluye el decorador cbv para que se pueda usar como un endpoint de fastapi con las rutas definidas en el router 
@@ -246,89 +237,74 @@ class ChatClase03:
         if (not self.google_api_key):
             raise RuntimeError("GOOGLE_API_KEY no configurada")
         
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model=EMBEDDING_MODEL_NAME,
-            google_api_key=self.google_api_key
-        )
-
-    # se encarga de asegurar que la extension pg_vector esté instalada en supabase y crear las tablas de vector de productos
-    @chat_clase_03_api_router.post("/api/setup_pgvector")
-    def setup_pgvector(self):
-        session = SessionLocal()
+        # Cliente de embeddings compartido (no se reconstruye en cada petición)
+        self.embeddings = get_llm_registry().embeddings(EMBEDDING_MODEL_NAME)
 
-        try:
-            _ensure_pgvector_extension(session)
-            _create_vector_tables(session)
-            session.commit()
-
-            return {
-                "ok": True, 
-                "message": "PGVector y tablas creadas"
-            }
-        except Exception as e:
-            session.rollback()
-            raise HTTPException(status_code=500, detail=str(e))
-        finally:
-            session.close()
-
-    # se encarga de sincronizar los embeddings de los productos, proveedores y clientes
+    # se encarga de sincronizar los embeddings de los productos y proveedores: lotes de chunks por llamada
+    # a la API (batch_size), varios lotes en paralelo y un executemany con commit por lote.
+    # Solo se vectorizan las filas nuevas o cuyo contenido cambió (force=true: todas, p. ej. al cambiar de modelo)
     @chat_clase_03_api_router.post("/api/sync_embeddings")
-    def sync_embeddings(self):
-        session = SessionLocal()
-
-        embeddings: List[List[float]] = self.embeddings
-        
+    async def sync_embeddings(self,
+                              batch_size: int = Query(EMBEDDING_BATCH_SIZE, ge=1, le=100),
+                              since: Optional[datetime] = Query(None, description="Solo filas modificadas desde esta fecha"),
+                              force: bool = Query(False, description="Vectorizar todo aunque el contenido no haya cambiado")):
         try:
             # Productos (join con terceros para obtener el nombre del proveedor)
-            _sync_productos_embedding(session, embeddings)
+            productos = await _sync_productos_embedding(self.embeddings, batch_size, since, force)
 
             # Proveedores (terceros tipo proveedor) con segmentación
-            _sync_proveedor_embedding(session, embeddings)
+            proveedores = await _sync_proveedor_embedding(self.embeddings, batch_size, since, force)
 
             # Clientes: eliminado
 
-            session.commit()
+            RESPONSE_CACHE.clear()
 
             return {
                 "ok": True, 
-                "message": "Embeddings sincronizados"
+                "message": "Embeddings sincronizados",
+                "productos": productos,
+                "proveedores": proveedores,
             }
         except Exception as ex:
-            session.rollback()
             raise HTTPException(status_code=500, detail=str(ex))
-        finally:
-            session.close()
 
     # se encarga de buscar el contexto relevante para la pregunta del usuario
     # <->: indica que se está usando la distancia euclidiana (L2) para medir la similitud entre el vector de la pregunta y el vector de los productos, proveedores y clientes
     # <=>: indica que se está usando la distancia coseno para medir la similitud entre el vector de la pregunta y el vector de los productos, proveedores y clientes
     # <#>: indica que se está usando la distancia del producto punto para medir la similitud entre el vector de la pregunta y el vector de los productos, proveedores y clientes
-    def _search_context(self, session: Session, query_text: str, vector_search_type: VectorSearchType, top_k: int = 8) -> List[Dict[str, Any]]:
-        q_vec = self.embeddings.embed_query(query_text)
-        q_vec_sql = _arr_to_sql_vector(q_vec)
-
-        vector_search_type_operator: str = vector_search_type.operator
-        print(f"Realizará la consulta de vectores mediante: {vector_search_type.value} ({vector_search_type_operator})")
-
-        sql: str = text(f"""
-            WITH q AS (SELECT {q_vec_sql} AS embedding)
-            SELECT 'producto' AS source, pv.source_id, pv.content, (pv.embedding {vector_search_type_operator} q.embedding) AS distance
-            FROM productos_vec pv, q
-            UNION ALL
-            SELECT 'proveedor' AS source, pr.source_id, pr.content, (pr.embedding {vector_search_type_operator} q.embedding) AS distance
-            FROM proveedores_vec pr, q
-            -- clientes_vec eliminado
-            ORDER BY distance ASC
-            LIMIT :k
-            """)
+    # recall: candidatos que revisan los índices HNSW/IVFFlat (más recall, más latencia); se fija solo para esta transacción
+    # sources: fuentes a consultar (por defecto todas); per_source_k: resultados por fuente antes de mezclar (por defecto top_k)
+    async def _search_context(self, session: AsyncSession, query_text: str, vector_search_type: VectorSearchType, top_k: int = 8, q_vec: Optional[List[float]] = None,
+                              recall: VectorSearchRecall = VECTOR_SEARCH_RECALL, sources: Optional[Sequence[VectorSearchSource]] = None,
+                              per_source_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        if (q_vec is None): q_vec = await self.embeddings.aembed_query(query_text)
+
+        # Orden fijo y sin repetidos: una sentencia (preparada) por combinación de fuentes
+        sources = _selected_sources(sources)
+        per_source_k = per_source_k or top_k
+
+        print(f"Realizará la consulta de vectores mediante: {vector_search_type.value} ({vector_search_type.operator}), recall {recall.value}, fuentes {[source.value for source in sources]}")
+
         params = {
+            "embedding": q_vec,
+            "k_per_source": per_source_k,
             "k": top_k
         }
 
-        results = session.execute(sql, params).mappings().all()
+        # Solo lectura: con réplicas configuradas la búsqueda ANN no carga la primaria (y ambas sentencias van a la misma réplica)
+        await session.execute(_SET_SEARCH_PARAMS, search_params(recall, per_source_k), bind_arguments={"read_only": True})
+        results = (await session.execute(_search_context_sql(vector_search_type, sources), params, bind_arguments={"read_only": True})).mappings().all()
 
         return [dict(r) for r in results]
 
+    # abre una sesión propia para recuperar el contexto
+    async def _retrieve_contexts(self, question: str, vector_search_type: VectorSearchType, top_k: int = 8, q_vec: Optional[List[float]] = None,
+                                 recall: VectorSearchRecall = VECTOR_SEARCH_RECALL, sources: Optional[Sequence[VectorSearchSource]] = None,
+                                 per_source_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        async with AsyncSessionLocal() as session:
+            return await self._search_context(session, question, vector_search_type, top_k=top_k, q_vec=q_vec, recall=recall,
+                                              sources=sources, per_source_k=per_source_k)
+
     def _build_rag_prompt(self, question: str, contexts: List[Dict[str, Any]]) -> List[HumanMessage]:
         context_text = "\n\n".join(f"[{r['source']}] {r['content']}" for r in contexts)
         user_text = (
@@ -343,25 +319,71 @@ class ChatClase03:
         ]
 
     @chat_clase_03_api_router.post("/api/chat_clase_03")
-    def chat_rag(self, request: ChatRequestDTO, vector_search_type: VectorSearchType=VectorSearchType.EUCLIDEAN_DISTANCE):
-        session = SessionLocal()
+    async def chat_rag(self, request: ChatRequestDTO, vector_search_type: VectorSearchType=VectorSearchType.EUCLIDEAN_DISTANCE,
+                       recall: VectorSearchRecall=VECTOR_SEARCH_RECALL,
+                       sources: Optional[List[VectorSearchSource]] = Query(None),
+                       per_source_k: Optional[int] = Query(None, ge=1, le=100)):
+        set_usage_user(request.user_id)
 
         try:
-            # Retrieve relevant context
-            contexts = self._search_context(session, request.message, vector_search_type, top_k=8)
+            # Answer from cache when the same (or a very similar) question was already answered
+            cache_lookup = await RESPONSE_CACHE.lookup(request.message, _cache_variant(vector_search_type, recall, sources, per_source_k))
+            if (cache_lookup.hit): return cache_lookup.value
+
+            # Retrieve relevant context (reusing the question embedding computed by the cache)
+            contexts = await self._retrieve_contexts(request.message, vector_search_type, 8, cache_lookup.embedding, recall, sources, per_source_k)
 
-            # Initialize chat model
-            llm = init_chat_model(CHAT_MODEL_NAME, model_provider="google_genai", api_key=self.google_api_key)
             messages = self._build_rag_prompt(request.message, contexts)
-            ai_result = llm.invoke(messages)
+            ai_result = await get_llm_registry().ainvoke(messages, CHAT_MODEL_NAME)
             reply = getattr(ai_result, "content", str(ai_result))
 
             # This reply can be forwarded to WhatsApp by the TS service
-            return {
+            response = {
                 "reply": reply,
                 "contexts": contexts,
             }
+            RESPONSE_CACHE.store(cache_lookup, response)
+
+            return response
         except Exception as ex:
             raise HTTPException(status_code=500, detail=str(ex))
-        finally:
-            session.close()
\ No newline at end of file
+
+    # variante en streaming (Server-Sent Events): primero el evento 'contexts', luego un 'token' por fragmento
+    # de la respuesta y al final 'done' con la respuesta completa; los fallos se informan con 'error'
+    @chat_clase_03_api_router.post("/api/chat_clase_03/stream")
+    async def chat_rag_stream(self, request: ChatRequestDTO, vector_search_type: VectorSearchType=VectorSearchType.EUCLIDEAN_DISTANCE,
+                              recall: VectorSearchRecall=VECTOR_SEARCH_RECALL,
+                              sources: Optional[List[VectorSearchSource]] = Query(None),
+                              per_source_k: Optional[int] = Query(None, ge=1, le=100)):
+        set_usage_user(request.user_id)
+
+        async def event_stream():
+            try:
+                cache_lookup = await RESPONSE_CACHE.lookup(request.message, _cache_variant(vector_search_type, recall, sources, per_source_k))
+
+                if (cache_lookup.hit):
+                    yield sse_event("contexts", cache_lookup.value["contexts"])
+                    yield sse_event("token", {"text": cache_lookup.value["reply"]})
+                    yield sse_event("done", {"reply": cache_lookup.value["reply"]})
+                    return
+
+                contexts = await self._retrieve_contexts(request.message, vector_search_type, 8, cache_lookup.embedding, recall, sources, per_source_k)
+                yield sse_event("contexts", contexts)
+
+                messages = self._build_rag_prompt(request.message, contexts)
+                reply_parts: List[str] = []
+
+                async for chunk in get_llm_registry().astream(messages, CHAT_MODEL_NAME):
+                    text_chunk = chunk_text(chunk)
+
+                    if (text_chunk):
+                        reply_parts.append(text_chunk)
+                        yield sse_event("token", {"text": text_chunk})
+
+                reply = "".join(reply_parts)
+                RESPONSE_CACHE.store(cache_lookup, {"reply": reply, "contexts": contexts})
+                yield sse_event("done", {"reply": reply})
+            except Exception as ex:
+                yield sse_event("error", {"detail": str(ex)})
+
+        return StreamingResponse(event_stream(), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
\ No newline at end of file
@@ -1,9 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from fastapi_utils.cbv import cbv
 
-import os
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 """Chat endpoints sin utilizar helpers de memoria de LangChain.
 
 Se usa un almacenamiento en memoria simple (dict + listas) por usuario
@@ -11,9 +9,11 @@ para construir el contexto de conversación y se generan prompts como cadenas.
 """
 
 from endpoints.dto.message_dto import (ChatRequestDTO)
-from supabase import create_client, Client
-
 from business.utils.llm_utils import LLMUtils
+from business.utils.conversation_memory import PROMPT_HISTORY_MAX_TOKENS
+from business.utils.llm_registry import DEFAULT_CHAT_MODEL, get_llm_registry
+from business.utils.intent_classifier import build_intent_classifier
+from business.utils.usage_tracker import set_usage_user
 from business.services.basic_service import BasicService
 from business.services.product_service import ProductService
 from business.services.distributor_service import DistributorService
@@ -21,6 +21,34 @@ from business.services.distributor_service import DistributorService
 # --- Configuración de entorno ---
 load_dotenv()
 
+CHAT_MODEL_NAME = DEFAULT_CHAT_MODEL
+
+# Esquema de intención para el clasificador estructurado (v1.1)
+INTENTION_SCHEMA = {
+    "title": "UserIntention",
+    "description": (
+        "Clasifica la intención del mensaje del usuario. "
+        "Devuelve solo una de las etiquetas permitidas."
+    ),
+    "type": "object",
+    "properties": {
+        "userintention": {
+            "type": "string",
+            "enum": ["Create_distribuitor", "Create_product", "Other"],
+            "description": (
+                "'Create_distribuitor': cuando el usuario quiere crear/registrar un proveedor/distribuidor."
+                "'Create_product': cuando el usuario quiere registrar un nuevo producto."
+                "'Other': conversación casual u otro propósito."
+            ),
+        }
+    },
+    "required": ["userintention"],
+    "additionalProperties": False,
+}
+
+# Clasificador local (reglas + modelo lineal): saludos, agradecimientos y despedidas no pasan por el LLM
+INTENT_CLASSIFIER = build_intent_classifier("chat_v1")
+
 # --- Router y clase del servicio de chat ---
 chat_webservice_api_router = APIRouter()
 
@@ -29,60 +57,39 @@ class ChatWebService:
     # --- v1.0: Chat con memoria en sesión ---
     @chat_webservice_api_router.post("/api/chat_v1.0")
     async def chat_with_memory(self, request: ChatRequestDTO):
-        api_key = os.getenv("GOOGLE_API_KEY")
+        set_usage_user(request.user_id)
+        await LLMUtils._refresh_history(request.user_id)
 
-        if not api_key:
-            api_key = input("Por favor, ingrese su API KEY de Google (GOOGLE_API_KEY): ")
-            os.environ["GOOGLE_API_KEY"] = api_key
-
-        # Modelo y prompt del sistema
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
-
-        return BasicService().process(request, llm);
+        # El cliente del modelo se obtiene del registro compartido del proceso
+        return await BasicService().process(request, CHAT_MODEL_NAME);
 
 
     # --- v1.1: Clasificación de intención + extracción y registro de distribuidor ---
     @chat_webservice_api_router.post("/api/chat_v1.1")
     async def chat_with_structure_output(self, request: ChatRequestDTO):
-        api_key = os.getenv("GOOGLE_API_KEY")
-
-        if not api_key:
-            api_key = input("Por favor, ingrese su API KEY de Google (GOOGLE_API_KEY): ")
-            os.environ["GOOGLE_API_KEY"] = api_key
-
-        # Modelo base
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+        set_usage_user(request.user_id)
 
         # Registrar el mensaje actual en memoria y construir historial
+        await LLMUtils._refresh_history(request.user_id)
         user_input = request.message
+        # Historial previo al mensaje actual (la rama 'Other' lo usa en el prompt y para decidir si usa la caché)
+        prior_history = LLMUtils._history_as_text(request.user_id)
         LLMUtils._append_message(request.user_id, "human", user_input)
-        history_text = LLMUtils._history_as_text(request.user_id)
+        history_text = LLMUtils._history_as_text(request.user_id, max_tokens=PROMPT_HISTORY_MAX_TOKENS)
 
-        # Esquema de intención + clasificador estructurado
-        intention_schema = {
-            "title": "UserIntention",
-            "description": (
-                "Clasifica la intención del mensaje del usuario. "
-                "Devuelve solo una de las etiquetas permitidas."
-            ),
-            "type": "object",
-            "properties": {
-                "userintention": {
-                    "type": "string",
-                    "enum": ["Create_distribuitor", "Create_product", "Other"],
-                    "description": (
-                        "'Create_distribuitor': cuando el usuario quiere crear/registrar un proveedor/distribuidor."
-                        "'Create_product': cuando el usuario quiere registrar un nuevo producto."
-                        "'Other': conversación casual u otro propósito."
-                    ),
-                }
-            },
-            "required": ["userintention"],
-            "additionalProperties": False,
-        }
+        # Clasificación local; si no es concluyente se usa el clasificador LLM
+        local_intent = INTENT_CLASSIFIER.classify(user_input)
+        user_intention = local_intent.label if local_intent else await self._classify_with_llm(user_input, history_text)
 
-        model_with_structure = llm.with_structured_output(intention_schema)
+        if (user_intention == "Create_distribuitor"):
+            return await DistributorService().create(request, CHAT_MODEL_NAME)        
+        elif (user_intention == "Create_product"):
+            return await ProductService().create(request, CHAT_MODEL_NAME)
+        else:
+            # Rama 'Other': respuesta general con memoria
+            return await BasicService().process(request=request, model_name=CHAT_MODEL_NAME, append_human_message=False, user_intention="Other", prior_history=prior_history)
 
+    async def _classify_with_llm(self, user_input: str, history_text: str) -> str:
         # Clasificación de intención (prompt plano)
         classify_text = (
             "Eres un clasificador. Lee la conversación y clasifica la intención "
@@ -95,15 +102,12 @@ class ChatWebService:
             f"Último mensaje del usuario: {user_input}"
         )
 
-        result = model_with_structure.invoke(classify_text)
+        # Clasificador estructurado (cacheado en el registro por modelo + esquema)
+        result = await get_llm_registry().ainvoke(classify_text, CHAT_MODEL_NAME, schema=INTENTION_SCHEMA)
         print(result)
 
         user_intention = result[0]["args"].get("userintention")
+        # Ejemplo de entrenamiento para el clasificador local
+        INTENT_CLASSIFIER.log(user_input, user_intention)
 
-        if (user_intention == "Create_distribuitor"):
-            return DistributorService().create(request, llm)        
-        elif (user_intention == "Create_product"):
-            return ProductService().create(request, llm)
-        else:
-            # Rama 'Other': respuesta general con memoria
-            return BasicService().process(request=request, llm=llm, append_human_message=False, user_intention="Other")
+        return user_intention
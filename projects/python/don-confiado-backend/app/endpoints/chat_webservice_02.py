@@ -1,30 +1,37 @@
 # Standard library imports
+import asyncio
 import os
 import uuid
 from datetime import datetime
+from typing import Optional
 
 # Third-party imports
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi_utils.cbv import cbv
-from langchain.chat_models import init_chat_model
+from sqlalchemy.ext.asyncio import AsyncSession
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from supabase import create_client, Client
 
 # Local imports
 from endpoints.dto.message_dto import ChatRequestDTO
-from business.dao.producto_dao import ProductoDAO
-from business.dao.tercero_dao import TerceroDAO
+from business.dao.async_producto_dao import AsyncProductoDAO
+from business.dao.async_tercero_dao import AsyncTerceroDAO
 from business.entities.producto import Producto
 from business.entities.tercero import Tercero
-from business.common.connection import SessionLocal
-from ai.schemas.facturas import FacturaColombiana, UserIntention, PayloadCreateProvider, PayloadCreateProduct
+from business.common.async_connection import get_async_session
+from business.utils.llm_registry import get_llm_registry
+from business.utils.conversation_memory import PROMPT_HISTORY_MAX_TOKENS, ConversationMemory
+from business.utils.conversation_store import build_conversation_store
+from business.utils.intent_classifier import build_intent_classifier
+from business.utils.stream_utils import SSE_HEADERS, SSE_MEDIA_TYPE, chunk_text, sse_event
+from business.utils.usage_tracker import set_usage_user
+from ai.schemas.facturas import FacturaColombiana, UserIntention, InvoiceUnderstanding, PayloadCreateProvider, PayloadCreateProduct
 """
 Chat endpoints without using LangChain memory helpers.
 
-Uses simple in-memory storage (dict + lists) per user to build conversation context
-and generates prompts as strings.
+Uses a token-budgeted in-memory store per user (rolling summaries + LRU/TTL eviction)
+to build conversation context and generates prompts as strings.
 """
 
 
@@ -32,6 +39,16 @@ and generates prompts as strings.
 # CONSTANTS
 # =============================================================================
 
+CHAT_MODEL_NAME = "gemini-2.0-flash"
+
+# When enabled, invoice images are understood (intention + payloads + invoice data)
+# with a single structured call instead of separate extraction and classification calls.
+COMBINED_INVOICE_EXTRACTION = os.getenv("DONCONFIADO_COMBINED_INVOICE_EXTRACTION", "true").lower() == "true"
+
+# What to do with invoice items whose SKU already exists: "nothing" (keep the stored product)
+# or "update" (new name/price/provider, quantity added to the stock)
+INVOICE_SKU_CONFLICT = os.getenv("DONCONFIADO_INVOICE_SKU_CONFLICT", "nothing").lower()
+
 DONCONFIADO_SYSTEM_PROMPT = """
 ROLE:
 Don Confiado, un asistente de inteligencia artificial que actúa como un asesor
@@ -104,6 +121,13 @@ INSTRUCCIONES ADICIONALES:
 - Adapta tu respuesta al contexto de la conversación.
 """
 
+# Shared by every request: cbv builds a new ChatWebService02 instance per request.
+# With DONCONFIADO_CONVERSATION_STORE=sql it is also shared across uvicorn workers.
+CONVERSATION_MEMORY = ConversationMemory(build_conversation_store("chat_v2"))
+
+# Local first-stage classifier: greetings, thanks and goodbyes skip the LLM classifier
+INTENT_CLASSIFIER = build_intent_classifier("chat_v2")
+
 # =============================================================================
 # ROUTER AND CLASS DEFINITION
 # =============================================================================
@@ -124,7 +148,7 @@ class ChatWebService02:
         """Initialize the chat service with environment variables and conversation storage."""
         load_dotenv()
         self.GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-        self._conversations = {}
+        self._conversations = CONVERSATION_MEMORY
 
     # =============================================================================
     # CONVERSATION MANAGEMENT UTILITIES
@@ -132,115 +156,92 @@ class ChatWebService02:
     
     def find_conversation(self, conversation_id: str):
         """
-        Find an existing conversation or create a new one.
+        Build the messages sent to the model for a conversation.
         
         Args:
             conversation_id: Unique identifier for the conversation
             
         Returns:
-            List of messages for the conversation
+            List with the system prompt, the rolling summary (if any) and the recent messages
         """
-        if conversation_id in self._conversations.keys():
-            return self._conversations[conversation_id]
-        else:
-            conversation = []
-            conversation.append(SystemMessage(content=DONCONFIADO_SYSTEM_PROMPT))
-            self._conversations[conversation_id] = conversation
+        return [SystemMessage(content=DONCONFIADO_SYSTEM_PROMPT), *self._conversations.messages(conversation_id)]
 
-            return conversation 
-    def _history_as_text(self, user_id: str) -> str:
+    def _history_as_text(self, user_id: str, max_tokens: Optional[int] = None) -> str:
         """
         Convert conversation history to text format for context.
         
         Args:
             user_id: User identifier for the conversation
+            max_tokens: Only include the most recent messages that fit in this many tokens
             
         Returns:
             Formatted text representation of the conversation history
         """
-        lines = []
-        conversation = self.find_conversation(user_id)
-
-        for msg in conversation:
-            if isinstance(msg, HumanMessage):
-                lines.append(f"Usuario: {msg.content}")
-            elif isinstance(msg, AIMessage):
-                lines.append(f"Asistente: {msg.content}")
-
-        return "\n".join(lines)
+        return self._conversations.history_as_text(user_id, max_tokens=max_tokens)
     
     # =============================================================================
     # DATA PERSISTENCE METHODS
     # =============================================================================
     
-    def _save_product(self, payload):
+    async def _save_products(self, session: AsyncSession, payloads, proveedor_id: Optional[int] = None):
         """
-        Save a product to the database using the extracted payload.
+        Save all the products of a message (e.g. the line items of an invoice) at once.
+        
+        Uses AsyncProductoDAO.upsertMany: providers are resolved with a single query (skipped
+        when the provider was just saved and its id is known), the products are written
+        with a single INSERT ... ON CONFLICT (sku) ... RETURNING and committed once.
         
         Args:
-            payload: PayloadCreateProduct with the extracted product data
+            session: Request-scoped async session
+            payloads: List of PayloadCreateProduct with the extracted product data
+            proveedor_id: Id of the provider saved in the same message, if any
             
         Returns:
-            Saved Product entity
+            Per-item outcome report (see ProductoDAO.upsertMany)
             
         Raises:
-            HTTPException: If there's an error saving the product
+            HTTPException: If there's an error saving the products
         """
-        session = SessionLocal()
-
         try:
-            producto_dao = ProductoDAO(session)
-            tercero_dao = TerceroDAO(session)
-            
-            # Generate a unique SKU if not provided
-            if payload.sku:
-                sku = payload.sku
-            else:
-                sku_base = payload.nombre.replace(" ", "_").upper()[:20]
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                sku = f"{sku_base}_{timestamp}"
-            
-            # Find or lookup provider if specified
-            proveedor_id = None
-
-            if (payload.proveedor):
-                # Try to find provider by numero_documento (NIT) or razon_social
-                proveedor = tercero_dao.findByNumeroDocumento(payload.proveedor)
-
-                if proveedor:
-                    proveedor_id = proveedor.id
-                    print(f"📦 Provider found: {proveedor.razon_social or proveedor.nombres}")
+            producto_dao = AsyncProductoDAO(session)
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            items = []
+            
+            for index, payload in enumerate(payloads):
+                # Generate a unique SKU if not provided
+                if payload.sku:
+                    sku = payload.sku
                 else:
-                    print(f"⚠️ Provider '{payload.proveedor}' not found in database")
-            
-            # Create the minimal product entity
-            nuevo_producto = Producto(
-                sku=sku,
-                nombre=payload.nombre,
-                precio_venta=payload.precio_venta,
-                cantidad=payload.cantidad,
-                proveedor_id=proveedor_id
-            )
+                    sku_base = payload.nombre.replace(" ", "_").upper()[:20]
+                    sku = f"{sku_base}_{timestamp}_{index + 1}"
+                
+                items.append({
+                    "sku": sku,
+                    "nombre": payload.nombre,
+                    "precio_venta": payload.precio_venta,
+                    "cantidad": payload.cantidad,
+                    "proveedor_id": proveedor_id,
+                    "proveedor_documento": payload.proveedor,
+                })
             
-            # Save the product (create method already commits)
-            saved_product = producto_dao.create(nuevo_producto)
+            report = await producto_dao.upsertMany(items, on_conflict=INVOICE_SKU_CONFLICT)
             
-            print(f"✅ Product saved successfully: {saved_product}")
+            for item in report:
+                print(f"📦 Product '{item['sku']}': {item['status']}" + (f" ({item['error']})" if item["error"] else ""))
 
-            return saved_product            
+            return report
         except Exception as ex:
-            session.rollback()
-            print(f"❌ Error saving product: {str(ex)}")
+            await session.rollback()
+            print(f"❌ Error saving products: {str(ex)}")
 
-            raise HTTPException(status_code=500, detail=f"Error al guardar el producto: {str(ex)}")
-        finally:
-            session.close()
+            raise HTTPException(status_code=500, detail=f"Error al guardar los productos: {str(ex)}")
     
-    def _save_tercero(self, payload, tipo_tercero: str):
+    async def _save_tercero(self, session: AsyncSession, payload, tipo_tercero: str):
         """
         Save a tercero (provider or client) to the database using the extracted payload.
         
         Args:
+            session: Request-scoped async session
             payload: PayloadCreateProvider or PayloadCreateClient with the extracted data
             tipo_tercero: Either 'proveedor' or 'cliente'
             
@@ -250,10 +251,8 @@ class ChatWebService02:
         Raises:
             HTTPException: If there's an error saving the tercero
         """
-        session = SessionLocal()
-
         try:
-            tercero_dao = TerceroDAO(session)
+            tercero_dao = AsyncTerceroDAO(session)
             
             # Determine tipo_documento based on NIT format (simple heuristic)
             # If numeric and length suggests company NIT, use 'NIT', otherwise 'CC'
@@ -271,39 +270,33 @@ class ChatWebService02:
             )
             
             # Save the tercero (create method already commits)
-            saved_tercero = tercero_dao.create(nuevo_tercero)
+            saved_tercero = await tercero_dao.create(nuevo_tercero)
             
             print(f"✅ {tipo_tercero.capitalize()} saved successfully: {saved_tercero}")
             
             return saved_tercero
             
         except Exception as ex:
-            session.rollback()
+            await session.rollback()
             print(f"❌ Error saving {tipo_tercero}: {str(ex)}")
 
             raise HTTPException(status_code=500, detail=f"Error al guardar el {tipo_tercero}: {str(ex)}")
-        finally:
-            session.close()
     
     # =============================================================================
     # AI PROCESSING METHODS
     # =============================================================================
     
-    def _extract_invoice_from_image(self, llm, message_content):
+    async def _extract_invoice_from_image(self, message_content):
         """
         Extract invoice data from an image using structured output.
         
         Args:
-            llm: The language model instance
             message_content: List with text and image_url content
             
         Returns:
             FacturaColombiana object or None if extraction fails
         """
         try:
-            # Create a model with structured output for invoice extraction
-            model_with_invoice_structure = llm.with_structured_output(FacturaColombiana)
-            
             # Instruction for invoice extraction (following Colab pattern)
             invoice_extraction_message = HumanMessage(content=[
                 {
@@ -313,8 +306,8 @@ class ChatWebService02:
                 message_content[1]  # The image_url content
             ])
             
-            # Extract invoice data
-            invoice_data = model_with_invoice_structure.invoke([invoice_extraction_message])
+            # Extract invoice data (structured runnable cached by the registry)
+            invoice_data = await get_llm_registry().ainvoke([invoice_extraction_message], CHAT_MODEL_NAME, schema=FacturaColombiana)
             
             print("=============== INVOICE EXTRACTION RESULT ===============")
             print(f"Invoice Number: {invoice_data.numeroFactura}")
@@ -394,7 +387,7 @@ class ChatWebService02:
     # =============================================================================
     
     @chat_webservice_api_router_02.post("/api/chat_v2.0")
-    async def chat_with_structure_output(self, request: ChatRequestDTO):
+    async def chat_with_structure_output(self, request: ChatRequestDTO, session: AsyncSession = Depends(get_async_session)):
         """
         Main chat endpoint with intention detection and multimodal support.
         
@@ -403,19 +396,125 @@ class ChatWebService02:
         
         Args:
             request: ChatRequestDTO with user message and optional file data
+            session: Request-scoped async session (closed when the request ends)
             
         Returns:
             Dict with chat response, detected intention, and saved entities
         """
-        # Initialize LLM
-        llm = init_chat_model("gemini-2.0-flash", model_provider="google_genai", api_key=self.GOOGLE_API_KEY)
-        
+
         print("=========REQUEST=========")
         print(request)
         print("=========================")
         
-        # Get or create conversation
+        set_usage_user(request.user_id)
+        
+        await self._conversations.refresh(request.user_id)
+        user_input, message_content, has_image, has_audio = self._start_turn(request)
+        
+        # Classify user intention (and extract invoice data if an image is present)
+        user_intention, invoice_data = await self._detect_intention(request, user_input, message_content, has_image, has_audio)
+        
+        # Save entities based on detected intention (async DB I/O with the request session)
+        saved_entities = await self._save_entities_from_intention(session, user_intention)
+        
+        # Generate AI response
+        llm_registry = get_llm_registry()
         conversation = self.find_conversation(request.user_id)
+
+        try:
+            ai_result = await llm_registry.ainvoke(conversation, CHAT_MODEL_NAME)
+            reply = getattr(ai_result, "content", str(ai_result))
+        except Exception as ex:
+            # If multimodal conversation fails, fall back to text-only
+            print(f"⚠️ Multimodal response failed, using text-only: {str(ex)}")
+            ai_result = await llm_registry.ainvoke(self._fallback_messages(user_input), CHAT_MODEL_NAME)
+            reply = getattr(ai_result, "content", str(ai_result))
+
+        self._conversations.append(request.user_id, AIMessage(content=reply))
+        
+        print("===REPLY===")
+        print(reply)
+        
+        # Return comprehensive response
+        return self._build_response(user_intention, reply, saved_entities, has_image, has_audio, invoice_data)
+    
+    @chat_webservice_api_router_02.post("/api/chat_v2.0/stream")
+    async def chat_with_structure_output_stream(self, request: ChatRequestDTO, session: AsyncSession = Depends(get_async_session)):
+        """
+        Streaming variant of /api/chat_v2.0 (Server-Sent Events).
+        
+        Emits, in order: 'intention' (detected intention, payloads and invoice data),
+        'saved_entities', one 'token' event per generated chunk of the reply and a
+        final 'done' event with the full reply. Failures are reported as an 'error' event.
+        
+        Args:
+            request: ChatRequestDTO with user message and optional file data
+            session: Request-scoped async session (closed after the stream ends)
+            
+        Returns:
+            StreamingResponse with media type text/event-stream
+        """
+        set_usage_user(request.user_id)
+        
+        async def event_stream():
+            try:
+                await self._conversations.refresh(request.user_id)
+                user_input, message_content, has_image, has_audio = self._start_turn(request)
+                
+                user_intention, invoice_data = await self._detect_intention(request, user_input, message_content, has_image, has_audio)
+                intention = self._build_response(user_intention, None, None, has_image, has_audio, invoice_data)
+                intention.pop("reply")
+                yield sse_event("intention", intention)
+                
+                saved_entities = await self._save_entities_from_intention(session, user_intention)
+                yield sse_event("saved_entities", self._saved_entities_summary(saved_entities))
+                
+                reply_parts = []
+                
+                async def stream_reply(messages):
+                    async for chunk in get_llm_registry().astream(messages, CHAT_MODEL_NAME):
+                        text = chunk_text(chunk)
+                        
+                        if (text):
+                            reply_parts.append(text)
+                            yield sse_event("token", {"text": text})
+                
+                try:
+                    async for event in stream_reply(self.find_conversation(request.user_id)):
+                        yield event
+                except Exception as ex:
+                    # Only retry text-only if nothing was emitted yet (same fallback as the non-streaming endpoint)
+                    if (reply_parts): raise
+                    
+                    print(f"⚠️ Multimodal streaming failed, using text-only: {str(ex)}")
+                    
+                    async for event in stream_reply(self._fallback_messages(user_input)):
+                        yield event
+                
+                reply = "".join(reply_parts)
+                self._conversations.append(request.user_id, AIMessage(content=reply))
+                
+                yield sse_event("done", {"reply": reply})
+            except Exception as ex:
+                print(f"❌ Streaming chat failed: {str(ex)}")
+                yield sse_event("error", {"detail": str(ex)})
+        
+        return StreamingResponse(event_stream(), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
+    
+    # =============================================================================
+    # HELPER METHODS FOR MAIN ENDPOINT
+    # =============================================================================
+    
+    def _start_turn(self, request: ChatRequestDTO):
+        """
+        Register the user message in the conversation.
+        
+        Args:
+            request: ChatRequestDTO with user message and optional file data
+            
+        Returns:
+            Tuple of (user_input, message_content, has_image, has_audio)
+        """
         user_input = request.message
         
         # Process multimodal content
@@ -423,56 +522,46 @@ class ChatWebService02:
         
         # Add message to conversation
         if (len(message_content) == 1):
-            conversation.append(HumanMessage(content=user_input))
+            self._conversations.append(request.user_id, HumanMessage(content=user_input))
         else:
-            conversation.append(HumanMessage(content=message_content))
+            self._conversations.append(request.user_id, HumanMessage(content=message_content))
+        
+        return user_input, message_content, has_image, has_audio
+    
+    async def _detect_intention(self, request: ChatRequestDTO, user_input: str, message_content: list, has_image: bool, has_audio: bool):
+        """
+        Detect the user intention, extracting and applying invoice data when an image is attached.
         
-        # Extract invoice data if image is present
+        Returns:
+            Tuple of (UserIntention, FacturaColombiana or None)
+        """
         invoice_data = None
 
         if (has_image):
             print("🔍 Attempting to extract invoice data from image...")
-            invoice_data = self._extract_invoice_from_image(llm, message_content)
-        
-        # Classify user intention
-        user_intention = self._classify_user_intention(llm, request.user_id, user_input, message_content, has_image, has_audio)
+            user_intention, invoice_data = await self._understand_invoice_message(request.user_id, user_input, message_content, has_audio)
+        else:
+            user_intention = await self._classify_user_intention(request.user_id, user_input, message_content, has_image, has_audio)
         
         # Enrich intention with invoice data
         if (invoice_data):
             print("🔄 Enriching intention with invoice data...")
             user_intention = self._enrich_intention_with_invoice(user_intention, invoice_data)
+
+            # The image is not sent again: the reply call and later turns use the extracted data as text
+            self._conversations.replace_last(request.user_id, HumanMessage(content=f"{user_input}\n\n{self._invoice_as_text(invoice_data)}"))
         
         # Log intention detection results
         self._log_intention_results(user_intention, has_audio)
         
-        # Save entities based on detected intention
-        saved_entities = self._save_entities_from_intention(user_intention)
-        
-        # Generate AI response
-        try:
-            ai_result = llm.invoke(conversation)
-            reply = getattr(ai_result, "content", str(ai_result))
-        except Exception as ex:
-            # If multimodal conversation fails, fall back to text-only
-            print(f"⚠️ Multimodal response failed, using text-only: {str(ex)}")
-            fallback_messages = [
-                SystemMessage(content=DONCONFIADO_SYSTEM_PROMPT),
-                HumanMessage(content=user_input)
-            ]
-            ai_result = llm.invoke(fallback_messages)
-            reply = getattr(ai_result, "content", str(ai_result))
-
-        conversation.append(AIMessage(content=reply))
-        
-        print("===REPLY===")
-        print(reply)
-        
-        # Return comprehensive response
-        return self._build_response(user_intention, reply, saved_entities, has_image, has_audio, invoice_data)
+        return user_intention, invoice_data
     
-    # =============================================================================
-    # HELPER METHODS FOR MAIN ENDPOINT
-    # =============================================================================
+    def _fallback_messages(self, user_input: str) -> list:
+        """Text-only messages used when the multimodal conversation cannot be answered."""
+        return [
+            SystemMessage(content=DONCONFIADO_SYSTEM_PROMPT),
+            HumanMessage(content=user_input)
+        ]
     
     def _process_multimodal_content(self, request: ChatRequestDTO):
         """
@@ -513,12 +602,11 @@ class ChatWebService02:
         
         return message_content, has_image, has_audio
     
-    def _classify_user_intention(self, llm, user_id: str, user_input: str, message_content: list, has_image: bool, has_audio: bool):
+    async def _classify_user_intention(self, user_id: str, user_input: str, message_content: list, has_image: bool, has_audio: bool):
         """
         Classify user intention using structured output.
         
         Args:
-            llm: Language model instance
             user_id: User identifier for conversation history
             user_input: User's text input
             message_content: List with multimodal content (text, audio, image)
@@ -528,8 +616,78 @@ class ChatWebService02:
         Returns:
             UserIntention object with classified intention and extracted data
         """
-        model_with_structure = llm.with_structured_output(UserIntention)
+        # Text-only messages are first tried against the local classifier (no payload to extract)
+        if (not has_audio and not has_image):
+            local_intent = INTENT_CLASSIFIER.classify(user_input)
+            
+            if (local_intent is not None):
+                return UserIntention(userintention=local_intent.label)
+        
+        llm_registry = get_llm_registry()
+        classify_instruction = self._build_classify_instruction(user_id, user_input, has_image, has_audio)
+        
+        # Use multimodal classification if needed
+        if (has_audio or has_image):
+            classification_message = self._build_multimodal_message(classify_instruction, message_content)
+            
+            try:
+                return await llm_registry.ainvoke([classification_message], CHAT_MODEL_NAME, schema=UserIntention)
+            except Exception as ex:
+                # Fallback to text-only if multimodal fails
+                print(f"⚠️ Multimodal classification failed: {str(ex)}")
+                return await llm_registry.ainvoke(classify_instruction, CHAT_MODEL_NAME, schema=UserIntention)
+        else:
+            # Text-only classification (logged as a training example for the local classifier)
+            result = await llm_registry.ainvoke(classify_instruction, CHAT_MODEL_NAME, schema=UserIntention)
+            if (result is not None): INTENT_CLASSIFIER.log(user_input, result.userintention)
+            
+            return result
+    
+    async def _understand_invoice_message(self, user_id: str, user_input: str, message_content: list, has_audio: bool):
+        """
+        Classify the user intention and extract invoice data from an attached image.
         
+        In combined mode a single structured call returns the intention, the payloads
+        and the invoice data, so the image is uploaded once. If the combined call fails
+        (or the mode is disabled) the extraction and classification calls run concurrently.
+        
+        Args:
+            user_id: User identifier for conversation history
+            user_input: User's text input
+            message_content: List with text and image_url content
+            has_audio: Whether audio is present
+            
+        Returns:
+            Tuple of (UserIntention, FacturaColombiana or None)
+        """
+        if (COMBINED_INVOICE_EXTRACTION):
+            instruction = (
+                self._build_classify_instruction(user_id, user_input, True, has_audio) + "\n"
+                "Además, si la imagen es una factura, extrae sus datos en 'factura' según el schema. "
+                "Si la imagen no contiene una factura, deja 'factura' en nulo."
+            )
+            
+            try:
+                understanding = await get_llm_registry().ainvoke(
+                    [self._build_multimodal_message(instruction, message_content)],
+                    CHAT_MODEL_NAME,
+                    schema=InvoiceUnderstanding
+                )
+                
+                if (understanding is not None):
+                    return understanding, understanding.factura
+            except Exception as ex:
+                print(f"⚠️ Combined invoice understanding failed, running separate calls: {str(ex)}")
+        
+        user_intention, invoice_data = await asyncio.gather(
+            self._classify_user_intention(user_id, user_input, message_content, True, has_audio),
+            self._extract_invoice_from_image(message_content),
+        )
+        
+        return user_intention, invoice_data
+    
+    def _build_classify_instruction(self, user_id: str, user_input: str, has_image: bool, has_audio: bool) -> str:
+        """Build the intention classification prompt for the current conversation."""
         # Build media context
         media_context = ""
 
@@ -551,32 +709,28 @@ class ChatWebService02:
             "- 'none': sin intención clara\n"
             "- 'bye': despedida\n"
             f"{media_context}\n\n"
-            f"Historial:\n{self._history_as_text(user_id)}\n\n"
+            f"Historial:\n{self._history_as_text(user_id, max_tokens=PROMPT_HISTORY_MAX_TOKENS)}\n\n"
             f"Último mensaje del usuario: {user_input}\n"
             "Si hay audio o imagen, analízalos y extrae la información correspondiente. "
             "Si hay audio, incluye la transcripción en 'audio_transcription'."
         )
         
-        # Use multimodal classification if needed
-        if (has_audio or has_image):
-            # Build classification message with text instruction + media content
-            classification_content = [{"type": "text", "text": classify_instruction}]
-            
-            # Add audio/image from message_content (skip the first text item)
-            for content_item in message_content[1:]:
-                classification_content.append(content_item)
-            
-            classification_message = HumanMessage(content=classification_content)
-            
-            try:
-                return model_with_structure.invoke([classification_message])
-            except Exception as ex:
-                # Fallback to text-only if multimodal fails
-                print(f"⚠️ Multimodal classification failed: {str(ex)}")
-                return model_with_structure.invoke(classify_instruction)
-        else:
-            # Text-only classification
-            return model_with_structure.invoke(classify_instruction)
+        return classify_instruction
+    
+    def _build_multimodal_message(self, instruction: str, message_content: list) -> HumanMessage:
+        """Build a message with a text instruction followed by the audio/image items of the request."""
+        # Skip the first text item of message_content
+        return HumanMessage(content=[{"type": "text", "text": instruction}, *message_content[1:]])
+    
+    def _invoice_as_text(self, invoice_data) -> str:
+        """Render extracted invoice data as a compact text that replaces the image in the conversation."""
+        items = "; ".join(f"{item.descripcion} x {item.cantidad}" for item in invoice_data.items)
+        
+        return (
+            f"[Factura adjunta] Número: {invoice_data.numeroFactura}. Fecha: {invoice_data.fechaEmision}. "
+            f"Emisor: {invoice_data.emisor.razonSocial} (NIT {invoice_data.emisor.nit}). "
+            f"Total: {invoice_data.total} {invoice_data.moneda}. Ítems: {items or 'N/A'}."
+        )
     
     def _log_intention_results(self, result, has_audio: bool):
         """Log the intention detection results for debugging."""
@@ -589,11 +743,12 @@ class ChatWebService02:
         print(f"Full Result: {result}")
         print("=========================================================")
     
-    def _save_entities_from_intention(self, result):
+    async def _save_entities_from_intention(self, session: AsyncSession, result):
         """
         Save entities based on detected intention.
         
         Args:
+            session: Request-scoped async session
             result: UserIntention object with detected intention and payloads
             
         Returns:
@@ -606,17 +761,20 @@ class ChatWebService02:
             'client': {'saved': False, 'entity': None}
         }
                 
-        def _save_product(product: PayloadCreateProduct):
+        async def _save_products(products: list[PayloadCreateProduct]):
+            provider = saved_entities['provider']['entity']
+            
             try:
-                saved_product = self._save_product(product)
-                saved_entities['product'] = {'saved': True, 'entity': saved_product}
-                print(f"🎉 Product '{saved_product.nombre}' saved with SKU: {saved_product.sku}")
+                report = await self._save_products(session, products, proveedor_id=getattr(provider, 'id', None))
+                saved = [item['entity'] for item in report if item['status'] in ('created', 'updated')]
+                saved_entities['product'] = {'saved': bool(saved), 'entity': saved[-1] if saved else None, 'items': report}
+                print(f"🎉 {len(saved)} of {len(report)} products saved")
             except Exception as ex:
-                print(f"⚠️ Failed to save product: {str(ex)}") 
+                print(f"⚠️ Failed to save products: {str(ex)}") 
         
-        def _save_tercero(obj: Tercero, type: str, key: str): 
+        async def _save_tercero(obj: Tercero, type: str, key: str): 
             try:
-                saved_provider = self._save_tercero(obj, type)
+                saved_provider = await self._save_tercero(session, obj, type)
                 saved_entities[key] = {'saved': True, 'entity': saved_provider}
                 print(f"🎉 Provider '{saved_provider.razon_social}' saved with ID: {saved_provider.id}")
             except Exception as ex:
@@ -633,19 +791,33 @@ class ChatWebService02:
                 
         # Handle create_provider intention
         if ((is_create_provider or is_create_full) and payload_provider):
-            _save_tercero(payload_provider, "proveedor", "provider")
+            await _save_tercero(payload_provider, "proveedor", "provider")
         
         # Handle create_client intention
         if (is_create_client and result.payload_client):
-            _save_tercero(payload_provider, "cliente", "client")
+            await _save_tercero(payload_provider, "cliente", "client")
 
         # Handle create_product intention
         if ((is_create_product or is_create_full) and payload_products):
-            for product in payload_products:
-                _save_product(product)
+            await _save_products(payload_products)
         
         return saved_entities
     
+    def _saved_entities_summary(self, saved_entities: dict) -> dict:
+        """Serializable view of saved entities (flag + database id, per-item status for products) for streamed events."""
+        summary = {
+            key: {"saved": value["saved"], "id": getattr(value["entity"], "id", None)}
+            for key, value in saved_entities.items()
+        }
+        
+        if (saved_entities['product'].get('items')):
+            summary['product']['items'] = [
+                {"sku": item["sku"], "status": item["status"], "id": getattr(item["entity"], "id", None), "error": item["error"]}
+                for item in saved_entities['product']['items']
+            ]
+        
+        return summary
+    
     def _build_response(self, result, reply: str, saved_entities: dict, has_image: bool, has_audio: bool, invoice_data):
         """
         Build the final response dictionary.
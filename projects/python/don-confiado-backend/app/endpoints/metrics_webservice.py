@@ -0,0 +1,56 @@
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi_utils.cbv import cbv
+
+from business.common.entity_cache import get_entity_cache
+from business.utils.llm_utils import LLMUtils
+from business.utils.usage_tracker import get_usage_tracker
+from business.services.basic_service import RESPONSE_CACHE as CHAT_V1_RESPONSE_CACHE
+from endpoints.chat_webservice import INTENT_CLASSIFIER as CHAT_V1_INTENT_CLASSIFIER
+from endpoints.chat_webservice_02 import CONVERSATION_MEMORY, INTENT_CLASSIFIER as CHAT_V2_INTENT_CLASSIFIER
+from endpoints.chat_clase_03 import RESPONSE_CACHE as RAG_RESPONSE_CACHE
+
+
+metrics_webservice_api_router = APIRouter()
+
+@cbv(metrics_webservice_api_router)
+class MetricsWebService:
+    # Memoria de conversaciones: usuarios, tokens estimados, bytes y expulsiones
+    @metrics_webservice_api_router.get("/api/metrics/memory")
+    async def memory_stats(self, user_id: Optional[str] = None, include_users: bool = False):
+        memories = {
+            "chat_v1": LLMUtils.MEMORY_STORE,
+            "chat_v2": CONVERSATION_MEMORY,
+        }
+
+        if (user_id):
+            return {name: memory.user_stats(user_id) for name, memory in memories.items()}
+
+        return {name: memory.stats(include_users=include_users) for name, memory in memories.items()}
+
+    # Caché de respuestas (exacta + semántica): aciertos por nivel, fallos, omitidas y expulsiones
+    @metrics_webservice_api_router.get("/api/metrics/response_cache")
+    async def response_cache_stats(self):
+        return {
+            "chat_v1": CHAT_V1_RESPONSE_CACHE.stats(),
+            "chat_clase_03": RAG_RESPONSE_CACHE.stats(),
+        }
+
+    # Clasificador local de intención: decididas por reglas/modelo, escaladas al LLM y latencia media
+    @metrics_webservice_api_router.get("/api/metrics/intent")
+    async def intent_stats(self):
+        return {
+            "chat_v1": CHAT_V1_INTENT_CLASSIFIER.stats(),
+            "chat_v2": CHAT_V2_INTENT_CLASSIFIER.stats(),
+        }
+
+    # Tokens (prompt/completion) y latencia de las llamadas a modelos, por endpoint, usuario, modelo y operación
+    @metrics_webservice_api_router.get("/api/metrics/usage")
+    async def usage_stats(self, user_id: Optional[str] = None, recent: int = 0):
+        return get_usage_tracker().stats(user_id=user_id, recent=recent)
+
+    # Caché de entidades de los DAOs (por id, SKU y documento): aciertos, fallos, invalidaciones y expulsiones
+    @metrics_webservice_api_router.get("/api/metrics/entity_cache")
+    async def entity_cache_stats(self):
+        return get_entity_cache().stats()
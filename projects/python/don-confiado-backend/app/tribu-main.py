@@ -1,5 +1,6 @@
 import os
 import uvicorn
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
@@ -7,9 +8,14 @@ from fastapi import FastAPI
 from endpoints.hello_world_webservice import HelloWorldWebService, hello_webservice_api_router
 from endpoints.business_webservice import business_webservice_api_router
 from endpoints.chat_webservice import chat_webservice_api_router
-from endpoints.chat_webservice_02 import chat_webservice_api_router_02
+from endpoints.chat_webservice_02 import chat_webservice_api_router_02, CHAT_MODEL_NAME as CHAT_V2_MODEL_NAME
 from endpoints.chat_clase_03 import chat_clase_03_api_router
 from endpoints.chat_clase_04 import graphrag_api_router
+from endpoints.metrics_webservice import metrics_webservice_api_router
+from endpoints.catalog_webservice import catalog_webservice_api_router
+from business.common.async_connection import dispose_async_engines
+from business.utils.llm_registry import DEFAULT_CHAT_MODEL, init_llm_registry
+from business.utils.usage_tracker import usage_middleware
 
 load_dotenv()
 
@@ -20,8 +26,21 @@ if (not GOOGLE_API_KEY):
     os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Cierra las conexiones de los pools async (primaria y réplicas) al apagar el servidor
+    await dispose_async_engines()
+
+
 if (__name__ == "__main__"):
-    app = FastAPI()
+    # Registro de clientes LLM del proceso: se crea una sola vez al arrancar
+    init_llm_registry(DEFAULT_CHAT_MODEL, CHAT_V2_MODEL_NAME)
+
+    app = FastAPI(lifespan=lifespan)
+    # Contabilidad de tokens/latencia por petición (endpoint + usuario)
+    app.middleware("http")(usage_middleware)
+
     app.include_router(hello_webservice_api_router)
     app.include_router(business_webservice_api_router)
     
@@ -29,5 +48,7 @@ if (__name__ == "__main__"):
     app.include_router(chat_webservice_api_router_02)
     app.include_router(chat_clase_03_api_router)
     app.include_router(graphrag_api_router)
+    app.include_router(metrics_webservice_api_router)
+    app.include_router(catalog_webservice_api_router)
     
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
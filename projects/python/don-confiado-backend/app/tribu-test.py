@@ -8,7 +8,6 @@ session = SessionLocal()
 
 dao = TerceroDAO(session)
 
-terceros = dao.findAll()
-
-for t in terceros:
-    print(t)
\ No newline at end of file
+# Lectura en streaming (cursor del lado del servidor) en lugar de cargar toda la tabla
+for t in dao.iterAll(batch_size=500):
+    print(t)